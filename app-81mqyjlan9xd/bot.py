@@ -3,7 +3,7 @@
 Voice Bot AI — HTTP service for voice session management.
 
 This service:
-  - Creates Daily.co rooms on demand
+  - Keeps a warm pool of Daily.co rooms (created on demand when it runs dry)
   - Returns room URLs + tokens to the frontend
   - Forwards voice queries to the Supabase voice-engine Edge Function
   - Acts as a health-check-able container for voice features
@@ -11,94 +11,385 @@ This service:
 NO pipecat dependency — uses direct REST APIs for reliability.
 
 Endpoints:
-  GET  /health        — liveness check
+  GET  /health        — liveness check + remaining session capacity
+  GET  /metrics       — Prometheus text-format latency/error metrics
   POST /create-room   — create a Daily.co room, returns {url, token}
   POST /voice-query   — STT → LLM → TTS via voice-engine Edge Function
+
+At capacity, /create-room, /start and /voice-query answer 503 with a
+Retry-After header instead of degrading the requests already in flight.
 """
 
 import asyncio
-import json
+import bisect
 import os
 import time
-import urllib.error
-import urllib.request
-from typing import Optional
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
 
+import aiohttp
 from aiohttp import web
 from loguru import logger
 import sys
 
+from capacity import AtCapacity, CapacityManager
+
 # ── Environment ──────────────────────────────────────────────────────────────
 DAILY_API_KEY        = os.environ.get("DAILY_API_KEY", "")
+DAILY_API_URL        = os.environ.get("DAILY_API_URL", "https://api.daily.co/v1").rstrip("/")
 SUPABASE_URL         = os.environ.get("VITE_SUPABASE_URL", "").rstrip("/")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
 ELEVEN_LABS_API_KEY  = os.environ.get("ELEVEN_LABS_API_KEY", "")
 OPENAI_API_KEY       = os.environ.get("OPENAI_API_KEY", "")
 PORT                 = int(os.environ.get("BOT_PORT", "8765"))
 
+STREAM_CHUNK_BYTES   = 16 * 1024
+UPSTREAM_POOL_SIZE   = int(os.environ.get("UPSTREAM_POOL_SIZE", "100"))
+
+# Warm pool of ready Daily rooms (0 disables it)
+ROOM_POOL_SIZE       = int(os.environ.get("ROOM_POOL_SIZE", "3"))
+ROOM_POOL_REFILL_RPS = float(os.environ.get("ROOM_POOL_REFILL_RPS", "2"))
+ROOM_POOL_BURST      = int(os.environ.get("ROOM_POOL_BURST", "4"))
+ROOM_TTL_SECS        = 3600
+ROOM_MIN_TTL_SECS    = int(os.environ.get("ROOM_MIN_TTL_SECS", "2700"))
+
+# Admission control: budget for concurrent /voice-query sessions and process load
+MAX_SESSIONS         = int(os.environ.get("MAX_SESSIONS", "50"))
+MAX_LOOP_LAG_MS      = float(os.environ.get("MAX_LOOP_LAG_MS", "100"))
+MAX_CPU              = float(os.environ.get("MAX_CPU", "0.85"))       # fraction of one core
+ADMISSION_QUEUE_SECS = float(os.environ.get("ADMISSION_QUEUE_SECS", "2"))
+RETRY_AFTER_SECS     = int(os.environ.get("RETRY_AFTER_SECS", "5"))
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+# Minimal in-process Prometheus registry: the service is a single event loop,
+# so plain dicts are safe and an observation is one bisect + two adds.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample(value: float) -> str:
+    """Exact text for a sample value — `:g` would round counters past 999999."""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metric:
+    def __init__(self, kind: str, name: str, help_text: str, labels: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.kind    = kind                # "counter" | "gauge" | "histogram"
+        self.name    = name
+        self.help    = help_text
+        self.labels  = labels
+        self.buckets = buckets
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str) -> None:
+        self.inc(*labels, amount=-1.0)
+
+    def observe(self, value: float, *labels: str) -> None:
+        # [per-bucket counts..., +Inf count, sum]
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(str(v))}"' for k, v in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in sorted(self._values.items()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{self._label_str(values)} {_sample(series)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{self._label_str(values, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._label_str(values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(values)} {_sample(series[-1])}")
+            lines.append(f"{self.name}_count{self._label_str(values)} {cumulative}")
+        return lines
+
+
+HTTP_LATENCY = Metric(
+    "histogram", "voicebot_http_request_duration_seconds",
+    "Time to fully serve a request (streamed responses included).", ("route", "method", "status"),
+)
+HTTP_IN_FLIGHT = Metric(
+    "gauge", "voicebot_http_requests_in_flight", "Requests currently being served.", ("route",),
+)
+UPSTREAM_LATENCY = Metric(
+    "histogram", "voicebot_upstream_duration_seconds",
+    "Upstream call latency (voice-engine: time to response headers).", ("upstream", "path"),
+)
+UPSTREAM_ERRORS = Metric(
+    "counter", "voicebot_upstream_errors_total",
+    "Failed upstream calls by HTTP status (\"error\" = no response).", ("upstream", "status"),
+)
+METRICS = (HTTP_LATENCY, HTTP_IN_FLIGHT, UPSTREAM_LATENCY, UPSTREAM_ERRORS)
+
+
+def _route_label(request: web.Request) -> str:
+    # Use the route template, never the raw path, so label cardinality stays fixed.
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else "unmatched"
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    route  = _route_label(request)
+    status = 500
+    t0     = time.perf_counter()
+    HTTP_IN_FLIGHT.inc(route)
+    try:
+        response = await handler(request)
+        status   = response.status
+        return response
+    except web.HTTPException as exc:
+        status = exc.status
+        raise
+    finally:
+        HTTP_IN_FLIGHT.dec(route)
+        HTTP_LATENCY.observe(time.perf_counter() - t0, route, request.method, str(status))
+
+
+# ── Capacity ──────────────────────────────────────────────────────────────────
+
+# AtCapacity / CapacityManager live in capacity.py, a copy of the pipecat
+# bot's miteshbot/capacity.py (see its docstring).
+
+
+def _at_capacity(exc: AtCapacity) -> web.Response:
+    logger.warning(f"🚦 Request rejected: {exc}")
+    return web.json_response(
+        {"error": "Voice service is at capacity, please retry shortly.",
+         "reason": exc.reason, "retry_after": exc.retry_after},
+        status=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 # ── Daily.co helpers ──────────────────────────────────────────────────────────
 
-def _daily_request(path: str, payload: dict) -> Optional[dict]:
+async def _daily_request(session: aiohttp.ClientSession, path: str, payload: dict) -> Optional[dict]:
     """Make a POST request to Daily.co REST API. Returns parsed JSON or None."""
     if not DAILY_API_KEY:
         logger.warning("DAILY_API_KEY not set — cannot create rooms")
         return None
+    status = "error"
+    t0     = time.perf_counter()
     try:
-        data = json.dumps(payload).encode()
-        req  = urllib.request.Request(
-            f"https://api.daily.co/v1{path}",
-            data=data,
-            headers={
-                "Authorization": f"Bearer {DAILY_API_KEY}",
-                "Content-Type":  "application/json",
-            },
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            return json.loads(resp.read())
+        async with session.post(
+            f"{DAILY_API_URL}{path}",
+            json=payload,
+            headers={"Authorization": f"Bearer {DAILY_API_KEY}"},
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as resp:
+            status = str(resp.status)
+            resp.raise_for_status()
+            return await resp.json()
     except Exception as exc:
+        UPSTREAM_ERRORS.inc("daily", status)
         logger.error(f"Daily API error ({path}): {exc}")
         return None
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - t0, "daily", path)
 
 
-def create_daily_room() -> Optional[dict]:
-    """Create a new private Daily.co room valid for 1 hour. Returns {url, token}."""
-    exp  = int(time.time()) + 3600
-    room = _daily_request("/rooms", {"privacy": "private", "properties": {"exp": exp}})
+async def create_daily_room(session: aiohttp.ClientSession) -> Optional[dict]:
+    """Create a new private Daily.co room valid for 1 hour. Returns {url, token, exp}."""
+    exp  = int(time.time()) + ROOM_TTL_SECS
+    room = await _daily_request(session, "/rooms", {"privacy": "private", "properties": {"exp": exp}})
     if not room:
         return None
 
-    token_data = _daily_request(
+    token_data = await _daily_request(
+        session,
         "/meeting-tokens",
         {"properties": {"room_name": room["name"], "is_owner": True, "exp": exp}},
     )
     if not token_data:
-        return {"url": room["url"], "token": None}
+        return {"url": room["url"], "token": None, "exp": exp}
+
+    return {"url": room["url"], "token": token_data.get("token"), "exp": exp}
 
-    return {"url": room["url"], "token": token_data.get("token")}
+
+class RoomPool:
+    """
+    Background-maintained pool of ready rooms + owner tokens.
+
+    acquire() pops a room in O(1); rooms with less than ROOM_MIN_TTL_SECS
+    left are evicted so callers always get most of the hour. When the pool
+    runs dry, acquire() falls back to on-demand creation and wakes the
+    refiller, which creates up to ROOM_POOL_BURST rooms at a time, paced at
+    ROOM_POOL_REFILL_RPS.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, target: int,
+                 refill_rps: float, burst: int, min_ttl: int) -> None:
+        self._session    = session
+        self._target     = target
+        self._refill_rps = max(refill_rps, 0.01)
+        self._burst      = max(burst, 1)
+        self._min_ttl    = min_ttl
+        self._rooms: Deque[dict] = deque()
+        self._wake       = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.hits        = 0
+        self.misses      = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _evict_stale(self) -> None:
+        cutoff = time.time() + self._min_ttl
+        # Oldest rooms sit at the left, so stale ones are always at the front.
+        while self._rooms and self._rooms[0]["exp"] < cutoff:
+            self._rooms.popleft()
+
+    async def acquire(self) -> Optional[dict]:
+        self._evict_stale()
+        if self._rooms:
+            self.hits += 1
+            room = self._rooms.popleft()
+        else:
+            self.misses += 1
+            room = await create_daily_room(self._session)
+        self._wake.set()
+        return room
+
+    def stats(self) -> dict:
+        return {"ready": len(self._rooms), "target": self._target, "hits": self.hits, "misses": self.misses}
+
+    async def _run(self) -> None:
+        while True:
+            self._evict_stale()
+            deficit = self._target - len(self._rooms)
+            if deficit > 0:
+                batch   = min(deficit, self._burst)
+                created = await asyncio.gather(*(create_daily_room(self._session) for _ in range(batch)))
+                ready   = [r for r in created if r and r.get("token")]
+                self._rooms.extend(sorted(ready, key=lambda r: r["exp"]))
+                if len(ready) < batch:
+                    # Daily is failing — back off instead of hammering it.
+                    await asyncio.sleep(10)
+                else:
+                    await asyncio.sleep(batch / self._refill_rps)
+                continue
+
+            # Full: sleep until a room is taken or the oldest one goes stale.
+            self._wake.clear()
+            oldest_stale_in = self._rooms[0]["exp"] - self._min_ttl - time.time() if self._rooms else 60
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(oldest_stale_in, 1))
+            except asyncio.TimeoutError:
+                pass
+
+
+async def get_room(app: web.Application) -> Optional[dict]:
+    pool: Optional[RoomPool] = app.get("rooms")
+    room = await pool.acquire() if pool else await create_daily_room(app["http"])
+    if room:
+        room = {"url": room["url"], "token": room["token"]}
+    return room
 
 
 # ── HTTP handlers ─────────────────────────────────────────────────────────────
 
 async def handle_health(request: web.Request) -> web.Response:
+    capacity: CapacityManager = request.app["capacity"]
     return web.json_response({
         "status":      "ok",
+        "accepting":   capacity.remaining() > 0,
+        "capacity":    capacity.stats(),
         "service":     "voice-bot-ai",
         "daily":       bool(DAILY_API_KEY),
         "supabase":    bool(SUPABASE_URL),
         "elevenlabs":  bool(ELEVEN_LABS_API_KEY),
         "openai":      bool(OPENAI_API_KEY),
+        "room_pool":   request.app["rooms"].stats() if request.app.get("rooms") else None,
     })
 
 
+async def handle_metrics(request: web.Request) -> web.Response:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    pool: Optional[RoomPool] = request.app.get("rooms")
+    if pool:
+        stats = pool.stats()
+        lines += [
+            "# HELP voicebot_room_pool_ready Warm Daily rooms ready to hand out.",
+            "# TYPE voicebot_room_pool_ready gauge",
+            f"voicebot_room_pool_ready {stats['ready']}",
+            "# HELP voicebot_room_pool_acquire_total Room hand-outs by outcome.",
+            "# TYPE voicebot_room_pool_acquire_total counter",
+            f'voicebot_room_pool_acquire_total{{outcome="hit"}} {stats["hits"]}',
+            f'voicebot_room_pool_acquire_total{{outcome="miss"}} {stats["misses"]}',
+        ]
+    capacity: CapacityManager = request.app["capacity"]
+    lines += [
+        "# HELP voicebot_sessions_active Voice sessions currently admitted.",
+        "# TYPE voicebot_sessions_active gauge",
+        f"voicebot_sessions_active {capacity.active}",
+        "# HELP voicebot_capacity_remaining Further sessions this process would admit now.",
+        "# TYPE voicebot_capacity_remaining gauge",
+        f"voicebot_capacity_remaining {capacity.remaining()}",
+        "# HELP voicebot_event_loop_lag_ms Smoothed event-loop lag.",
+        "# TYPE voicebot_event_loop_lag_ms gauge",
+        f"voicebot_event_loop_lag_ms {capacity.lag_ms:.1f}",
+        "# HELP voicebot_process_cpu Process CPU use as a fraction of one core.",
+        "# TYPE voicebot_process_cpu gauge",
+        f"voicebot_process_cpu {capacity.cpu:.3f}",
+        "# HELP voicebot_admission_rejected_total Requests turned away at capacity.",
+        "# TYPE voicebot_admission_rejected_total counter",
+    ]
+    lines += [
+        f'voicebot_admission_rejected_total{{route="{_escape(route)}"}} {count}'
+        for route, count in sorted(capacity.rejected.items())
+    ]
+    return web.Response(
+        body=("\n".join(lines) + "\n").encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
 async def handle_create_room(request: web.Request) -> web.Response:
     """
     Create a Daily.co room for a real-time voice session.
     Returns: { "url": "https://...", "token": "..." }
     """
-    loop = asyncio.get_event_loop()
-    room = await loop.run_in_executor(None, create_daily_room)
+    try:
+        await request.app["capacity"].admit("/create-room", ADMISSION_QUEUE_SECS)
+    except AtCapacity as exc:
+        return _at_capacity(exc)
+
+    room = await get_room(request.app)
 
     if not room:
         return web.json_response(
@@ -109,7 +400,27 @@ async def handle_create_room(request: web.Request) -> web.Response:
     return web.json_response(room)
 
 
-async def handle_voice_query(request: web.Request) -> web.Response:
+async def _relay_multipart(reader, boundary: str) -> AsyncIterator[bytes]:
+    """Re-emit the incoming multipart body part by part, chunk by chunk."""
+    async for part in reader:
+        disposition = f'form-data; name="{part.name}"'
+        headers = ""
+        if part.name == "audio":
+            disposition += f'; filename="{part.filename or "audio.webm"}"'
+            headers = f"Content-Type: {part.headers.get('Content-Type') or 'audio/webm'}\r\n"
+        yield (
+            f"--{boundary}\r\nContent-Disposition: {disposition}\r\n{headers}\r\n"
+        ).encode()
+        while True:
+            chunk = await part.read_chunk(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+async def handle_voice_query(request: web.Request) -> web.StreamResponse:
     """
     Proxy a voice query to the Supabase voice-engine Edge Function.
 
@@ -118,46 +429,62 @@ async def handle_voice_query(request: web.Request) -> web.Response:
       profileId  — UUID of the AI clone profile
 
     Returns: audio/mpeg stream from ElevenLabs
+
+    The upload is piped to voice-engine as it arrives and the returned audio
+    is relayed chunk by chunk, so the first byte reaches the client as soon
+    as upstream sends it and memory stays flat regardless of clip length.
     """
     if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
         return web.json_response({"error": "Supabase not configured"}, status=500)
 
     try:
-        import aiohttp as _aio
-        reader     = await request.multipart()
-        form_data  = _aio.FormData()
-
-        async for part in reader:
-            data = await part.read()
-            if part.name == "audio":
-                form_data.add_field(
-                    "audio", data,
-                    filename=part.filename or "audio.webm",
-                    content_type=part.content_type or "audio/webm",
-                )
-            else:
-                form_data.add_field(part.name, data.decode())
+        async with request.app["capacity"].session("/voice-query", ADMISSION_QUEUE_SECS):
+            return await _proxy_voice_query(request)
+    except AtCapacity as exc:
+        return _at_capacity(exc)
 
-        edge_url = f"{SUPABASE_URL}/functions/v1/voice-engine"
-        headers  = {"Authorization": f"Bearer {SUPABASE_SERVICE_KEY}"}
 
-        async with _aio.ClientSession() as session:
-            async with session.post(edge_url, data=form_data, headers=headers) as resp:
-                body = await resp.read()
-                ct   = resp.headers.get("Content-Type", "audio/mpeg")
-                response_text = resp.headers.get("X-Response-Text", "")
-                tts_failed    = resp.headers.get("X-TTS-Failed", "")
-
-                result_headers = {}
-                if response_text:
-                    result_headers["X-Response-Text"] = response_text
-                if tts_failed:
-                    result_headers["X-TTS-Failed"] = tts_failed
-
-                return web.Response(body=body, content_type=ct, headers=result_headers)
+async def _proxy_voice_query(request: web.Request) -> web.StreamResponse:
+    response: Optional[web.StreamResponse] = None
+    try:
+        reader   = await request.multipart()
+        boundary = uuid.uuid4().hex
+        edge_url = f"{SUPABASE_URL}/functions/v1/voice-engine"
+        headers  = {
+            "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+            "Content-Type":  f"multipart/form-data; boundary={boundary}",
+        }
+
+        session: aiohttp.ClientSession = request.app["http"]
+        t0 = time.perf_counter()
+        try:
+            upstream = await session.post(edge_url, data=_relay_multipart(reader, boundary), headers=headers)
+        except Exception:
+            UPSTREAM_ERRORS.inc("voice-engine", "error")
+            raise
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - t0, "voice-engine", "/functions/v1/voice-engine")
+        if upstream.status >= 400:
+            UPSTREAM_ERRORS.inc("voice-engine", str(upstream.status))
+
+        async with upstream as resp:
+            result_headers = {"Content-Type": resp.headers.get("Content-Type", "audio/mpeg")}
+            for name in ("X-Response-Text", "X-TTS-Failed"):
+                if resp.headers.get(name):
+                    result_headers[name] = resp.headers[name]
+
+            response = web.StreamResponse(status=resp.status, headers=result_headers)
+            await response.prepare(request)
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_BYTES):
+                await response.write(chunk)
+            await response.write_eof()
+            return response
 
     except Exception as exc:
         logger.exception(f"Voice query error: {exc}")
+        if response is not None and response.prepared:
+            # Headers are already out — all we can do is cut the stream short.
+            return response
         return web.json_response({"error": str(exc)}, status=500)
 
 
@@ -173,8 +500,12 @@ async def handle_start(request: web.Request) -> web.Response:
 
     profile_id = body.get("profile_id", "")
 
-    loop = asyncio.get_event_loop()
-    room = await loop.run_in_executor(None, create_daily_room)
+    try:
+        await request.app["capacity"].admit("/start", ADMISSION_QUEUE_SECS)
+    except AtCapacity as exc:
+        return _at_capacity(exc)
+
+    room = await get_room(request.app)
 
     if room:
         logger.info(f"🚀 Voice session started for profile: {profile_id}")
@@ -185,6 +516,56 @@ async def handle_start(request: web.Request) -> web.Response:
 
 # ── App setup ─────────────────────────────────────────────────────────────────
 
+async def _open_http_session(app: web.Application) -> None:
+    # One pooled, keep-alive session for all upstream calls in this process.
+    app["http"] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=UPSTREAM_POOL_SIZE, keepalive_timeout=60),
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+    )
+
+
+async def _close_http_session(app: web.Application) -> None:
+    await app["http"].close()
+
+
+async def _start_room_pool(app: web.Application) -> None:
+    if DAILY_API_KEY and ROOM_POOL_SIZE > 0:
+        app["rooms"] = RoomPool(
+            app["http"], ROOM_POOL_SIZE, ROOM_POOL_REFILL_RPS, ROOM_POOL_BURST, ROOM_MIN_TTL_SECS,
+        )
+        app["rooms"].start()
+
+
+async def _stop_room_pool(app: web.Application) -> None:
+    if app.get("rooms"):
+        await app["rooms"].stop()
+
+
+async def _start_capacity(app: web.Application) -> None:
+    app["capacity"] = CapacityManager(MAX_SESSIONS, MAX_LOOP_LAG_MS, MAX_CPU, RETRY_AFTER_SECS)
+    app["capacity"].start()
+
+
+async def _stop_capacity(app: web.Application) -> None:
+    await app["capacity"].stop()
+
+
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[metrics_middleware])
+    app.on_startup.append(_open_http_session)
+    app.on_startup.append(_start_room_pool)
+    app.on_startup.append(_start_capacity)
+    app.on_cleanup.append(_stop_capacity)
+    app.on_cleanup.append(_stop_room_pool)
+    app.on_cleanup.append(_close_http_session)
+    app.router.add_get( "/health",       handle_health)
+    app.router.add_get( "/metrics",      handle_metrics)
+    app.router.add_post("/create-room",  handle_create_room)
+    app.router.add_post("/voice-query",  handle_voice_query)
+    app.router.add_post("/start",        handle_start)
+    return app
+
+
 def main():
     logger.remove()
     logger.add(
@@ -201,15 +582,11 @@ def main():
     logger.info(f"   Supabase    : {'✅' if SUPABASE_URL    else '⚠️  VITE_SUPABASE_URL not set'}")
     logger.info(f"   ElevenLabs  : {'✅' if ELEVEN_LABS_API_KEY else '⚠️  ELEVEN_LABS_API_KEY not set'}")
     logger.info(f"   OpenAI      : {'✅' if OPENAI_API_KEY  else '⚠️  OPENAI_API_KEY not set'}")
+    logger.info(f"   Room pool   : {ROOM_POOL_SIZE if DAILY_API_KEY else 0} warm rooms")
+    logger.info(f"   Capacity    : {MAX_SESSIONS} sessions, lag < {MAX_LOOP_LAG_MS:g}ms, CPU < {MAX_CPU:g}")
     logger.info("=" * 60)
 
-    app = web.Application()
-    app.router.add_get( "/health",       handle_health)
-    app.router.add_post("/create-room",  handle_create_room)
-    app.router.add_post("/voice-query",  handle_voice_query)
-    app.router.add_post("/start",        handle_start)
-
-    web.run_app(app, host="0.0.0.0", port=PORT, access_log=None)
+    web.run_app(create_app(), host="0.0.0.0", port=PORT, access_log=None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+"""In-process BM25 index over stored chunk texts, partitioned by user.
+
+Dense search ranks exact-match questions (course names, "Ho'oponopono",
+event dates, prices) poorly and always costs an embedding call. This index
+covers that side: vector_store.ingest_chunks adds every chunk it upserts,
+and search merges BM25 hits with dense matches.
+
+Chunk texts are persisted in a small SQLite file (LEXICAL_INDEX_PATH); the
+postings are rebuilt in memory from it the first time a user is searched.
+
+Chunks stored before this index existed are only in the vector index, so a
+user counts as covered once vector_store.backfill_lexical has copied them
+in. Until then (and for small corpora, where "rare" and "clear margin"
+mean little) a lexical hit is never confident enough to skip dense search.
+"""
+
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an the and or but if then so of to in on at for with by from as is are was were be been being "
+    "it its this that these those i me my we our you your he she they them their what which who whom "
+    "how why when where do does did can could should would will shall may might must not no "
+    "about into than too very just also there here have has had".split()
+)
+CONFIDENT_MIN_DOCS = 20     # below this, rarity and score margins are noise
+
+
+def tokenize(text: str):
+    """Lowercased word tokens; apostrophes are dropped so Ho'oponopono == hooponopono"""
+    text = re.sub(r"['’`]", "", (text or "").lower())
+    return [t for t in _TOKEN_RE.findall(text) if t not in _STOPWORDS]
+
+
+class LexicalMatch:
+    """Same shape as a Pinecone match, for hits that only the lexical side found"""
+    __slots__ = ("id", "score", "metadata")
+
+    def __init__(self, id: str, score: float, metadata: dict):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+
+    def __repr__(self):
+        return f"LexicalMatch(id={self.id!r}, score={self.score:.3f})"
+
+
+class _UserIndex:
+    def __init__(self):
+        self.docs = {}          # doc id -> (metadata, Counter of terms, length)
+        self.postings = {}      # term -> {doc id: tf}
+        self.total_len = 0
+
+    def add(self, doc_id: str, metadata: dict):
+        self.remove(doc_id)
+        terms = Counter(tokenize(metadata.get("text", "")))
+        length = sum(terms.values())
+        self.docs[doc_id] = (metadata, terms, length)
+        self.total_len += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: str):
+        old = self.docs.pop(doc_id, None)
+        if old is None:
+            return
+        self.total_len -= old[2]
+        for term in old[1]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def idf(self, term: str):
+        n = len(self.docs)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, terms, top_k: int, k1=1.2, b=0.75):
+        """BM25 over the user's docs. Returns [(doc id, score)] best first"""
+        if not self.docs:
+            return []
+        avg_len = self.total_len / len(self.docs) or 1.0
+        scores = {}
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in posting.items():
+                length = self.docs[doc_id][2]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (
+                    tf + k1 * (1 - b + b * length / avg_len))
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+
+
+class LexicalIndex:
+    def __init__(self, path: str = ":memory:"):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id TEXT PRIMARY KEY, user_id TEXT NOT NULL, source TEXT, type TEXT,"
+            " chunk_index INTEGER, text TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_user ON chunks (user_id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS coverage (user_id TEXT PRIMARY KEY, backfilled_at REAL)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._users = {}        # user id -> _UserIndex, loaded on first use
+        self._covered = {uid for (uid,) in self._db.execute("SELECT user_id FROM coverage")}
+
+    def _user(self, user_id: str):
+        index = self._users.get(user_id)
+        if index is None:
+            index = _UserIndex()
+            rows = self._db.execute(
+                "SELECT id, source, type, chunk_index, text FROM chunks WHERE user_id = ?", (user_id,)
+            ).fetchall()
+            for doc_id, source, content_type, chunk_index, text in rows:
+                index.add(doc_id, {"user_id": user_id, "text": text, "source": source,
+                                   "type": content_type, "chunk_index": chunk_index})
+            self._users[user_id] = index
+        return index
+
+    def add(self, vectors: list):
+        """Index upserted vectors ({"id", "metadata"} dicts, as sent to Pinecone)"""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (id, user_id, source, type, chunk_index, text)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(v["id"], v["metadata"]["user_id"], v["metadata"].get("source"), v["metadata"].get("type"),
+                  v["metadata"].get("chunk_index"), v["metadata"].get("text", "")) for v in vectors],
+            )
+            self._db.commit()
+            for v in vectors:
+                loaded = self._users.get(v["metadata"]["user_id"])
+                if loaded is not None:
+                    loaded.add(v["id"], v["metadata"])
+
+    def remove(self, user_id: str, ids: list):
+        """Drop chunks deleted from the vector index"""
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE id = ? AND user_id = ?", [(i, user_id) for i in ids])
+            self._db.commit()
+            loaded = self._users.get(user_id)
+            if loaded is not None:
+                for doc_id in ids:
+                    loaded.remove(doc_id)
+
+    def is_covered(self, user_id: str):
+        """True once every chunk of the user's vector index is in here too"""
+        return user_id in self._covered
+
+    def mark_covered(self, user_id: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO coverage (user_id, backfilled_at) VALUES (?, ?)",
+                             (user_id, time.time()))
+            self._db.commit()
+            self._covered.add(user_id)
+
+    def search(self, user_id: str, query: str, top_k=5):
+        """Returns (matches, confident).
+
+        confident means the user's corpus is fully indexed and has at least
+        CONFIDENT_MIN_DOCS chunks, there are top_k hits, and the best one
+        contains every query term, at least one of them rare in this user's
+        chunks, and clearly beats the runner-up — good enough to answer
+        without dense search.
+        """
+        terms = tokenize(query)
+        with self._lock:
+            index = self._user(user_id)
+            ranked = index.search(terms, max(top_k, 2))
+            matches = [LexicalMatch(doc_id, score, index.docs[doc_id][0]) for doc_id, score in ranked]
+            confident = False
+            if (user_id in self._covered and len(index.docs) >= CONFIDENT_MIN_DOCS
+                    and len(ranked) >= top_k and terms):
+                top_terms = index.docs[ranked[0][0]][1]
+                n = len(index.docs)
+                covers_all = all(t in top_terms for t in terms)
+                has_rare = any(len(index.postings.get(t, ())) <= max(1, 0.02 * n) for t in terms)
+                runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+                confident = covers_all and has_rare and ranked[0][1] >= 1.5 * runner_up
+        return matches[:top_k], confident
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()
+            return {"chunks": count, "users_loaded": len(self._users), "users_covered": len(self._covered)}
+
+
+def reciprocal_rank_fusion(result_lists, top_k: int, k=60):
+    """Merge ranked match lists by id; score = sum of 1 / (k + rank)"""
+    fused, first_seen = {}, {}
+    for matches in result_lists:
+        for rank, match in enumerate(matches):
+            fused[match.id] = fused.get(match.id, 0.0) + 1.0 / (k + rank + 1)
+            first_seen.setdefault(match.id, match)
+    order = sorted(fused, key=lambda doc_id: fused[doc_id], reverse=True)
+    return [first_seen[doc_id] for doc_id in order[:top_k]]
@@ -0,0 +1,309 @@
+"""Local, memory-mapped vector index with the same upsert/query calls as a
+Pinecone index, so vector_store can run without the network.
+
+A store directory holds:
+
+  manifest.json   dim, dtype, row count and per-user segments [[start, count]]
+  vectors.q       quantized unit vectors (int8 or float16), append-only
+  scales.f32      per-row int8 scale (int8 stores only)
+  vectors.f32     full-precision unit vectors, read only to rescore candidates
+  ids.txt         one vector id per row
+  meta.jsonl      one JSON metadata line per row, meta.idx holds their offsets
+  deleted.u8      1 for rows superseded by a later upsert of the same id, or deleted
+
+Opening a store reads only the manifest; the data files are memory-mapped,
+so startup is instant and RAM holds only the pages a search touches. A query
+scans the user's segments of the quantized rows (4x / 2x smaller than
+float32), then rescores the best candidates exactly against vectors.f32.
+The manifest is replaced atomically after the data files are written, so
+rows from an interrupted upsert are ignored and overwritten.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+_DTYPES = {"int8": np.int8, "float16": np.float16}
+SCAN_BLOCK_ROWS = 16384
+
+
+class Match:
+    __slots__ = ("id", "score", "metadata")
+
+    def __init__(self, id: str, score: float, metadata: dict):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+
+    def __repr__(self):
+        return f"Match(id={self.id!r}, score={self.score:.4f})"
+
+
+class QueryResponse:
+    def __init__(self, matches: list):
+        self.matches = matches
+
+
+class Vector:
+    __slots__ = ("id", "values", "metadata")
+
+    def __init__(self, id: str, values: list, metadata: dict):
+        self.id = id
+        self.values = values
+        self.metadata = metadata
+
+
+class FetchResponse:
+    def __init__(self, vectors: dict):
+        self.vectors = vectors
+
+
+def _user_filter(filter):
+    """The user_id a Pinecone-style filter selects, or None for no filter"""
+    value = (filter or {}).get("user_id")
+    if isinstance(value, dict):
+        value = value.get("$eq")
+    return value
+
+
+class LocalVectorIndex:
+    def __init__(self, path: str, dim=1536, dtype="int8", coarse_dims=0, oversample=10):
+        """coarse_dims > 0 scans only that many leading dimensions before the
+        exact rescore (text-embedding-3 vectors keep most of their signal in
+        the leading dimensions); 0 scans them all."""
+        if dtype not in _DTYPES:
+            raise ValueError(f"dtype must be one of {sorted(_DTYPES)}")
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = None            # id -> row, loaded on first upsert
+        self._maps = None
+        os.makedirs(path, exist_ok=True)
+        manifest = os.path.join(path, "manifest.json")
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                self._manifest = json.load(f)
+        else:
+            self._manifest = {"dim": dim, "dtype": dtype, "rows": 0, "segments": {}}
+        self.dim = self._manifest["dim"]
+        self.dtype = self._manifest["dtype"]
+        self._coarse = coarse_dims if 0 < coarse_dims < self.dim else self.dim
+        self._oversample = oversample
+
+    def _file(self, name: str):
+        return os.path.join(self.path, name)
+
+    # ── writing ─────────────────────────────────────────────────────────────
+    def _load_ids(self):
+        if self._ids is None:
+            rows = self._manifest["rows"]
+            ids = []
+            if os.path.exists(self._file("ids.txt")):
+                with open(self._file("ids.txt"), "rb") as f:
+                    ids = f.read().split(b"\n")[:rows]
+            deleted = (np.fromfile(self._file("deleted.u8"), dtype=np.uint8, count=rows)
+                       if rows else np.zeros(0, dtype=np.uint8))
+            self._ids = {vid.decode(): row for row, vid in enumerate(ids) if not deleted[row]}
+            # Drop anything an interrupted upsert wrote past the manifest.
+            q_size = np.dtype(_DTYPES[self.dtype]).itemsize
+            sizes = {"vectors.q": rows * self.dim * q_size, "vectors.f32": rows * self.dim * 4,
+                     "meta.idx": rows * 8, "deleted.u8": rows}
+            if self.dtype == "int8":
+                sizes["scales.f32"] = rows * 4
+            for name, size in sizes.items():
+                with open(self._file(name), "ab") as f:
+                    f.truncate(size)
+            with open(self._file("ids.txt"), "ab") as f:
+                f.truncate(sum(len(vid) + 1 for vid in ids))
+            with open(self._file("meta.jsonl"), "ab") as f:
+                f.truncate(self._meta_end(rows))
+        return self._ids
+
+    def _meta_end(self, rows: int):
+        if rows == 0:
+            return 0
+        last = int(np.fromfile(self._file("meta.idx"), dtype=np.uint64, count=rows)[-1])
+        with open(self._file("meta.jsonl"), "rb") as f:
+            f.seek(last)
+            return last + len(f.readline())
+
+    def _quantize(self, unit):
+        if self.dtype == "float16":
+            return unit.astype(np.float16), None
+        scales = np.abs(unit).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        q = np.clip(np.rint(unit / scales[:, None]), -127, 127).astype(np.int8)
+        return q, scales.astype(np.float32)
+
+    def upsert(self, vectors: list, **_):
+        """Append vectors ({"id", "values", "metadata"} dicts); re-used ids replace their old row"""
+        if not vectors:
+            return {"upserted_count": 0}
+        # An id repeated within the batch keeps only its last occurrence.
+        latest = {v["id"]: i for i, v in enumerate(vectors)}
+        vectors = [v for i, v in enumerate(vectors) if latest[v["id"]] == i]
+        with self._lock:
+            ids = self._load_ids()
+            matrix = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"expected {self.dim}-d vectors, got {matrix.shape[1]}")
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            unit = matrix / norms
+            q, scales = self._quantize(unit)
+
+            start = self._manifest["rows"]
+            superseded = [ids[v["id"]] for v in vectors if v["id"] in ids]
+            with open(self._file("meta.jsonl"), "ab") as f:
+                offset = f.tell()
+                offsets = []
+                for v in vectors:
+                    line = (json.dumps({"id": v["id"], **(v.get("metadata") or {})}) + "\n").encode()
+                    offsets.append(offset)
+                    offset += len(line)
+                    f.write(line)
+            with open(self._file("meta.idx"), "ab") as f:
+                f.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+            with open(self._file("vectors.q"), "ab") as f:
+                f.write(q.tobytes())
+            if scales is not None:
+                with open(self._file("scales.f32"), "ab") as f:
+                    f.write(scales.tobytes())
+            with open(self._file("vectors.f32"), "ab") as f:
+                f.write(unit.tobytes())
+            with open(self._file("ids.txt"), "a") as f:
+                f.write("".join(f"{v['id']}\n" for v in vectors))
+            with open(self._file("deleted.u8"), "ab") as f:
+                f.write(bytes(len(vectors)))
+
+            # Per-user segments; consecutive rows of one user extend one segment.
+            segments = self._manifest["segments"]
+            for offset, v in enumerate(vectors):
+                row = start + offset
+                ids[v["id"]] = row
+                user_segments = segments.setdefault(str((v.get("metadata") or {}).get("user_id")), [])
+                if user_segments and sum(user_segments[-1]) == row:
+                    user_segments[-1][1] += 1
+                else:
+                    user_segments.append([row, 1])
+            self._manifest["rows"] = start + len(vectors)
+            tmp = self._file("manifest.json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._manifest, f)
+            os.replace(tmp, self._file("manifest.json"))
+            # Retire replaced rows only once the new ones are committed.
+            if superseded:
+                with open(self._file("deleted.u8"), "r+b") as f:
+                    for row in superseded:
+                        f.seek(row)
+                        f.write(b"\x01")
+            self._maps = None
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: list, **_):
+        """Retire rows by id, like Pinecone's delete(ids=...); unknown ids are ignored"""
+        with self._lock:
+            known = self._load_ids()
+            rows = [known.pop(vid) for vid in ids if vid in known]
+            if rows:
+                with open(self._file("deleted.u8"), "r+b") as f:
+                    for row in rows:
+                        f.seek(row)
+                        f.write(b"\x01")
+                self._maps = None
+        return {}
+
+    # ── searching ───────────────────────────────────────────────────────────
+    def _mapped(self):
+        if self._maps is None:
+            rows = self._manifest["rows"]
+            if rows == 0:
+                return None
+            self._maps = {
+                "q": np.memmap(self._file("vectors.q"), dtype=_DTYPES[self.dtype], mode="r", shape=(rows, self.dim)),
+                "f32": np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim)),
+                "scales": (np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r", shape=(rows,))
+                           if self.dtype == "int8" else None),
+                "deleted": np.memmap(self._file("deleted.u8"), dtype=np.uint8, mode="r", shape=(rows,)),
+                "meta_idx": np.memmap(self._file("meta.idx"), dtype=np.uint64, mode="r", shape=(rows,)),
+            }
+        return self._maps
+
+    def _segments(self, user_id):
+        if user_id is None:
+            return [[0, self._manifest["rows"]]]
+        return self._manifest["segments"].get(str(user_id), [])
+
+    def _metadata(self, maps, rows):
+        offsets = maps["meta_idx"]
+        out = []
+        with open(self._file("meta.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                out.append(json.loads(f.readline()))
+        return out
+
+    def query(self, vector, top_k=5, filter=None, include_metadata=True, **_):
+        with self._lock:
+            maps = self._mapped()
+            segments = [list(s) for s in self._segments(_user_filter(filter))]
+        if maps is None or not segments:
+            return QueryResponse([])
+
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        coarse_q = q[:self._coarse]
+        scores, rows = [], []
+        for start, count in segments:
+            for s in range(start, start + count, SCAN_BLOCK_ROWS):
+                e = min(s + SCAN_BLOCK_ROWS, start + count)
+                block = maps["q"][s:e, :self._coarse].astype(np.float32) @ coarse_q
+                if maps["scales"] is not None:
+                    block *= maps["scales"][s:e]
+                block[maps["deleted"][s:e] != 0] = -np.inf
+                scores.append(block)
+                rows.append(np.arange(s, e))
+        scores = np.concatenate(scores)
+        rows = np.concatenate(rows)
+
+        n_cand = min(len(scores), max(top_k * self._oversample, 50))
+        cand = np.argpartition(-scores, n_cand - 1)[:n_cand]
+        cand = cand[np.isfinite(scores[cand])]
+        cand_rows = np.sort(rows[cand])
+        exact = maps["f32"][cand_rows] @ q
+        order = np.argsort(-exact)[:top_k]
+        best_rows = cand_rows[order]
+        metadata = self._metadata(maps, best_rows) if len(best_rows) else []
+        matches = []
+        for row, score, meta in zip(best_rows, exact[order], metadata):
+            vid = meta.pop("id")
+            matches.append(Match(vid, float(score), meta if include_metadata else {}))
+        return QueryResponse(matches)
+
+    # ── listing ─────────────────────────────────────────────────────────────
+    def list(self, prefix="", limit=100, **_):
+        """Pages of live ids starting with `prefix`, like Pinecone's list"""
+        with self._lock:
+            live = sorted(vid for vid in self._load_ids() if vid.startswith(prefix))
+        for start in range(0, len(live), limit):
+            yield live[start:start + limit]
+
+    def fetch(self, ids, **_):
+        with self._lock:
+            maps = self._mapped()
+            known = self._load_ids()
+            rows = [known[vid] for vid in ids if vid in known]
+        if maps is None or not rows:
+            return FetchResponse({})
+        vectors = {}
+        for row, meta in zip(rows, self._metadata(maps, rows)):
+            vid = meta.pop("id")
+            vectors[vid] = Vector(vid, maps["f32"][row].tolist(), meta)
+        return FetchResponse(vectors)
+
+    def stats(self):
+        rows = self._manifest["rows"]
+        q_bytes = rows * self.dim * np.dtype(_DTYPES[self.dtype]).itemsize
+        return {"rows": rows, "users": len(self._manifest["segments"]), "dtype": self.dtype,
+                "scan_mb": round(q_bytes / 1024 / 1024, 1)}
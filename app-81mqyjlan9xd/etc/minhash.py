@@ -0,0 +1,70 @@
+"""MinHash fingerprints for near-duplicate text.
+
+The same lesson is re-posted many times (dated re-uploads, clips of a
+longer talk), so many passages differ only in a few words. Text is
+MinHash-fingerprinted over word 5-gram shingles; banded LSH keys let an
+index find earlier passages above NEAR_DUP_THRESHOLD estimated Jaccard.
+
+omni_sync's transcript dedup (miteshbot/dedup_index.py) and the ingest-side
+chunk dedup (app-81mqyjlan9xd/etc/near_dup.py) run in separately deployed
+services, so each carries an identical copy of this file. Edit both copies
+together; miteshbot/test_vendored.py fails when they differ. Signatures are
+persisted by both, so changing the hashing invalidates stored fingerprints.
+Keep it stdlib only.
+"""
+
+import hashlib
+import re
+
+MINHASH_PERMS = 64
+MINHASH_BANDS = 8            # 8 bands x 8 rows: pairs above ~0.77 Jaccard collide
+NEAR_DUP_THRESHOLD = 0.8
+SHINGLE_WORDS = 5
+_OFFSET_BITS = 58            # 64-bit hash = 6 bits of bin + 58 bits of value
+WORD_RE = re.compile(r"\w+")
+
+
+def minhash(text):
+    """MinHash signature over word 5-gram shingles of `text`.
+
+    One-permutation hashing: each shingle is hashed once and kept as the
+    minimum of its bin; empty bins borrow from the next filled bin, tagged
+    with the distance so borrowed values only match equally borrowed ones.
+    """
+    words = WORD_RE.findall((text or "").lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))}
+    bins = [None] * MINHASH_PERMS
+    for sh in shingles:
+        h = int.from_bytes(hashlib.blake2b(sh.encode(), digest_size=8).digest(), "little")
+        b, v = h % MINHASH_PERMS, h // MINHASH_PERMS
+        if bins[b] is None or v < bins[b]:
+            bins[b] = v
+    sig = []
+    for b in range(MINHASH_PERMS):
+        distance = 0
+        while bins[(b + distance) % MINHASH_PERMS] is None:
+            distance += 1
+        sig.append(bins[(b + distance) % MINHASH_PERMS] | distance << _OFFSET_BITS)
+    return tuple(sig)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def band_keys(sig):
+    """(band, key) pairs for LSH lookup; near-duplicates share at least one."""
+    rows = MINHASH_PERMS // MINHASH_BANDS
+    return [
+        (band, hashlib.blake2b(repr(sig[band * rows:(band + 1) * rows]).encode(), digest_size=8).hexdigest())
+        for band in range(MINHASH_BANDS)
+    ]
+
+
+def pack(sig):
+    return b"".join(v.to_bytes(8, "little") for v in sig)
+
+
+def unpack(blob):
+    return tuple(int.from_bytes(blob[i:i + 8], "little") for i in range(0, len(blob), 8))
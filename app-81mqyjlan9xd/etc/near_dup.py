@@ -0,0 +1,83 @@
+"""Near-duplicate chunk detection for ingest, partitioned by user.
+
+The same lesson is re-posted many times (dated re-uploads, clips of a
+longer talk), so many chunks differ only in a few words. Each chunk is
+MinHash-fingerprinted (minhash.py, the same fingerprints omni_sync's
+transcript dedup uses); banded LSH finds earlier chunks of the same user above
+NEAR_DUP_THRESHOLD estimated Jaccard, and vector_store.ingest_chunks skips
+them instead of embedding them again. A URL-bearing copy replaces a bare
+one, which ingest_chunks then retires.
+
+Fingerprints persist in a small SQLite file (NEAR_DUP_PATH).
+"""
+
+import sqlite3
+import threading
+
+from minhash import NEAR_DUP_THRESHOLD, band_keys, minhash, pack, similarity, unpack
+
+
+class NearDupIndex:
+    def __init__(self, path: str = ":memory:", threshold=NEAR_DUP_THRESHOLD):
+        self.threshold = threshold
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " id TEXT PRIMARY KEY, user_id TEXT NOT NULL, has_url INTEGER, signature BLOB)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS bands (user_id TEXT, band INTEGER, key TEXT, chunk_id TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_key ON bands (user_id, band, key)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_chunk ON bands (chunk_id)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def find(self, user_id: str, signature, skip=None):
+        """Best earlier chunk at or above the threshold: (id, has_url, similarity) or None.
+
+        A URL-bearing copy beats a bare one, so the canonical chunk is the
+        one that can be cited. Chunk ids for which skip(id) is true are
+        never returned.
+        """
+        best = None
+        with self._lock:
+            candidates = set()
+            for band, key in band_keys(signature):
+                candidates.update(cid for (cid,) in self._db.execute(
+                    "SELECT chunk_id FROM bands WHERE user_id = ? AND band = ? AND key = ?", (user_id, band, key)
+                ))
+            for cid in candidates:
+                if skip is not None and skip(cid):
+                    continue
+                row = self._db.execute("SELECT has_url, signature FROM fingerprints WHERE id = ?", (cid,)).fetchone()
+                if row is None:
+                    continue
+                score = similarity(signature, unpack(row[1]))
+                if score >= self.threshold and (best is None or (row[0], score) > (best[1], best[2])):
+                    best = (cid, bool(row[0]), score)
+        return best
+
+    def add(self, user_id: str, chunk_id: str, signature, has_url=False):
+        """Record a stored chunk's fingerprint; re-adding an id replaces it"""
+        with self._lock:
+            self._db.execute("DELETE FROM bands WHERE chunk_id = ?", (chunk_id,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints (id, user_id, has_url, signature) VALUES (?, ?, ?, ?)",
+                (chunk_id, user_id, int(bool(has_url)), pack(signature)),
+            )
+            self._db.executemany(
+                "INSERT INTO bands (user_id, band, key, chunk_id) VALUES (?, ?, ?, ?)",
+                [(user_id, band, key, chunk_id) for band, key in band_keys(signature)],
+            )
+            self._db.commit()
+
+    def forget(self, chunk_ids):
+        """Drop fingerprints of chunks that were never stored or have been retired"""
+        with self._lock:
+            self._db.executemany("DELETE FROM bands WHERE chunk_id = ?", [(cid,) for cid in chunk_ids])
+            self._db.executemany("DELETE FROM fingerprints WHERE id = ?", [(cid,) for cid in chunk_ids])
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM fingerprints").fetchone()
+            return {"fingerprints": count}
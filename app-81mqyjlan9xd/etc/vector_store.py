@@ -1,15 +1,65 @@
-from pinecone import Pinecone
 import openai
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
 from dotenv import load_dotenv
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from near_dup import NearDupIndex, minhash
 
 load_dotenv()
 
+# Index backend: anything with Pinecone's calls —
+#   upsert(vectors=[{"id", "values", "metadata"}])
+#   query(vector=, top_k=, filter={"user_id": ...}, include_metadata=True).matches
+#   delete(ids=[...]), list(prefix=, limit=) and fetch(ids=[...]).vectors
+# VECTOR_BACKEND=pinecone (default) or local: a memory-mapped, quantized store
+# in LOCAL_VECTOR_DIR that needs no network (see local_vectors.py).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+
+def open_index(backend: str = VECTOR_BACKEND):
+    """Open the configured index backend"""
+    if backend == "local":
+        from local_vectors import LocalVectorIndex
+        return LocalVectorIndex(
+            os.getenv("LOCAL_VECTOR_DIR", "local_vectors"),
+            dtype=os.getenv("LOCAL_VECTOR_DTYPE", "int8"),
+            coarse_dims=int(os.getenv("LOCAL_VECTOR_COARSE_DIMS", "0")),
+        )
+    if backend == "pinecone":
+        from pinecone import Pinecone
+        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+        # PINECONE_INDEX_HOST points at a specific index host (e.g. a local stand-in)
+        if os.getenv("PINECONE_INDEX_HOST"):
+            return pc.Index(host=os.getenv("PINECONE_INDEX_HOST"))
+        return pc.Index("database-storage")  # ← Use your existing index!
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
 # Initialize
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index("database-storage")  # ← Use your existing index!
+index = open_index()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Query-result cache: (user_id, normalized query, top_k) -> matches.
+# Entries for a user are dropped whenever ingest_chunks writes to that user.
+RESULT_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "10000"))
+MAX_EMBED_INPUTS = 2048  # OpenAI per-request input limit
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+# Hybrid search: a BM25 index over every stored chunk, fused with dense
+# results. A confident lexical hit (exact course names, dates, prices)
+# answers without an embedding call. Chunk texts persist in LEXICAL_INDEX_PATH.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+lexical = LexicalIndex(os.getenv("LEXICAL_INDEX_PATH", "lexical_index.db")) if HYBRID_SEARCH else None
+
+# Near-duplicate chunks (re-posted lessons) are skipped before embedding and
+# reported against the chunk they duplicate. Fingerprints persist in NEAR_DUP_PATH.
+NEAR_DUP = os.getenv("NEAR_DUP", "1") == "1"
+near_dup = NearDupIndex(os.getenv("NEAR_DUP_PATH", "near_dup.db")) if NEAR_DUP else None
+
 def generate_embedding(text: str):
     """Convert text to vector"""
     response = openai.embeddings.create(
@@ -18,42 +68,312 @@ def generate_embedding(text: str):
     )
     return response.data[0].embedding
 
-def store_chunks(user_id: str, chunks: list, source_name: str, content_type: str):
+def generate_embeddings(texts: list):
+    """Convert a batch of texts to vectors in one API call. Returns (vectors, tokens)"""
+    response = openai.embeddings.create(
+        model="text-embedding-3-small",
+        input=texts
+    )
+    vectors = [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+    return vectors, response.usage.total_tokens
+
+def _with_retry(fn, *args, max_retries=5, base_delay=1.0):
+    """Call fn, retrying with exponential backoff + jitter on any error"""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = base_delay * (2 ** attempt) * (0.5 + random.random())
+            print(f"⚠️ {fn.__name__} failed ({e}), retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+def _batches(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+def ingest_chunks(user_id: str, chunks, source_name: str, content_type: str,
+                  batch_size=100, concurrency=4, upsert_page=100, max_retries=5, source_url: str = None):
+    """Stream chunks (any iterable/generator) into Pinecone.
+
+    Chunks are embedded in multi-input batches with up to `concurrency`
+    batches in flight, and upserted in pages of `upsert_page` as batches
+    finish — memory stays bounded by the in-flight window, not the input.
+    Near-duplicates of chunks the user already has are skipped unless this
+    copy carries a source_url and the existing one does not; that bare copy
+    is then retired (deleted from both indexes) once this one is stored.
+    Returns a throughput report, including what was collapsed and retired.
+    """
+    start = time.perf_counter()
+    stored = 0
+    tokens = 0
+    pending_vectors = []
+    collapsed = []
+    fingerprinted = set()
+    superseded = []  # (new chunk id, bare chunk id it replaces)
+    stored_ids = set()
+
+    def chunk_id(i):
+        return f"{user_id}_{source_name}_{i}"
+
+    def stale(cid):
+        # This source's chunks from an earlier ingest are overwritten by this
+        # run, so only chunks registered during this run can be canonical.
+        return cid.startswith(chunk_id("")) and cid not in fingerprinted
+
+    def novel(first_index, batch):
+        """(index, text) pairs of the batch that are not near-duplicates"""
+        if near_dup is None:
+            return list(enumerate(batch, first_index))
+        items = []
+        for i, text in enumerate(batch, first_index):
+            signature = minhash(text)
+            match = near_dup.find(user_id, signature, skip=stale)
+            if match is not None and (match[1] or not source_url):
+                collapsed.append({"chunk": i, "canonical": match[0], "similarity": round(match[2], 3)})
+                continue
+            if match is not None:
+                superseded.append((chunk_id(i), match[0]))
+            # Registered now so later chunks of the same input collapse onto it.
+            near_dup.add(user_id, chunk_id(i), signature, has_url=bool(source_url))
+            fingerprinted.add(chunk_id(i))
+            items.append((i, text))
+        return items
+
+    def embed_batch(items):
+        vectors, used = _with_retry(generate_embeddings, [text for _, text in items], max_retries=max_retries)
+        return items, vectors, used
+
+    def upsert(vectors):
+        index.upsert(vectors=vectors)
+
+    def delete(ids):
+        index.delete(ids=ids)
+
+    def flush(final=False):
+        nonlocal stored
+        while len(pending_vectors) >= upsert_page or (final and pending_vectors):
+            page = pending_vectors[:upsert_page]
+            del pending_vectors[:upsert_page]
+            _with_retry(upsert, page, max_retries=max_retries)
+            if lexical is not None:
+                lexical.add(page)
+            invalidate_search_cache(user_id)
+            stored += len(page)
+            stored_ids.update(v["id"] for v in page)
+
+    def drain(in_flight, return_when):
+        nonlocal tokens
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            in_flight.discard(future)
+            items, vectors, used = future.result()
+            tokens += used
+            for (i, chunk), embedding in zip(items, vectors):
+                metadata = {
+                    "user_id": user_id,
+                    "text": chunk,
+                    "source": source_name,
+                    "type": content_type,
+                    "chunk_index": i
+                }
+                if source_url:
+                    metadata["source_url"] = source_url
+                pending_vectors.append({"id": chunk_id(i), "values": embedding, "metadata": metadata})
+        flush()
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = set()
+            next_index = 0
+            for batch in _batches(chunks, batch_size):
+                items = novel(next_index, batch)
+                next_index += len(batch)
+                if not items:
+                    continue
+                if len(in_flight) >= concurrency:
+                    drain(in_flight, FIRST_COMPLETED)
+                in_flight.add(pool.submit(embed_batch, items))
+
+            while in_flight:
+                drain(in_flight, FIRST_COMPLETED)
+            flush(final=True)
+    except Exception:
+        # Chunks that never reached the index must not shadow a retry.
+        if near_dup is not None:
+            near_dup.forget([cid for cid in fingerprinted if cid not in stored_ids])
+        raise
+
+    # Bare copies replaced by a stored, citable one leave both indexes.
+    retired = sorted({old for new, old in superseded if new in stored_ids and old not in stored_ids})
+    if retired:
+        try:
+            _with_retry(delete, retired, max_retries=max_retries)
+        except Exception as e:
+            print(f"⚠️ Could not retire {len(retired)} superseded chunks ({e}) — they stay searchable")
+            retired = []
+        else:
+            if lexical is not None:
+                lexical.remove(user_id, retired)
+            if near_dup is not None:
+                near_dup.forget(retired)
+            invalidate_search_cache(user_id)
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    report = {
+        "chunks": stored,
+        "tokens": tokens,
+        "seconds": round(elapsed, 2),
+        "chunks_per_sec": round(stored / elapsed, 1),
+        "tokens_per_sec": round(tokens / elapsed, 1),
+        "duplicates": len(collapsed),
+        "collapsed": collapsed,
+        "retired": retired,
+    }
+    if collapsed:
+        print(f"🧬 Skipped {len(collapsed)} near-duplicate chunks of {source_name} "
+              f"(e.g. chunk {collapsed[0]['chunk']} ≈ {collapsed[0]['canonical']})")
+    if retired:
+        print(f"🧬 Retired {len(retired)} chunks superseded by cited copies in {source_name}")
+    print(f"📊 Ingested {stored} chunks / {tokens} tokens in {report['seconds']}s "
+          f"({report['chunks_per_sec']} chunks/s, {report['tokens_per_sec']} tokens/s)")
+    return report
+
+def _cache_key(user_id: str, query: str, top_k: int):
+    return (user_id, " ".join(query.lower().split()), top_k)
+
+def _cache_get(key):
+    with _result_cache_lock:
+        matches = _result_cache.get(key)
+        if matches is not None:
+            _result_cache.move_to_end(key)
+        return matches
+
+def _cache_put(key, matches):
+    with _result_cache_lock:
+        _result_cache[key] = matches
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+def invalidate_search_cache(user_id: str):
+    """Drop cached search results for one user"""
+    with _result_cache_lock:
+        for key in [k for k in _result_cache if k[0] == user_id]:
+            del _result_cache[key]
+
+def store_chunks(user_id: str, chunks: list, source_name: str, content_type: str, source_url: str = None):
     """Store text chunks in Pinecone"""
-    vectors = []
-    
-    for i, chunk in enumerate(chunks):
-        vector_id = f"{user_id}_{source_name}_{i}"
-        embedding = generate_embedding(chunk)
-        
-        vectors.append({
-            "id": vector_id,
-            "values": embedding,
-            "metadata": {
-                "user_id": user_id,
-                "text": chunk,
-                "source": source_name,
-                "type": content_type,
-                "chunk_index": i
-            }
-        })
-    
-    # Upload to Pinecone
-    index.upsert(vectors=vectors)
-    return len(vectors)
+    return ingest_chunks(user_id, chunks, source_name, content_type, source_url=source_url)["chunks"]
+
+_backfills = {}  # user_id -> (Thread copying their chunks into the lexical index, started at)
+_backfills_lock = threading.Lock()
+BACKFILL_RETRY_SECS = 600
+
+def backfill_lexical(user_id: str, page_size=100):
+    """Copy a user's chunks from the vector index into the lexical index.
+
+    Chunks stored before hybrid search existed are only in the vector
+    index; until they are copied, lexical hits never skip dense search.
+    """
+    if lexical is None or lexical.is_covered(user_id):
+        return
+    copied = 0
+    try:
+        for ids in index.list(prefix=f"{user_id}_", limit=page_size):
+            # older clients yield lists of ids, newer ones ListResponse pages
+            ids = [getattr(v, "id", v) for v in getattr(ids, "vectors", ids)]
+            fetched = index.fetch(ids=ids).vectors
+            page = [{"id": vid, "metadata": dict(v.metadata or {})} for vid, v in fetched.items()]
+            page = [v for v in page if v["metadata"].get("user_id") == user_id and v["metadata"].get("text")]
+            if page:
+                lexical.add(page)
+                copied += len(page)
+    except Exception as e:
+        print(f"⚠️ Lexical backfill for {user_id} failed after {copied} chunks ({e}) — dense search stays on")
+        return
+    lexical.mark_covered(user_id)
+    invalidate_search_cache(user_id)
+    print(f"🔤 Lexical index backfilled {copied} chunks for {user_id}")
+
+def _ensure_backfill(user_id: str):
+    """Start backfill_lexical for a user in the background, once"""
+    if lexical is None or lexical.is_covered(user_id):
+        return
+    with _backfills_lock:
+        previous = _backfills.get(user_id)
+        if previous is not None and (previous[0].is_alive()
+                                     or time.monotonic() - previous[1] < BACKFILL_RETRY_SECS):
+            return
+        thread = threading.Thread(target=backfill_lexical, args=(user_id,), daemon=True,
+                                  name=f"lexical-backfill-{user_id}")
+        _backfills[user_id] = (thread, time.monotonic())
+        thread.start()
+
+def search_many(user_id: str, queries: list, top_k=5, concurrency=8):
+    """Search many queries at once. Returns one match list per query, in order.
+
+    Uncached queries are embedded in a single request (split only at the API's
+    input limit) and their index queries run concurrently. With HYBRID_SEARCH,
+    dense and BM25 results are merged by reciprocal rank fusion, and queries
+    with a confident lexical hit skip the embedding and the index query.
+    """
+    results = [None] * len(queries)
+    todo = {}  # cache key -> [positions]
+    for pos, query in enumerate(queries):
+        key = _cache_key(user_id, query, top_k)
+        cached = _cache_get(key)
+        if cached is not None:
+            results[pos] = cached
+        else:
+            todo.setdefault(key, []).append(pos)
+
+    lexical_hits = {}
+    if todo and lexical is not None:
+        _ensure_backfill(user_id)
+        for key in list(todo):
+            matches, confident = lexical.search(user_id, queries[todo[key][0]], top_k)
+            if confident:
+                _cache_put(key, matches)
+                for pos in todo.pop(key):
+                    results[pos] = matches
+            else:
+                lexical_hits[key] = matches
+
+    if todo:
+        keys = list(todo)
+        texts = [queries[todo[k][0]] for k in keys]
+        embeddings = []
+        for start in range(0, len(texts), MAX_EMBED_INPUTS):
+            vectors, _ = _with_retry(generate_embeddings, texts[start:start + MAX_EMBED_INPUTS])
+            embeddings.extend(vectors)
+
+        def query_index(embedding):
+            return index.query(
+                vector=embedding,
+                top_k=top_k,
+                filter={"user_id": user_id},
+                include_metadata=True
+            ).matches
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(keys))) as pool:
+            for key, matches in zip(keys, pool.map(query_index, embeddings)):
+                if lexical_hits.get(key):
+                    matches = reciprocal_rank_fusion([matches, lexical_hits[key]], top_k)
+                _cache_put(key, matches)
+                for pos in todo[key]:
+                    results[pos] = matches
+
+    return results
 
 def search_content(user_id: str, query: str, top_k=5):
     """Search for relevant content"""
-    query_embedding = generate_embedding(query)
-    
-    results = index.query(
-        vector=query_embedding,
-        top_k=top_k,
-        filter={"user_id": user_id},
-        include_metadata=True
-    )
-    
-    return results.matches
+    return search_many(user_id, [query], top_k=top_k)[0]
 
 # Test it
 if __name__ == "__main__":
@@ -1,21 +1,37 @@
 #!/usr/bin/env python3
 """
-Omni Sync Worker — Python-based periodic sync for all active integrations.
+Omni Sync Worker — Python-based per-profile scheduler for all active integrations.
 
-Runs on a configurable interval (default: 30 min) and:
-  1. Triggers the sync-drive Supabase Edge Function to pull fresh Google Drive content
-  2. Logs sync health / status for monitoring
+Instead of one global sync_all call per cycle, every active Google Drive
+integration is its own job:
+  1. Active integrations are re-enumerated every SYNC_DISCOVERY_INTERVAL
+  2. Due profiles are synced via sync-drive (action=sync_individual) on a
+     bounded thread pool, so one slow profile never delays the others
+  3. Each profile's interval adapts to how often its content actually
+     changes: new items halve it, quiet syncs stretch it (within min/max)
+  4. Failures and timeouts back off exponentially; every schedule is jittered
+  5. The real outcome of each sync (ok / failed / timeout + item count) is
+     logged and persisted to SYNC_STATE_PATH so schedules survive restarts
 
 Environment variables required (from .env):
   VITE_SUPABASE_URL          — Supabase project URL
   SUPABASE_SERVICE_ROLE_KEY  — Supabase service role key (never hardcode this)
-  SYNC_INTERVAL              — Seconds between sync cycles (optional, default 1800)
+  SYNC_INTERVAL              — Starting per-profile interval in seconds (optional, default 1800)
 """
 
+import json
+import logging
 import os
+import random
+import threading
 import time
-import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,6 +45,16 @@ SUPABASE_URL      = os.environ.get("VITE_SUPABASE_URL", "").rstrip("/")
 SERVICE_ROLE_KEY  = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
 SYNC_INTERVAL     = int(os.environ.get("SYNC_INTERVAL", "1800"))   # 30 min default
 
+SYNC_MIN_INTERVAL       = int(os.environ.get("SYNC_MIN_INTERVAL", "300"))      # busiest profiles
+SYNC_MAX_INTERVAL       = int(os.environ.get("SYNC_MAX_INTERVAL", "21600"))    # quietest profiles (6 h)
+SYNC_CONCURRENCY        = int(os.environ.get("SYNC_CONCURRENCY", "4"))
+SYNC_REQUEST_TIMEOUT    = int(os.environ.get("SYNC_REQUEST_TIMEOUT", "150"))   # edge-function wall clock
+SYNC_DISCOVERY_INTERVAL = int(os.environ.get("SYNC_DISCOVERY_INTERVAL", "300"))
+SYNC_BACKOFF_BASE       = int(os.environ.get("SYNC_BACKOFF_BASE", "60"))
+SYNC_JITTER             = float(os.environ.get("SYNC_JITTER", "0.1"))          # ±10 %
+SYNC_STATE_PATH         = os.environ.get("SYNC_STATE_PATH", "omni_sync_state.json")
+SCHEDULER_TICK          = 10
+
 
 def _headers() -> dict:
     return {
@@ -38,40 +64,209 @@ def _headers() -> dict:
     }
 
 
-def trigger_sync_all() -> bool:
-    """Call the sync-drive Edge Function with action=sync_all."""
-    import urllib.request
-    import json
+def _jittered(seconds: float) -> float:
+    return seconds * random.uniform(1 - SYNC_JITTER, 1 + SYNC_JITTER)
+
+
+# ── Supabase calls ────────────────────────────────────────────────────────────
+
+def list_active_integrations() -> Optional[List[dict]]:
+    """Active Google Drive integrations: [{profile_id, metadata}], or None on error."""
+    query = urllib.parse.urlencode({
+        "select":    "profile_id,metadata",
+        "platform":  "eq.google_drive",
+        "is_active": "eq.true",
+    })
+    req = urllib.request.Request(f"{SUPABASE_URL}/rest/v1/user_integrations?{query}", headers=_headers())
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return json.loads(resp.read().decode())
+    except Exception as exc:
+        logger.error(f"❌ Could not list integrations: {exc}")
+        return None
+
 
+def sync_profile(profile_id: str, folder_url: Optional[str]) -> dict:
+    """
+    Sync one profile via sync-drive and report what actually happened.
+    Returns {"status": "ok"|"failed"|"timeout", "count": int, "error": str|None}.
+    """
     url     = f"{SUPABASE_URL}/functions/v1/sync-drive"
-    payload = json.dumps({"action": "sync_all"}).encode()
+    payload = {"action": "sync_individual", "profileId": profile_id}
+    if folder_url:
+        payload["driveFolderUrl"] = folder_url
 
     req = urllib.request.Request(
         url,
-        data=payload,
+        data=json.dumps(payload).encode(),
         headers=_headers(),
         method="POST",
     )
 
     try:
-        with urllib.request.urlopen(req, timeout=55) as resp:
-            body = resp.read().decode()
-            logger.info(f"✅ sync-drive responded {resp.status}: {body[:200]}")
-            return True
-
+        with urllib.request.urlopen(req, timeout=SYNC_REQUEST_TIMEOUT) as resp:
+            body = json.loads(resp.read().decode() or "{}")
     except urllib.error.HTTPError as exc:
         body = exc.read().decode() if exc.fp else ""
-        logger.warning(f"⚠️  sync-drive HTTP {exc.code}: {body[:200]}")
-        return False
-
+        return {"status": "failed", "count": 0, "error": f"HTTP {exc.code}: {body[:200]}"}
     except TimeoutError:
-        # Edge Function is still running in the background — this is normal.
-        logger.info("⏳ sync-drive timed out (still running in background) — OK")
-        return True
-
+        # We never saw the result — don't pretend it succeeded.
+        return {"status": "timeout", "count": 0, "error": f"no response after {SYNC_REQUEST_TIMEOUT}s"}
+    except urllib.error.URLError as exc:
+        status = "timeout" if isinstance(exc.reason, TimeoutError) else "failed"
+        return {"status": status, "count": 0, "error": str(exc.reason)}
     except Exception as exc:
-        logger.error(f"❌ sync-drive call failed: {exc}")
-        return False
+        return {"status": "failed", "count": 0, "error": str(exc)}
+
+    # sync-drive reports its own errors as 200 + success=false.
+    if not body.get("success"):
+        return {"status": "failed", "count": 0, "error": str(body.get("error") or body)[:200]}
+    return {"status": "ok", "count": int(body.get("count") or 0), "error": None}
+
+
+# ── Scheduling ────────────────────────────────────────────────────────────────
+
+@dataclass
+class ProfileSchedule:
+    profile_id:    str
+    folder_url:    Optional[str] = None
+    interval:      float = SYNC_INTERVAL
+    next_run:      float = 0.0
+    failures:      int = 0
+    last_status:   Optional[str] = None
+    last_count:    int = 0
+    last_finished: Optional[str] = None
+    total_synced:  int = 0
+
+    def record(self, result: dict, now: float) -> None:
+        self.last_status   = result["status"]
+        self.last_count    = result["count"]
+        self.last_finished = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+        if result["status"] == "ok":
+            self.failures = 0
+            self.total_synced += result["count"]
+            if result["count"]:
+                # Content is moving — check back sooner.
+                self.interval = max(SYNC_MIN_INTERVAL, self.interval / 2)
+            else:
+                self.interval = min(SYNC_MAX_INTERVAL, self.interval * 1.5)
+            self.next_run = now + _jittered(self.interval)
+        else:
+            self.failures += 1
+            backoff = min(SYNC_MAX_INTERVAL, SYNC_BACKOFF_BASE * 2 ** (self.failures - 1))
+            self.next_run = now + _jittered(backoff)
+
+
+class SyncScheduler:
+    def __init__(self, state_path: str = SYNC_STATE_PATH, concurrency: int = SYNC_CONCURRENCY) -> None:
+        self._state_path = state_path
+        self._pool       = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="sync")
+        self._lock       = threading.Lock()
+        self._running: set = set()
+        self._last_discovery = 0.0
+        self.profiles: Dict[str, ProfileSchedule] = self._load_state()
+
+    # ── persistence ──
+    def _load_state(self) -> Dict[str, ProfileSchedule]:
+        try:
+            with open(self._state_path) as f:
+                rows = json.load(f)
+            return {r["profile_id"]: ProfileSchedule(**r) for r in rows}
+        except FileNotFoundError:
+            return {}
+        except Exception as exc:
+            logger.warning(f"⚠️  Ignoring unreadable state file {self._state_path}: {exc}")
+            return {}
+
+    def _save_state(self) -> None:
+        with self._lock:
+            rows = [asdict(p) for p in self.profiles.values()]
+        tmp = f"{self._state_path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(rows, f, indent=1)
+            os.replace(tmp, self._state_path)
+        except OSError as exc:
+            logger.warning(f"⚠️  Could not persist sync state: {exc}")
+
+    # ── discovery ──
+    def discover(self) -> None:
+        integrations = list_active_integrations()
+        if integrations is None:
+            return   # keep the current schedule rather than dropping everyone
+        now = time.time()
+        seen = set()
+        with self._lock:
+            for item in integrations:
+                profile_id = item.get("profile_id")
+                if not profile_id:
+                    continue
+                seen.add(profile_id)
+                folder_url = (item.get("metadata") or {}).get("drive_folder_url")
+                schedule = self.profiles.get(profile_id)
+                if schedule is None:
+                    # Spread first runs out instead of stampeding the edge function.
+                    self.profiles[profile_id] = ProfileSchedule(
+                        profile_id, folder_url, next_run=now + random.uniform(0, SCHEDULER_TICK * 3),
+                    )
+                    logger.info(f"➕ Scheduling new integration for profile {profile_id}")
+                else:
+                    schedule.folder_url = folder_url
+            for profile_id in set(self.profiles) - seen:
+                logger.info(f"➖ Integration for profile {profile_id} is no longer active")
+                del self.profiles[profile_id]
+        logger.info(f"🔎 {len(seen)} active integrations")
+        self._save_state()
+
+    # ── execution ──
+    def _run_one(self, schedule: ProfileSchedule) -> None:
+        t0 = time.time()
+        try:
+            result = sync_profile(schedule.profile_id, schedule.folder_url)
+        except Exception as exc:
+            result = {"status": "failed", "count": 0, "error": str(exc)}
+        elapsed = time.time() - t0
+
+        with self._lock:
+            schedule.record(result, time.time())
+            self._running.discard(schedule.profile_id)
+            next_in = schedule.next_run - time.time()
+
+        if result["status"] == "ok":
+            logger.info(
+                f"✅ {schedule.profile_id}: {result['count']} new item(s) in {elapsed:.1f}s — "
+                f"next in {next_in / 60:.0f} min"
+            )
+        elif result["status"] == "timeout":
+            logger.warning(
+                f"⏳ {schedule.profile_id}: {result['error']} (attempt {schedule.failures}) — "
+                f"retry in {next_in / 60:.1f} min"
+            )
+        else:
+            logger.warning(
+                f"⚠️  {schedule.profile_id}: {result['error']} (attempt {schedule.failures}) — "
+                f"retry in {next_in / 60:.1f} min"
+            )
+        self._save_state()
+
+    def tick(self) -> int:
+        """Submit every due, idle profile. Returns how many were started."""
+        now = time.time()
+        if now - self._last_discovery >= SYNC_DISCOVERY_INTERVAL:
+            self._last_discovery = now
+            self.discover()
+
+        with self._lock:
+            due = [
+                p for p in self.profiles.values()
+                if p.next_run <= now and p.profile_id not in self._running
+            ]
+            for schedule in due:
+                self._running.add(schedule.profile_id)
+        for schedule in sorted(due, key=lambda p: p.next_run):
+            self._pool.submit(self._run_one, schedule)
+        return len(due)
 
 
 def check_env() -> bool:
@@ -84,32 +279,25 @@ def check_env() -> bool:
     return True
 
 
-def run_cycle():
-    ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
-    logger.info(f"🔄 Sync cycle starting at {ts}")
-
-    if not check_env():
-        logger.warning("Skipping cycle — environment not ready")
-        return
-
-    trigger_sync_all()
-    logger.info(f"🏁 Cycle done. Next run in {SYNC_INTERVAL // 60} min.")
-
-
 def main():
     logger.info("=" * 60)
     logger.info("🌐  Omni Sync Worker starting")
-    logger.info(f"    Supabase : {(SUPABASE_URL or 'NOT SET')[:50]}")
-    logger.info(f"    Key set  : {'yes' if SERVICE_ROLE_KEY else 'NO — set SUPABASE_SERVICE_ROLE_KEY'}")
-    logger.info(f"    Interval : {SYNC_INTERVAL}s  ({SYNC_INTERVAL // 60} min)")
+    logger.info(f"    Supabase    : {(SUPABASE_URL or 'NOT SET')[:50]}")
+    logger.info(f"    Key set     : {'yes' if SERVICE_ROLE_KEY else 'NO — set SUPABASE_SERVICE_ROLE_KEY'}")
+    logger.info(f"    Interval    : {SYNC_INTERVAL}s start, {SYNC_MIN_INTERVAL}–{SYNC_MAX_INTERVAL}s adaptive")
+    logger.info(f"    Concurrency : {SYNC_CONCURRENCY}")
     logger.info("=" * 60)
 
-    # Run immediately on startup, then loop
-    run_cycle()
+    while not check_env():
+        logger.warning("Environment not ready — retrying in 60s")
+        time.sleep(60)
 
+    scheduler = SyncScheduler()
     while True:
-        time.sleep(SYNC_INTERVAL)
-        run_cycle()
+        started = scheduler.tick()
+        if started:
+            logger.info(f"🔄 Started {started} profile sync(s)")
+        time.sleep(SCHEDULER_TICK)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,291 @@
+"""Local stand-ins for the external APIs the Python services call.
+
+Each fake is a small aiohttp app with its own fault settings (latency,
+jitter, error rate) so a benchmark run is repeatable, offline and free:
+
+  daily     POST /v1/rooms, /v1/meeting-tokens
+  supabase  GET  /rest/v1/<table>, POST /rest/v1/rpc/<fn>,
+            POST /functions/v1/voice-engine | ingest-content | sync-drive
+  openai    POST /v1/embeddings, /v1/audio/transcriptions
+  pinecone  POST /vectors/upsert, /vectors/delete, /query,
+            GET /vectors/list, /vectors/fetch
+
+Run standalone with `python benchmarks/fakes.py` to point a service at them
+by hand; run.py starts them in a subprocess automatically.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import uuid
+from dataclasses import dataclass
+
+from aiohttp import web
+
+EMBED_DIM = 1536
+SERVICES = ("daily", "supabase", "openai", "pinecone")
+DEFAULT_PORTS = {"daily": 19101, "supabase": 19102, "openai": 19103, "pinecone": 19104}
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+    @classmethod
+    def parse(cls, spec, base=None):
+        """'80' -> 80 ms; '80:0.02' -> 80 ms, 2 % errors; '80~20:0.02' adds ±20 ms jitter."""
+        faults = cls(**vars(base)) if base else cls()
+        latency, _, error = spec.partition(":")
+        latency, _, jitter = latency.partition("~")
+        if latency:
+            faults.latency_ms = float(latency)
+        if jitter:
+            faults.jitter_ms = float(jitter)
+        if error:
+            faults.error_rate = float(error)
+        return faults
+
+
+def _faulty(faults, handler):
+    async def wrapped(request):
+        delay = max(0.0, random.gauss(faults.latency_ms, faults.jitter_ms)) if faults.jitter_ms else faults.latency_ms
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if faults.error_rate and random.random() < faults.error_rate:
+            # Drain the body so the client sees a clean 5xx instead of a reset.
+            await request.read()
+            return web.json_response({"error": "injected failure"}, status=503)
+        return await handler(request)
+    return wrapped
+
+
+def _vector(text, dim=EMBED_DIM):
+    """Deterministic unit vector for a text, so repeated runs embed identically."""
+    rng = random.Random(hashlib.blake2b(text.encode(), digest_size=8).digest())
+    v = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = sum(x * x for x in v) ** 0.5
+    return [x / norm for x in v]
+
+
+# ── Daily ─────────────────────────────────────────────────────────────────────
+
+def build_daily_app(faults):
+    async def rooms(request):
+        body = await request.json()
+        name = uuid.uuid4().hex[:12]
+        return web.json_response({
+            "name": name,
+            "url": f"https://bench.daily.co/{name}",
+            "config": body.get("properties", {}),
+        })
+
+    async def tokens(request):
+        await request.json()
+        return web.json_response({"token": uuid.uuid4().hex})
+
+    app = web.Application()
+    app.router.add_post("/v1/rooms", _faulty(faults, rooms))
+    app.router.add_post("/v1/meeting-tokens", _faulty(faults, tokens))
+    return app
+
+
+# ── Supabase ──────────────────────────────────────────────────────────────────
+
+def build_supabase_app(faults, audio_kb=64):
+    audio_chunk = b"\xff\xf3" * 512
+
+    async def table(request):
+        if request.headers.get("Accept", "").startswith("application/vnd.pgrst.object"):
+            return web.json_response({"id": "bench", "name": "Bench Profile"})
+        return web.json_response([])
+
+    async def write(request):
+        await request.read()
+        return web.json_response([], status=201)
+
+    async def rpc(request):
+        await request.read()
+        return web.json_response([])
+
+    async def voice_engine(request):
+        # Consume the multipart upload fully, then stream back fake mp3 audio.
+        await request.read()
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg", "X-Response-Text": "ok"})
+        await response.prepare(request)
+        for _ in range(max(1, audio_kb)):
+            await response.write(audio_chunk)
+        await response.write_eof()
+        return response
+
+    async def ingest_content(request):
+        body = await request.json()
+        words = len((body.get("content") or "").split())
+        return web.json_response({"success": True, "chunks": max(1, words // 200)})
+
+    async def sync_drive(request):
+        await request.read()
+        return web.json_response({"success": True, "count": random.choice((0, 0, 0, 1))})
+
+    app = web.Application(client_max_size=256 * 1024 ** 2)
+    app.router.add_get("/rest/v1/{table}", _faulty(faults, table))
+    app.router.add_post("/rest/v1/rpc/{fn}", _faulty(faults, rpc))
+    app.router.add_post("/rest/v1/{table}", _faulty(faults, write))
+    app.router.add_post("/functions/v1/voice-engine", _faulty(faults, voice_engine))
+    app.router.add_post("/functions/v1/ingest-content", _faulty(faults, ingest_content))
+    app.router.add_post("/functions/v1/sync-drive", _faulty(faults, sync_drive))
+    return app
+
+
+# ── OpenAI ────────────────────────────────────────────────────────────────────
+
+def build_openai_app(faults):
+    async def embeddings(request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vec = _vector(str(text))
+            if as_base64:
+                vec = base64.b64encode(struct.pack(f"<{len(vec)}f", *vec)).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vec})
+        tokens = sum(len(str(t).split()) for t in inputs)
+        return web.json_response({
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    async def transcriptions(request):
+        size = len(await request.read())
+        return web.json_response({"text": " ".join(["bench"] * max(1, size // 4000))})
+
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app.router.add_post("/v1/embeddings", _faulty(faults, embeddings))
+    app.router.add_post("/v1/audio/transcriptions", _faulty(faults, transcriptions))
+    return app
+
+
+# ── Pinecone ──────────────────────────────────────────────────────────────────
+
+def build_pinecone_app(faults):
+    vectors = {}
+
+    async def upsert(request):
+        body = await request.json()
+        for v in body.get("vectors", []):
+            vectors[v["id"]] = v.get("metadata", {})
+        return web.json_response({"upsertedCount": len(body.get("vectors", []))})
+
+    async def delete(request):
+        body = await request.json()
+        for i in body.get("ids", []):
+            vectors.pop(i, None)
+        return web.json_response({})
+
+    async def query(request):
+        body = await request.json()
+        user = (body.get("filter") or {}).get("user_id")
+        ids = [i for i, m in vectors.items() if user is None or m.get("user_id") == user]
+        matches = [
+            {"id": i, "score": round(0.9 - n * 0.05, 4), "values": [], "metadata": vectors[i]}
+            for n, i in enumerate(ids[: body.get("topK", 5)])
+        ]
+        return web.json_response({"matches": matches, "namespace": "", "usage": {"readUnits": 1}})
+
+    async def list_ids(request):
+        prefix = request.query.get("prefix", "")
+        limit = int(request.query.get("limit", "100"))
+        start = int(request.query.get("paginationToken", "0"))
+        ids = sorted(i for i in vectors if i.startswith(prefix))
+        page = ids[start:start + limit]
+        body = {"vectors": [{"id": i} for i in page], "namespace": "", "usage": {"readUnits": 1}}
+        if start + limit < len(ids):
+            body["pagination"] = {"next": str(start + limit)}
+        return web.json_response(body)
+
+    async def fetch(request):
+        ids = request.query.getall("ids", [])
+        found = {i: {"id": i, "values": [0.0], "metadata": vectors[i]} for i in ids if i in vectors}
+        return web.json_response({"vectors": found, "namespace": "", "usage": {"readUnits": 1}})
+
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app.router.add_post("/vectors/upsert", _faulty(faults, upsert))
+    app.router.add_post("/vectors/delete", _faulty(faults, delete))
+    app.router.add_post("/query", _faulty(faults, query))
+    app.router.add_get("/vectors/list", _faulty(faults, list_ids))
+    app.router.add_get("/vectors/fetch", _faulty(faults, fetch))
+    return app
+
+
+BUILDERS = {
+    "daily": build_daily_app,
+    "supabase": build_supabase_app,
+    "openai": build_openai_app,
+    "pinecone": build_pinecone_app,
+}
+
+
+async def serve(faults_by_service, ports=DEFAULT_PORTS, host="127.0.0.1"):
+    runners = []
+    for name in SERVICES:
+        runner = web.AppRunner(BUILDERS[name](faults_by_service[name]), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, ports[name]).start()
+        runners.append(runner)
+    return runners
+
+
+def parse_faults(args):
+    base = Faults(args.latency_ms, args.jitter_ms, args.error_rate)
+    faults = {name: base for name in SERVICES}
+    for override in args.fault or []:
+        name, _, spec = override.partition("=")
+        if name not in SERVICES:
+            raise SystemExit(f"unknown service in --fault: {name}")
+        faults[name] = Faults.parse(spec, base)
+    return faults
+
+
+def add_fault_args(parser):
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="base latency for every fake")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="gaussian jitter (stddev)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument(
+        "--fault", action="append", metavar="SERVICE=MS[~JITTER][:ERR]",
+        help="per-service override, e.g. --fault openai=120~30:0.01",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_fault_args(parser)
+    parser.add_argument("--ports", type=json.loads, default=DEFAULT_PORTS, help="JSON {service: port}")
+    args = parser.parse_args()
+    faults = parse_faults(args)
+
+    async def run():
+        await serve(faults, {**DEFAULT_PORTS, **args.ports})
+        for name in SERVICES:
+            f = faults[name]
+            print(f"{name:<9} http://127.0.0.1:{args.ports.get(name, DEFAULT_PORTS[name])}  "
+                  f"{f.latency_ms:g}±{f.jitter_ms:g} ms, {f.error_rate:.1%} errors", flush=True)
+        print("ready", flush=True)
+        while True:
+            await asyncio.sleep(3600)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
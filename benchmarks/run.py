@@ -0,0 +1,391 @@
+"""Offline load tests for the Python services.
+
+Starts the fakes from fakes.py, launches each service against them and
+drives it at a fixed concurrency, then reports p50/p95/p99 latency,
+throughput, error rate and RSS. Nothing leaves the machine.
+
+  python benchmarks/run.py                       # every scenario
+  python benchmarks/run.py bot --concurrency 64  # just the aiohttp voice service
+  python benchmarks/run.py --json out.json --compare last-release.json
+
+Scenarios:
+  bot.create-room     POST /create-room           app-81mqyjlan9xd/bot.py
+  bot.voice-query     POST /voice-query           app-81mqyjlan9xd/bot.py
+  omni.process-media  POST /process_media         miteshbot/omni_sync.py
+  vector.store        store_chunks()              app-81mqyjlan9xd/etc/vector_store.py
+  vector.search       search_content()            app-81mqyjlan9xd/etc/vector_store.py
+
+bot and omni run as subprocesses so their RSS is measured on their own; the
+vector scenarios run in-process and report this process's RSS.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+import aiohttp
+
+import fakes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app-81mqyjlan9xd")
+MITESHBOT_DIR = os.path.join(ROOT, "miteshbot")
+BENCH_KEY = "bench.bench.bench"   # JWT-shaped so client libraries accept it
+BOT_PORT = 19201
+OMNI_PORT = 19202
+
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int
+    concurrency: int
+    errors: int = 0
+    seconds: float = 0.0
+    latencies_ms: list = field(default_factory=list, repr=False)
+    rss_mb: float = 0.0
+    peak_rss_mb: float = 0.0
+
+    def percentile(self, p):
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1)]
+
+    def summary(self):
+        row = {k: v for k, v in asdict(self).items() if k != "latencies_ms"}
+        row.update(
+            p50_ms=round(self.percentile(50), 2),
+            p95_ms=round(self.percentile(95), 2),
+            p99_ms=round(self.percentile(99), 2),
+            max_ms=round(max(self.latencies_ms, default=0), 2),
+            rps=round(self.requests / self.seconds, 1) if self.seconds else 0.0,
+            error_rate=round(self.errors / self.requests, 4) if self.requests else 0.0,
+            seconds=round(self.seconds, 3),
+        )
+        return row
+
+
+# ── Process helpers ───────────────────────────────────────────────────────────
+
+def rss_mb(pid=None):
+    """(current, peak) resident set size in MB, from /proc."""
+    values = {}
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, kb = line.split()[:2]
+                    values[key] = int(kb) / 1024
+    except OSError:
+        pass
+    return round(values.get("VmRSS:", 0.0), 1), round(values.get("VmHWM:", 0.0), 1)
+
+
+def wait_for_port(port, proc, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"process exited early with code {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on :{port} after {timeout:.0f}s")
+
+
+def spawn(args, env, cwd, port, log_path):
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, *args],
+        env={**os.environ, **env},
+        cwd=cwd,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        wait_for_port(port, proc)
+    except RuntimeError as exc:
+        proc.kill()
+        raise RuntimeError(f"{args[0]}: {exc} (see {log_path})")
+    return proc
+
+
+def stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def fake_urls():
+    return {name: f"http://127.0.0.1:{port}" for name, port in fakes.DEFAULT_PORTS.items()}
+
+
+# ── Load generation ───────────────────────────────────────────────────────────
+
+async def drive(scenario, op, concurrency, total, pid=None):
+    """Run op(i) for i in range(total) with `concurrency` in flight at a time."""
+    result = Result(scenario, total, concurrency)
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                ok = await op(i)
+            except Exception:
+                ok = False
+            result.latencies_ms.append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                result.errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.seconds = time.perf_counter() - t0
+    result.rss_mb, result.peak_rss_mb = rss_mb(pid)
+    return result
+
+
+async def warm_up(op, n=5):
+    for i in range(n):
+        try:
+            await op(-1 - i)
+        except Exception:
+            pass
+
+
+# ── Scenarios ─────────────────────────────────────────────────────────────────
+
+async def bench_bot(args, logs):
+    urls = fake_urls()
+    proc = spawn(
+        ["bot.py"],
+        {
+            "BOT_PORT": str(BOT_PORT),
+            "DAILY_API_KEY": BENCH_KEY,
+            "DAILY_API_URL": f"{urls['daily']}/v1",
+            "VITE_SUPABASE_URL": urls["supabase"],
+            "SUPABASE_SERVICE_ROLE_KEY": BENCH_KEY,
+            "ROOM_POOL_SIZE": str(args.room_pool),
+        },
+        APP_DIR, BOT_PORT, os.path.join(logs, "bot.log"),
+    )
+    base = f"http://127.0.0.1:{BOT_PORT}"
+    audio = os.urandom(args.audio_kb * 1024)
+    results = []
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def create_room(_i):
+                async with session.post(f"{base}/create-room") as resp:
+                    body = await resp.json()
+                    return resp.status == 200 and bool(body.get("token"))
+
+            async def voice_query(_i):
+                form = aiohttp.FormData()
+                form.add_field("audio", audio, filename="clip.webm", content_type="audio/webm")
+                form.add_field("profileId", "bench")
+                async with session.post(f"{base}/voice-query", data=form) as resp:
+                    await resp.read()
+                    return resp.status == 200
+
+            for name, op in (("bot.create-room", create_room), ("bot.voice-query", voice_query)):
+                await warm_up(op)
+                results.append(await drive(name, op, args.concurrency, args.requests, proc.pid))
+    finally:
+        stop(proc)
+    return results
+
+
+async def bench_omni(args, logs):
+    urls = fake_urls()
+    work_dir = tempfile.mkdtemp(prefix="omni-bench-")
+    proc = spawn(
+        ["omni_sync.py"],
+        {
+            "OMNI_PORT": str(OMNI_PORT),
+            "OMNI_SYNC_SECRET": "bench",
+            "OMNI_WORK_DIR": work_dir,
+            # Admission path only by default: jobs queue but no yt-dlp/ffmpeg runs.
+            "OMNI_DOWNLOAD_WORKERS": "2" if args.omni_pipeline else "0",
+            "VITE_SUPABASE_URL": urls["supabase"],
+            "SUPABASE_SERVICE_ROLE_KEY": BENCH_KEY,
+            "OPENAI_API_KEY": BENCH_KEY,
+            "OPENAI_BASE_URL": f"{urls['openai']}/v1",
+        },
+        MITESHBOT_DIR, OMNI_PORT, os.path.join(logs, "omni_sync.log"),
+    )
+    base = f"http://127.0.0.1:{OMNI_PORT}"
+    rng = random.Random(7)
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            async def process_media(i):
+                # A share of repeat submissions exercises the dedup / active-job path.
+                n = rng.randrange(max(1, i)) if i > 0 and rng.random() < args.dup_rate else i
+                payload = {
+                    "url": f"https://youtu.be/bench{n:07d}?si=x{i}",
+                    "source": "youtube",
+                    "profileId": "bench",
+                    "userId": "bench",
+                }
+                async with session.post(f"{base}/process_media", json=payload,
+                                        headers={"X-Sync-Secret": "bench"}) as resp:
+                    await resp.read()
+                    return resp.status in (200, 202)
+
+            await warm_up(process_media)
+            return [await drive("omni.process-media", process_media, args.concurrency, args.requests, proc.pid)]
+    finally:
+        stop(proc)
+
+
+async def bench_vector(args, logs):
+    urls = fake_urls()
+    os.environ.update({
+        "OPENAI_API_KEY": BENCH_KEY,
+        "OPENAI_BASE_URL": f"{urls['openai']}/v1",
+        "PINECONE_API_KEY": BENCH_KEY,
+        "PINECONE_INDEX_HOST": urls["pinecone"],
+        "LEXICAL_INDEX_PATH": os.path.join(logs, "lexical_index.db"),
+        "NEAR_DUP_PATH": os.path.join(logs, "near_dup.db"),
+        "VECTOR_BACKEND": args.vector_backend,
+        "LOCAL_VECTOR_DIR": os.path.join(logs, "local_vectors"),
+    })
+    sys.path.insert(0, os.path.join(APP_DIR, "etc"))
+    import vector_store
+
+    rng = random.Random(11)
+    words = "mindset habit goal morning focus energy money client coaching fear growth".split()
+    queries = [" ".join(rng.sample(words, 4)) for _ in range(max(10, args.requests // 4))]
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+    loop = asyncio.get_running_loop()
+
+    def store(i):
+        chunks = [" ".join(rng.choices(words, k=120)) for _ in range(args.chunks_per_doc)]
+        return vector_store.store_chunks(f"user{i % 8}", chunks, f"doc-{i}", "text") == len(chunks)
+
+    def search(i):
+        return isinstance(vector_store.search_content(f"user{i % 8}", rng.choice(queries)), list)
+
+    results = []
+    # vector_store prints an ingest report per call — keep it out of the table.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, fn in (("vector.store", store), ("vector.search", search)):
+            async def op(i, fn=fn):
+                return await loop.run_in_executor(pool, fn, abs(i))
+            await warm_up(op, n=2)
+            results.append(await drive(name, op, args.concurrency, args.requests))
+    pool.shutdown()
+    return results
+
+
+SCENARIOS = {"bot": bench_bot, "omni": bench_omni, "vector": bench_vector}
+
+
+# ── Reporting ─────────────────────────────────────────────────────────────────
+
+COLUMNS = ("scenario", "requests", "concurrency", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms",
+           "error_rate", "rss_mb", "peak_rss_mb")
+
+
+def print_table(rows, baseline=None):
+    print()
+    print("  ".join(f"{c:>12}" if c != "scenario" else f"{c:<20}" for c in COLUMNS))
+    for row in rows:
+        cells = []
+        for c in COLUMNS:
+            cells.append(f"{row[c]:<20}" if c == "scenario" else f"{row[c]:>12}")
+        print("  ".join(cells))
+        old = (baseline or {}).get(row["scenario"])
+        if old:
+            deltas = []
+            for c in ("rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+                if old.get(c):
+                    deltas.append(f"{c} {(row[c] - old[c]) / old[c]:+.1%}")
+            print(f"{'':<20}  vs baseline: " + ", ".join(deltas))
+    print()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--audio-kb", type=int, default=48, help="voice-query upload size")
+    parser.add_argument("--room-pool", type=int, default=0, help="ROOM_POOL_SIZE for bot.py (0 = on demand)")
+    parser.add_argument("--dup-rate", type=float, default=0.2, help="share of repeated /process_media URLs")
+    parser.add_argument("--omni-pipeline", action="store_true",
+                        help="also run omni download workers (needs yt-dlp + ffmpeg)")
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--vector-backend", choices=("pinecone", "local"), default="pinecone",
+                        help="VECTOR_BACKEND for vector_store.py (local = memory-mapped store)")
+    parser.add_argument("--json", metavar="PATH", help="write results here")
+    parser.add_argument("--compare", metavar="PATH", help="print deltas against an earlier --json file")
+    fakes.add_fault_args(parser)
+    args = parser.parse_args()
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    logs = tempfile.mkdtemp(prefix="bench-logs-")
+    fault_args = [f"--latency-ms={args.latency_ms}", f"--jitter-ms={args.jitter_ms}",
+                  f"--error-rate={args.error_rate}", *[f"--fault={f}" for f in args.fault or []]]
+    fake_proc = spawn([os.path.join(os.path.dirname(__file__), "fakes.py"), *fault_args], {},
+                      ROOT, fakes.DEFAULT_PORTS["pinecone"], os.path.join(logs, "fakes.log"))
+
+    rows = []
+    try:
+        for name in args.scenarios:
+            print(f"▶ {name} (concurrency {args.concurrency}, {args.requests} requests per scenario)", flush=True)
+            try:
+                results = asyncio.run(SCENARIOS[name](args, logs))
+            except Exception as exc:
+                print(f"  ✗ {name} failed: {exc}")
+                continue
+            rows.extend(r.summary() for r in results)
+    finally:
+        stop(fake_proc)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    print_table(rows, baseline)
+    print(f"Service logs: {logs}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "revision": git_revision(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "faults": {k: vars(v) for k, v in fakes.parse_faults(args).items()},
+                "args": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+                "results": rows,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
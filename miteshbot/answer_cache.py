@@ -0,0 +1,328 @@
+"""Semantic answer cache for the voice bot.
+
+The voice counterpart of chat-engine's L2 semantic cache: a transcript whose
+embedding is within SIMILARITY_THRESHOLD (cosine) of an earlier question, on
+the same profile and KB version, is answered with the stored response. When
+the original answer's audio was captured the turn skips both the LLM and the
+TTS; otherwise only the LLM is skipped.
+
+  AnswerCache       bounded in-process store, LFU eviction (by entry count
+                    and by total audio bytes), TTL, kb-version checked
+  AnswerCacheGate   after stt: looks a call's first transcript up when its
+                    embedding is already at hand (never waits on the
+                    network) and short-circuits the turn on a hit
+  AnswerRecorder    after tts: captures the spoken answer's audio and stores
+                    it, with the text its `text_tap` saw before tts, for the
+                    question the gate saw
+
+Entries are shared by every caller of a profile, so only answers that
+cannot depend on who is asking are stored: the first question of a call
+(no conversation to lean on), self-contained, and without the caller
+introducing themselves. Lookups follow the same rule: a stored answer
+ignores the conversation so far, so only a call's first question, if
+self-contained, is answered from the cache.
+"""
+
+import asyncio
+import re
+import time
+
+import numpy as np
+from loguru import logger
+from pipecat.frames.frames import (
+    BotStoppedSpeakingFrame,
+    FunctionCallResultFrame,
+    LLMFullResponseEndFrame,
+    LLMTextFrame,
+    TTSAudioRawFrame,
+    TTSSpeakFrame,
+    TranscriptionFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from utterance_cache import audio_frames
+
+SIMILARITY_THRESHOLD = 0.92     # chat-engine uses 0.88–0.92; voice errs on the safe side
+_FAILED_KNOWLEDGE = ("Knowledge search failed.", "Knowledge search timed out.")
+
+# Questions that lean on earlier turns.
+_CONTEXTUAL_RE = re.compile(
+    r"^(and|but|so|also|then|what about|how about)\b"
+    r"|\b(tell me more|what do you mean|you (just )?said|you mentioned|say (that|it) again|repeat (that|it)"
+    r"|explain (that|it|this)|elaborate|go on|that one|the (first|second|third|last) one|why is that|like what)\b",
+    re.IGNORECASE,
+)
+# The caller naming themselves; the answer would likely use the name.
+_PERSONAL_RE = re.compile(r"\b(my name is|my name's|call me|this is \w+ (here|speaking))\b", re.IGNORECASE)
+
+
+def self_contained(question):
+    """True if `question` reads the same no matter who asks or what came before."""
+    words = re.findall(r"\w+", question or "")
+    return len(words) >= 4 and not _CONTEXTUAL_RE.search(question) and not _PERSONAL_RE.search(question)
+
+
+class _Entry:
+    __slots__ = ("profile_id", "question", "text", "audio", "sample_rate", "kb_version", "created", "hits")
+
+    def __init__(self, profile_id, question, text, kb_version, audio=None, sample_rate=None):
+        self.profile_id = profile_id
+        self.question = question
+        self.text = text
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.kb_version = kb_version
+        self.created = time.monotonic()
+        self.hits = 0
+
+
+class AnswerCache:
+    def __init__(self, max_entries=200, threshold=SIMILARITY_THRESHOLD, ttl_secs=86400,
+                 max_audio_bytes=128 * 1024 * 1024, dim=1536):
+        self._threshold = threshold
+        self._ttl = ttl_secs
+        self._max_audio_bytes = max_audio_bytes
+        self._matrix = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries = [None] * max_entries
+        self._audio_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _unit(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _best(self, unit, profile_id):
+        scores = self._matrix @ unit
+        for slot, entry in enumerate(self._entries):
+            if entry is None or entry.profile_id != profile_id:
+                scores[slot] = -1.0
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def _drop(self, slot):
+        entry = self._entries[slot]
+        if entry is not None and entry.audio:
+            self._audio_bytes -= len(entry.audio)
+        self._entries[slot] = None
+        self._matrix[slot] = 0.0
+
+    def lookup(self, embedding, profile_id, kb_version):
+        slot, score = self._best(self._unit(embedding), profile_id)
+        entry = self._entries[slot]
+        if entry is None or score < self._threshold:
+            self.misses += 1
+            return None
+        if entry.kb_version != kb_version or time.monotonic() - entry.created > self._ttl:
+            # The knowledge behind this answer changed (or it aged out).
+            self._drop(slot)
+            self.misses += 1
+            return None
+        entry.hits += 1
+        self.hits += 1
+        logger.info(f"Answer cache hit ({score:.3f}) for '{entry.question}'")
+        return entry
+
+    def _victim(self):
+        """Least-frequently used slot; ties go to the oldest entry."""
+        live = [(e.hits, e.created, slot) for slot, e in enumerate(self._entries) if e is not None]
+        return min(live)[2] if live else None
+
+    def store(self, embedding, profile_id, question, text, kb_version, audio=None, sample_rate=None):
+        unit = self._unit(embedding)
+        slot, score = self._best(unit, profile_id)
+        if self._entries[slot] is None or score < self._threshold:
+            # New question: take a free slot or evict the LFU entry.
+            slot = next((i for i, e in enumerate(self._entries) if e is None), None)
+            if slot is None:
+                slot = self._victim()
+                self.evictions += 1
+        self._drop(slot)
+
+        entry = _Entry(profile_id, question, text, kb_version, audio, sample_rate)
+        self._entries[slot] = entry
+        self._matrix[slot] = unit
+        if audio:
+            self._audio_bytes += len(audio)
+            while self._audio_bytes > self._max_audio_bytes:
+                victim = self._victim()
+                if victim == slot:
+                    # Never evict the entry just stored — pick the next LFU one with audio.
+                    others = [s for s, e in enumerate(self._entries) if e is not None and e.audio and s != slot]
+                    if not others:
+                        break
+                    victim = min(others, key=lambda s: (self._entries[s].hits, self._entries[s].created))
+                self._drop(victim)
+                self.evictions += 1
+
+    def drop_profile(self, profile_id):
+        for slot, entry in enumerate(self._entries):
+            if entry is not None and entry.profile_id == profile_id:
+                self._drop(slot)
+
+    def stats(self):
+        size = sum(e is not None for e in self._entries)
+        total = self.hits + self.misses
+        return {
+            "entries": size,
+            "audio_mb": round(self._audio_bytes / 1024 / 1024, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class _PendingQuestion:
+    def __init__(self, text, embedding, kb_version):
+        self.text = text
+        self.embedding = embedding          # list, or a task still computing it
+        self.kb_version = kb_version
+
+    def ready_embedding(self):
+        if not isinstance(self.embedding, asyncio.Future):
+            return self.embedding
+        if self.embedding.done() and not self.embedding.cancelled() and self.embedding.exception() is None:
+            return self.embedding.result()
+        return None
+
+
+class AnswerCacheGate(FrameProcessor):
+    """Answers a final transcript from the cache, or remembers it for the recorder."""
+
+    def __init__(self, cache, embed, peek, profile_id, kb_version, context, **kwargs):
+        super().__init__(**kwargs)
+        self._cache = cache
+        self._embed = embed                 # async fn(text) -> embedding (shared, single-flight)
+        self._peek = peek                   # fn(text) -> embedding already cached, or None
+        self._profile_id = profile_id
+        self._kb_version = kb_version       # fn() -> current KB version
+        self._context = context
+        self._turns = 0
+        self._embedding_task = None
+        self.pending = None                 # _PendingQuestion for AnswerRecorder
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, TranscriptionFrame) and frame.text.strip():
+            entry = self._lookup(frame.text.strip())
+            if entry is not None:
+                self._context.add_message({"role": "user", "content": frame.text})
+                if entry.audio:
+                    self._context.add_message({"role": "assistant", "content": entry.text})
+                    for audio in audio_frames(entry.audio, entry.sample_rate):
+                        await self.push_frame(audio, direction)
+                else:
+                    # TTS output is aggregated into the context as usual.
+                    await self.push_frame(TTSSpeakFrame(entry.text), direction)
+                return
+
+        await self.push_frame(frame, direction)
+
+    def _lookup(self, text):
+        self.pending = None
+        self._turns += 1
+        # Later turns have a conversation a cached answer would ignore.
+        if self._turns != 1 or not self_contained(text):
+            return None
+        kb_version = self._kb_version()
+        # Usually cached — the RAG prefetch has already embedded this transcript.
+        # Never wait for it here: a miss must reach the LLM without delay.
+        embedding = self._peek(text)
+        if embedding is not None:
+            entry = self._cache.lookup(embedding, self._profile_id, kb_version)
+            if entry is not None:
+                return entry
+        else:
+            # Shielded: this session ending must not cancel a lookup other sessions share.
+            self._embedding_task = asyncio.ensure_future(asyncio.shield(self._embed(text)))
+            embedding = self._embedding_task
+        self.pending = _PendingQuestion(text, embedding, kb_version)
+        return None
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._embedding_task is not None and not self._embedding_task.done():
+            self._embedding_task.cancel()
+
+
+class _AnswerTextTap(FrameProcessor):
+    """Before tts: collects the answer text, which tts consumes."""
+
+    def __init__(self, recorder, **kwargs):
+        super().__init__(**kwargs)
+        self._recorder = recorder
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if self._recorder._gate.pending is not None:
+            self._recorder.on_text_frame(frame)
+        await self.push_frame(frame, direction)
+
+
+class AnswerRecorder(FrameProcessor):
+    """Captures the answer to the gate's pending question and stores it.
+
+    Place `text_tap` between the LLM and tts, and the recorder itself after tts.
+    """
+
+    def __init__(self, cache, gate, profile_id, store_audio=True, max_audio_secs=45, **kwargs):
+        super().__init__(**kwargs)
+        self._cache = cache
+        self._gate = gate
+        self._profile_id = profile_id
+        self._store_audio = store_audio
+        self._max_audio_secs = max_audio_secs
+        self.text_tap = _AnswerTextTap(self)
+        self._reset()
+
+    def _reset(self):
+        self._text = []
+        self._audio = bytearray()
+        self._sample_rate = None
+        self._text_done = False
+        self._usable = True
+        self._audio_ok = self._store_audio
+
+    def on_text_frame(self, frame):
+        if isinstance(frame, LLMTextFrame):
+            self._text.append(frame.text)
+        elif isinstance(frame, LLMFullResponseEndFrame) and self._text:
+            self._text_done = True
+        elif isinstance(frame, FunctionCallResultFrame):
+            result = frame.result or {}
+            if isinstance(result, dict) and result.get("knowledge") in _FAILED_KNOWLEDGE:
+                self._usable = False     # don't pin an answer given without knowledge
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if self._gate.pending is not None:
+            if isinstance(frame, TTSAudioRawFrame) and self._audio_ok:
+                if self._sample_rate in (None, frame.sample_rate) and frame.num_channels == 1:
+                    self._sample_rate = frame.sample_rate
+                    self._audio.extend(frame.audio)
+                else:
+                    self._audio_ok = False
+            elif isinstance(frame, BotStoppedSpeakingFrame) and self._text_done:
+                self._finish()
+
+        await self.push_frame(frame, direction)
+
+    def _finish(self):
+        pending, self._gate.pending = self._gate.pending, None
+        text = "".join(self._text).strip()
+        audio = bytes(self._audio) if self._audio and self._audio_ok else None
+        if audio and self._sample_rate and len(audio) > self._sample_rate * 2 * self._max_audio_secs:
+            audio = None
+        embedding = pending.ready_embedding()
+        if self._usable and text and embedding is not None:
+            self._cache.store(
+                embedding, self._profile_id, pending.text, text, pending.kb_version,
+                audio=audio, sample_rate=self._sample_rate,
+            )
+        self._reset()
@@ -0,0 +1,103 @@
+"""Process-level asset registry shared by every session in the bot process.
+
+When dozens of callers join at the top of a live coaching hour, each session
+used to load its own Silero ONNX model, block on a mind_profile fetch and
+re-render the full system prompt before the pipeline could start. This
+registry does that work once:
+
+  - Silero VAD: one ONNX InferenceSession; each session gets an analyzer that
+    shares it and only owns its small recurrent state.
+  - mind_profile rows: TTL cache with single-flight loading.
+  - Rendered system prompts: cached per profile, re-rendered only when the
+    underlying profile row changes.
+"""
+
+import asyncio
+import copy
+import time
+
+from loguru import logger
+
+try:
+    from pipecat.audio.vad.silero import SileroVADAnalyzer
+except ImportError:
+    try:
+        from pipecat.vad.silero import SileroVADAnalyzer
+    except ImportError:
+        from pipecat.analyzers.vad.silero import SileroVADAnalyzer
+
+
+class SharedSileroVADAnalyzer(SileroVADAnalyzer):
+    """Silero analyzer that reuses an already-loaded ONNX session."""
+
+    def __init__(self, model, *, sample_rate=None, params=None):
+        # Skip SileroVADAnalyzer.__init__ — that is what loads the model file.
+        super(SileroVADAnalyzer, self).__init__(sample_rate=sample_rate, params=params)
+        self._model = copy.copy(model)   # shares .session, fresh state below
+        self._model.reset_states()
+        self._last_reset_time = 0
+
+
+class AssetRegistry:
+    def __init__(self, load_profile, render_prompt, vad_params=None, profile_ttl_secs=300):
+        self._load_profile = load_profile      # async fn(profile_id) -> dict
+        self._render_prompt = render_prompt    # fn(profile dict) -> str
+        self._vad_params = vad_params
+        self._profile_ttl = profile_ttl_secs
+        self._vad_model = None
+        self._profiles = {}                    # profile_id -> (expires_at, row)
+        self._loading = {}                     # profile_id -> asyncio.Task
+        self._prompts = {}                     # profile_id -> (row, prompt)
+
+    # ── VAD ───────────────────────────────────────────────────────────────
+    def preload_vad(self):
+        if self._vad_model is None:
+            t0 = time.perf_counter()
+            self._vad_model = SileroVADAnalyzer(params=self._vad_params)._model
+            logger.info(f"Silero VAD model loaded once in {(time.perf_counter() - t0) * 1000:.0f}ms")
+        return self._vad_model
+
+    def vad_analyzer(self):
+        """A per-session analyzer backed by the shared model."""
+        return SharedSileroVADAnalyzer(self.preload_vad(), params=self._vad_params)
+
+    # ── profiles ──────────────────────────────────────────────────────────
+    async def get_profile(self, profile_id):
+        cached = self._profiles.get(profile_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        task = self._loading.get(profile_id)
+        if task is None:
+            task = asyncio.create_task(self._load(profile_id))
+            self._loading[profile_id] = task
+            task.add_done_callback(lambda _t: self._loading.pop(profile_id, None))
+        row = await asyncio.shield(task)
+        if not row and cached:
+            # Fetch failed — a stale row beats falling back to defaults.
+            return cached[1]
+        return row
+
+    async def _load(self, profile_id):
+        row = await self._load_profile(profile_id)
+        if row:
+            self._profiles[profile_id] = (time.monotonic() + self._profile_ttl, row)
+        return row
+
+    async def get_system_prompt(self, profile_id):
+        row = await self.get_profile(profile_id)
+        cached = self._prompts.get(profile_id)
+        if cached and cached[0] == row:
+            return cached[1]
+        prompt = self._render_prompt(row)
+        self._prompts[profile_id] = (row, prompt)
+        return prompt
+
+    def invalidate(self, profile_id=None):
+        """Drop cached profile rows and prompts (all profiles if profile_id is None)."""
+        if profile_id is None:
+            self._profiles.clear()
+            self._prompts.clear()
+        else:
+            self._profiles.pop(profile_id, None)
+            self._prompts.pop(profile_id, None)
@@ -3,6 +3,9 @@
 import os
 import json
 import asyncio
+import argparse
+import contextvars
+import functools
 from loguru import logger
 from dotenv import load_dotenv
 
@@ -67,9 +70,21 @@ try:
 except ImportError:
     pass
 
-import openai as openai_module
 from supabase import create_client
 
+from embedding_cache import EmbeddingCache
+from knowledge_index import KnowledgeIndex
+from knowledge_packer import pack_knowledge
+from rag_prefetch import RAGPrefetcher
+from retrieval_client import RetrievalClient
+from assets import AssetRegistry
+from capacity import AtCapacity, CapacityManager
+from profile_pool import ProfilePool, resolve_profile_id
+from turn_timeline import TurnObserver, TurnTimeline
+from answer_cache import AnswerCache, AnswerCacheGate, AnswerRecorder
+from context_compactor import ContextCompactor
+from utterance_cache import ScriptedReplies, UtteranceCache, audio_frames, cartesia_pcm, greeting_lines
+
 load_dotenv(override=True)
 
 logger.info("Mitesh Bot v7.0 starting (with Compatibility Fixes)...")
@@ -77,8 +92,11 @@ logger.info("Mitesh Bot v7.0 starting (with Compatibility Fixes)...")
 # ———————————————————— Config ————————————————————
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
-HARDCODED_PROFILE_ID = "1cb7dee0-815f-4278-b93e-062bdf486389"
+# Sessions name their clone profile in the /start body; this is the fallback.
+DEFAULT_PROFILE_ID = os.getenv("DEFAULT_PROFILE_ID", "1cb7dee0-815f-4278-b93e-062bdf486389")
 
+# The sync client is only used by the knowledge index's background loader;
+# everything on the per-turn path goes through the async RetrievalClient.
 supabase = None
 if SUPABASE_URL and SUPABASE_KEY:
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
@@ -86,32 +104,74 @@ if SUPABASE_URL and SUPABASE_KEY:
 else:
     logger.warning("Supabase credentials missing")
 
-oai_client = openai_module.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Process-wide HTTP/2 keep-alive pool shared by every session.
+retrieval = RetrievalClient(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    os.getenv("OPENAI_API_KEY"),
+    max_connections=int(os.getenv("RETRIEVAL_MAX_CONNECTIONS", "100")),
+)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 
 # ———————————————————— RAG ————————————————————
-def fetch_knowledge_sync(query_text):
-    if not supabase or not query_text.strip():
+async def create_embedding(query_text):
+    return await retrieval.embed(query_text, EMBEDDING_MODEL)
+
+
+# Repeated coaching queries skip the embeddings round-trip entirely.
+# EMBED_CACHE_PATH (optional) persists entries across restarts.
+embedding_cache = EmbeddingCache(
+    create_embedding,
+    model=EMBEDDING_MODEL,
+    max_entries=int(os.getenv("EMBED_CACHE_SIZE", "2048")),
+    ttl_secs=int(os.getenv("EMBED_CACHE_TTL", "86400")),
+    disk_path=os.getenv("EMBED_CACHE_PATH") or None,
+)
+
+# Paraphrases of popular questions are answered from earlier turns (text +
+# audio), skipping the LLM and TTS. Entries are tied to the KB version.
+answer_cache = None
+if os.getenv("ANSWER_CACHE", "1") == "1":
+    answer_cache = AnswerCache(
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "200")),
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+        ttl_secs=int(os.getenv("ANSWER_CACHE_TTL", "86400")),
+        max_audio_bytes=int(os.getenv("ANSWER_CACHE_AUDIO_MB", "128")) * 1024 * 1024,
+    )
+
+
+async def match_knowledge(query_embedding, profile, match_threshold=0.35, match_count=5):
+    index = profile.knowledge_index
+    if index is not None and index.ready:
+        return index.search(query_embedding, match_threshold, match_count)
+    return await retrieval.rpc("match_knowledge", {
+        "query_embedding": query_embedding,
+        "match_threshold": match_threshold,
+        "match_count": match_count,
+        "p_profile_id": profile.profile_id,
+    }) or []
+
+
+# Tool results carry the best query-relevant sentences, not chunk prefixes.
+KNOWLEDGE_TOKEN_BUDGET = int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", "400"))
+
+
+async def fetch_knowledge(query_text, profile):
+    # Native async end to end — nothing blocks the event loop (audio in/out),
+    # and a wait_for timeout cancels the HTTP request itself.
+    if not retrieval.supabase_configured or not query_text.strip():
         return "No knowledge available."
     try:
-        embedding_response = oai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=query_text,
-        )
-        query_embedding = embedding_response.data[0].embedding
-
-        result = supabase.rpc("match_knowledge", {
-            "query_embedding": query_embedding,
-            "match_threshold": 0.35,
-            "match_count": 5,
-            "p_profile_id": HARDCODED_PROFILE_ID,
-        }).execute()
+        query_embedding = await embedding_cache.get(query_text)
+        matches = await match_knowledge(query_embedding, profile)
 
-        if result.data and len(result.data) > 0:
-            chunks = [c.get("content", "")[:500] for c in result.data if c.get("content")]
-            knowledge = "\n\n".join(chunks)
-            logger.info(f"RAG: Found {len(result.data)} chunks")
-            return knowledge
+        if matches:
+            knowledge = pack_knowledge(query_text, matches, budget_tokens=KNOWLEDGE_TOKEN_BUDGET)
+            logger.info(f"RAG: Found {len(matches)} chunks, packed {len(knowledge)} chars")
+            if knowledge:
+                return knowledge
 
         return "No relevant knowledge found."
     except Exception as e:
@@ -119,37 +179,33 @@ def fetch_knowledge_sync(query_text):
         return "Knowledge search failed."
 
 
-def get_profile_info_sync(profile_id):
-    if not supabase or not profile_id:
-        return {}
-    try:
-        result = supabase.from_("mind_profile").select(
-            "name, headline, description, purpose, instructions, speaking_style"
-        ).eq("id", profile_id).single().execute()
-        if result.data:
-            logger.info(f"Profile loaded: {result.data.get('name', 'Unknown')}")
-            return result.data
-    except Exception as e:
-        logger.warning(f"Profile fetch failed: {e}")
-    return {}
+# ———————————————————— Function Handler ————————————————————
+RAG_TIMEOUT_SECS = 6.0
 
 
-# ———————————————————— Function Handler ————————————————————
-async def handle_search_knowledge(function_name, tool_call_id, arguments, llm, context, result_callback):
+async def handle_search_knowledge(function_name, tool_call_id, arguments, llm, context, result_callback, prefetcher=None, profile=None):
     query = arguments.get("query", "")
     logger.info(f"FUNCTION CALL: search_knowledge_base('{query}')")
-    # Run the blocking embedding + Supabase call in a worker thread so the
-    # asyncio event loop (audio in/out) is NOT frozen while RAG runs.
-    # This was the main cause of the bot "freezing" / giving no response.
-    try:
-        knowledge = await asyncio.wait_for(
-            asyncio.to_thread(fetch_knowledge_sync, query),
-            timeout=6.0,
-        )
-    except asyncio.TimeoutError:
-        logger.warning("RAG timed out after 6s — answering without knowledge")
-        knowledge = "Knowledge search timed out."
-    logger.info(f"FUNCTION RESULT: {len(knowledge)} chars")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + RAG_TIMEOUT_SECS
+    knowledge = None
+    if prefetcher is not None:
+        # Retrieval usually already started on the interim transcript.
+        knowledge = await prefetcher.take(query, timeout=max(deadline - loop.time(), 0))
+    if knowledge is None:
+        # Prefetch and fallback share one RAG_TIMEOUT_SECS budget.
+        remaining = deadline - loop.time()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            knowledge = await asyncio.wait_for(fetch_knowledge(query, profile), timeout=remaining)
+        except asyncio.TimeoutError:
+            logger.warning(f"RAG timed out after {RAG_TIMEOUT_SECS:.0f}s — answering without knowledge")
+            knowledge = "Knowledge search timed out."
+    logger.info(
+        f"FUNCTION RESULT: {len(knowledge)} chars | embed cache {embedding_cache.stats()}"
+        + (f" | answer cache {answer_cache.stats()}" if answer_cache is not None else "")
+    )
     await result_callback({"knowledge": knowledge})
 
 
@@ -174,48 +230,14 @@ tools = [
     }
 ]
 
-# ———————————————————— Transport ————————————————————
-transport_params = {
-    "daily": lambda: DailyParams(
-        audio_in_enabled=True,
-        audio_out_enabled=True,
-        vad_analyzer=SileroVADAnalyzer(
-            params=SileroVADAnalyzer.InputParams(
-                threshold=0.6,
-                min_volume=0.5,
-                start_secs=0.2,
-                stop_secs=0.8,
-                confidence=0.7,
-            )
-        ),
-    ),
-    "webrtc": lambda: TransportParams(
-        audio_in_enabled=True,
-        audio_out_enabled=True,
-        vad_analyzer=SileroVADAnalyzer(
-            params=SileroVADAnalyzer.InputParams(
-                threshold=0.6,
-                min_volume=0.5,
-                start_secs=0.2,
-                stop_secs=0.8,
-                confidence=0.7,
-            )
-        ),
-    ),
-}
-
-
-# ———————————————————— Bot ————————————————————
-async def run_bot(transport: BaseTransport, _runner_args):
-    logger.info("Starting pipeline v7.0...")
-
-    profile = get_profile_info_sync(HARDCODED_PROFILE_ID)
+# ———————————————————— Shared Assets ————————————————————
+def build_system_prompt(profile):
     profile_name = profile.get("name", "Mitesh Khatri")
     profile_headline = profile.get("headline", "Law of Attraction Coach")
     profile_description = profile.get("description", "A renowned life coach.")
     profile_style = profile.get("speaking_style", "Warm, energetic, high-vibe.")
 
-    system_prompt = f"""You are an AI voice clone of {profile_name}, {profile_headline}.
+    return f"""You are an AI voice clone of {profile_name}, {profile_headline}.
 Biography: {profile_description}
 Speaking Style: {profile_style}
 
@@ -254,6 +276,243 @@ VOICE CALL RULES:
 - Talk like chatting with a close friend who trusts you.
 - Use natural transitions: "Now here's the thing...", "And you know what?", "Let me share something with you..."."""
 
+
+# VAD model, profile rows and rendered prompts are loaded once per process
+# and shared by every session instead of being rebuilt on each connect.
+assets = AssetRegistry(
+    load_profile=retrieval.get_profile,
+    render_prompt=build_system_prompt,
+    vad_params=SileroVADAnalyzer.InputParams(
+        threshold=0.6,
+        min_volume=0.5,
+        start_secs=0.2,
+        stop_secs=0.8,
+        confidence=0.7,
+    ),
+    profile_ttl_secs=int(os.getenv("PROFILE_CACHE_TTL", "300")),
+)
+assets.preload_vad()
+
+CARTESIA_MODEL_ID = "sonic-multilingual"
+SCRIPTED_AUDIO_RATE = 24000
+
+
+# ———————————————————— Per-profile Resources ————————————————————
+# One process serves every clone. Each profile's knowledge snapshot, voice
+# and scripted audio are opened by its first session, shared by the rest and
+# released PROFILE_IDLE_SECS after its last session ends.
+# PROFILE_VOICES (optional JSON) maps profile id -> Cartesia voice id.
+PROFILE_VOICES = json.loads(os.getenv("PROFILE_VOICES") or "{}")
+
+
+class ProfileResources:
+    def __init__(self, profile_id, voice_id, knowledge_index, utterances):
+        self.profile_id = profile_id
+        self.voice_id = voice_id
+        self.knowledge_index = knowledge_index
+        self.utterances = utterances
+
+    def kb_version(self):
+        return self.knowledge_index.version if self.knowledge_index is not None else None
+
+
+async def open_profile(profile_id):
+    voice_id = PROFILE_VOICES.get(profile_id) or os.getenv("CARTESIA_VOICE_ID")
+
+    # Local snapshot of the profile's chunk embeddings — answers top-k in a few ms
+    # instead of a match_knowledge RPC per turn. Falls back to the RPC until loaded.
+    knowledge_index = None
+    if supabase and os.getenv("KB_LOCAL_INDEX", "1") == "1":
+        knowledge_index = KnowledgeIndex(
+            supabase,
+            profile_id,
+            refresh_secs=int(os.getenv("KB_REFRESH_SECS", "300")),
+        )
+        knowledge_index.start()
+
+    # Greeting variants + fixed lines rendered once per profile/voice, so sessions
+    # start talking without an LLM generation or a TTS round-trip.
+    utterances = UtteranceCache(
+        synthesize=lambda text: cartesia_pcm(
+            retrieval.http,
+            os.getenv("CARTESIA_API_KEY"),
+            text,
+            voice_id=voice_id,
+            model_id=CARTESIA_MODEL_ID,
+            sample_rate=SCRIPTED_AUDIO_RATE,
+        ),
+        voice_id=voice_id,
+        model_id=CARTESIA_MODEL_ID,
+        sample_rate=SCRIPTED_AUDIO_RATE,
+        disk_dir=os.getenv("UTTERANCE_CACHE_DIR") or None,
+    )
+    return ProfileResources(profile_id, voice_id, knowledge_index, utterances)
+
+
+def close_profile(profile_id, resources):
+    if resources.knowledge_index is not None:
+        resources.knowledge_index.stop()
+    resources.utterances.invalidate()
+    assets.invalidate(profile_id)
+    if answer_cache is not None:
+        answer_cache.drop_profile(profile_id)
+
+
+profiles = ProfilePool(
+    open_profile,
+    close_profile,
+    idle_secs=int(os.getenv("PROFILE_IDLE_SECS", "900")),
+)
+
+
+# ———————————————————— Context Compaction ————————————————————
+# Long calls keep prompt size (and time-to-first-token) flat: stale knowledge
+# results are stubbed and older turns are folded into a background summary.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+
+
+async def summarize_conversation(previous_summary, messages):
+    lines = [
+        f"{m['role']}: {m['content']}"
+        for m in messages
+        if m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str) and m["content"].strip()
+    ]
+    if previous_summary:
+        lines.insert(0, f"Earlier summary: {previous_summary}")
+    response = await retrieval.openai.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": "Summarize this part of a voice coaching call in at most 120 words. Keep the user's "
+                           "name, goals, problems, commitments and any advice already given. Plain prose, no lists.",
+            },
+            {"role": "user", "content": "\n".join(lines)},
+        ],
+        max_tokens=250,
+        temperature=0.2,
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+# ———————————————————— Admission Control ————————————————————
+# Past CPU saturation every call in the process degrades at once, so new
+# sessions are only admitted while there is headroom; the rest are turned away.
+capacity = CapacityManager(
+    max_sessions=int(os.getenv("MAX_SESSIONS", "8")),
+    max_lag_ms=float(os.getenv("MAX_LOOP_LAG_MS", "150")),
+    max_cpu=float(os.getenv("MAX_CPU", "0.85")),
+    retry_after_secs=int(os.getenv("RETRY_AFTER_SECS", "10")),
+)
+ADMISSION_QUEUE_SECS = float(os.getenv("ADMISSION_QUEUE_SECS", "3"))
+
+# Runner requests that hand out a room / connection and then start bot() are
+# admitted (and the slot reserved) before anything is created, so a caller at
+# capacity gets a 503 + Retry-After instead of an empty room. A WebRTC /start
+# only registers a session id (its bot starts on the offer), and an offer that
+# carries a pc_id renegotiates a running connection — neither reserves.
+ADMITTED_ROUTES = {("GET", "/daily"), ("POST", "/daily-dialin-webhook")}
+
+# The reservation of the request that is starting bot(). The runner starts the
+# bot from inside that request, so the bot task inherits this context and
+# claims exactly the slot reserved for its caller.
+_reservation = contextvars.ContextVar("reservation", default=None)
+
+
+def _runner_transport():
+    """The runner's -t/--transport, the /start default when the body names none."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-t", "--transport")
+    return parser.parse_known_args()[0].transport
+
+
+async def _starts_bot(request, default_transport):
+    """True if this runner request will start bot() for a new caller."""
+    method, route = request.method, request.url.path
+    if (method, route) in ADMITTED_ROUTES:
+        return True
+    is_offer = route == "/api/offer" or (route.startswith("/sessions/") and route.endswith("api/offer"))
+    if method != "POST" or not (route == "/start" or is_offer):
+        return False
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    if is_offer:
+        return not data.get("pc_id")
+    transport = data.get("transport") or ("daily" if data.get("createDailyRoom") else None)
+    return (transport or default_transport or "webrtc") != "webrtc"
+
+
+def install_admission(app):
+    """Gate the pipecat runner's FastAPI app on capacity and add /health."""
+    from fastapi.responses import JSONResponse
+
+    default_transport = _runner_transport()
+
+    @app.middleware("http")
+    async def admission(request, call_next):
+        route = request.url.path
+        if await _starts_bot(request, default_transport):
+            try:
+                token = await capacity.reserve(route, queue_secs=ADMISSION_QUEUE_SECS)
+            except AtCapacity as e:
+                logger.warning(f"{route} rejected, {e} — retry after {e.retry_after}s | {capacity.stats()}")
+                return JSONResponse(
+                    {"error": "Voice service is at capacity, please retry shortly.",
+                     "reason": e.reason, "retry_after": e.retry_after},
+                    status_code=503,
+                    headers={"Retry-After": str(e.retry_after)},
+                )
+            _reservation.set(token)
+            try:
+                response = await call_next(request)
+            except Exception:
+                capacity.unreserve(token)
+                raise
+            if response.status_code >= 400:
+                capacity.unreserve(token)   # nothing was started for this slot
+            return response
+        return await call_next(request)
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "ok",
+            "accepting": capacity.remaining() > 0,
+            "capacity": capacity.stats(),
+            "profiles": profiles.stats(),
+        }
+
+
+# ———————————————————— Transport ————————————————————
+transport_params = {
+    "daily": lambda: DailyParams(
+        audio_in_enabled=True,
+        audio_out_enabled=True,
+        vad_analyzer=assets.vad_analyzer(),
+    ),
+    "webrtc": lambda: TransportParams(
+        audio_in_enabled=True,
+        audio_out_enabled=True,
+        vad_analyzer=assets.vad_analyzer(),
+    ),
+}
+
+
+# ———————————————————— Bot ————————————————————
+async def run_bot(transport: BaseTransport, profile: ProfileResources):
+    logger.info(f"Starting pipeline v7.0 for profile {profile.profile_id} | {profiles.stats()} | {capacity.stats()}")
+
+    system_prompt = await assets.get_system_prompt(profile.profile_id)
+    profile_row = await assets.get_profile(profile.profile_id)
+    scripted = None
+    if os.getenv("CARTESIA_API_KEY") and profile.voice_id:
+        scripted = await profile.utterances.get(profile.profile_id, profile_row, timeout=3.0)
+
     # Deepgram streaming STT — nova-2 multilingual handles English/Hindi/Hinglish.
     # interim_results + endpointing keep transcription finalizing fast.
     if LiveOptions is not None:
@@ -278,28 +537,55 @@ VOICE CALL RULES:
 
     tts = CartesiaTTSService(
         api_key=os.getenv("CARTESIA_API_KEY"),
-        voice_id=os.getenv("CARTESIA_VOICE_ID"),
-        model_id="sonic-multilingual",
+        voice_id=profile.voice_id,
+        model_id=CARTESIA_MODEL_ID,
     )
 
+    # Starts retrieval on stable interim transcripts, overlapping RAG with speech.
+    prefetcher = RAGPrefetcher(fetch=functools.partial(fetch_knowledge, profile=profile))
+
     llm.register_function(
         "search_knowledge_base",
-        handle_search_knowledge,
+        functools.partial(handle_search_knowledge, prefetcher=prefetcher, profile=profile),
     )
 
     messages = [{"role": "system", "content": system_prompt}]
     context = OpenAILLMContext(messages, tools)
     context_aggregator = llm.create_context_aggregator(context)
 
-    pipeline = Pipeline([
+    # Pass-through observers timestamp each turn (VAD stop → first bot audio).
+    timeline = TurnTimeline()
+
+    answer_gate = answer_recorder = None
+    if answer_cache is not None:
+        answer_gate = AnswerCacheGate(
+            answer_cache, embedding_cache.get, embedding_cache.peek, profile.profile_id, profile.kb_version, context,
+        )
+        answer_recorder = AnswerRecorder(answer_cache, answer_gate, profile.profile_id)
+
+    pipeline = Pipeline([p for p in (
         transport.input(),
+        TurnObserver(timeline),
         stt,
+        TurnObserver(timeline),
+        ScriptedReplies(scripted),
+        prefetcher,
+        answer_gate,
         context_aggregator.user(),
+        ContextCompactor(
+            summarize_conversation,
+            budget_tokens=CONTEXT_TOKEN_BUDGET,
+            keep_recent_turns=CONTEXT_KEEP_TURNS,
+        ),
         llm,
+        answer_recorder.text_tap if answer_recorder else None,
+        TurnObserver(timeline),
         tts,
+        answer_recorder,
+        TurnObserver(timeline),
         transport.output(),
         context_aggregator.assistant(),
-    ])
+    ) if p is not None])
 
     task = PipelineTask(
         pipeline,
@@ -311,9 +597,16 @@ VOICE CALL RULES:
     @transport.event_handler("on_client_connected")
     async def on_client_connected(transport, client):
         logger.info("Client connected")
+        greeting = scripted.greeting() if scripted else None
+        if greeting:
+            # Pre-rendered greeting: no LLM/TTS call; the LLM still sees what was said.
+            text, pcm = greeting
+            context.add_message({"role": "assistant", "content": text})
+            await task.queue_frames(audio_frames(pcm, scripted.sample_rate))
+            return
         messages.append({
             "role": "system",
-            "content": "Greet the user warmly IN ENGLISH. Say something like: 'Hey Champion! I am Mitesh Khatri, your personal transformation coach. I am so glad you are here today. Ask me anything about life, success, relationships, or mindset, and let us make some magic happen!' Keep it natural and enthusiastic."
+            "content": f"Greet the user warmly IN ENGLISH. Say something like: '{greeting_lines(profile_row)[0]}' Keep it natural and enthusiastic."
         })
         # Use LLMMessagesFrame (which is now robustly imported)
         await task.queue_frames([LLMMessagesFrame(messages)])
@@ -330,10 +623,23 @@ VOICE CALL RULES:
 
 async def bot(runner_args):
     from pipecat.runner.utils import create_transport
-    transport = await create_transport(runner_args, transport_params)
-    await run_bot(transport, runner_args)
+    profile_id = resolve_profile_id(runner_args, DEFAULT_PROFILE_ID)
+    try:
+        # A session started by an admitted request claims the slot reserved for it.
+        async with capacity.session("bot", queue_secs=ADMISSION_QUEUE_SECS, reservation=_reservation.get()):
+            async with profiles.lease(profile_id) as profile:
+                transport = await create_transport(runner_args, transport_params)
+                await run_bot(transport, profile)
+    except AtCapacity as e:
+        # Not joining keeps the calls already running smooth; the caller retries.
+        logger.warning(f"Session rejected, {e} — retry after {e.retry_after}s | {capacity.stats()}")
+        websocket = getattr(runner_args, "websocket", None)
+        if websocket is not None:
+            # Telephony / websocket callers: 1013 = "try again later".
+            await websocket.close(code=1013, reason=f"at capacity, retry after {e.retry_after}s")
 
 
 if __name__ == "__main__":
-    from pipecat.runner.run import main
+    from pipecat.runner.run import app, main
+    install_admission(app)
     main()
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""Admission control for the voice processes.
+
+Every session's VAD, audio framing and pipeline tasks share one event loop.
+Past CPU saturation they all stutter together, so a new call is only
+admitted while the process still has headroom:
+
+  - active (and reserved) sessions below MAX_SESSIONS,
+  - event-loop lag below MAX_LOOP_LAG_MS (sampled every `sample_secs`;
+    rises immediately, decays slowly),
+  - process CPU, plus the measured per-session cost of one more call,
+    below MAX_CPU (fraction of one core).
+
+A request that arrives at capacity waits up to ADMISSION_QUEUE_SECS for a
+slot and is then turned away with a retry hint. `reserve` admits a caller
+before its session exists (the room is handed out first) and returns a
+token; the slot is held until the session started for that caller claims
+it with the token, or the reservation expires.
+
+The pipecat bot (miteshbot/) and the aiohttp session service
+(app-81mqyjlan9xd/) are built and deployed separately, each from its own
+directory, so each carries an identical copy of this file. Edit both
+copies together; miteshbot/test_vendored.py fails when they differ. Keep it
+stdlib only.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+class AtCapacity(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"at capacity ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CapacityManager:
+    def __init__(self, max_sessions=8, max_lag_ms=150, max_cpu=0.85, retry_after_secs=10,
+                 sample_secs=0.5, reservation_secs=30):
+        self.max_sessions = max_sessions
+        self.max_lag_ms = max_lag_ms
+        self.max_cpu = max_cpu
+        self.retry_after_secs = retry_after_secs
+        self._sample_secs = sample_secs
+        self._reservation_secs = reservation_secs
+        self.active = 0
+        self.lag_ms = 0.0
+        self.cpu = 0.0                      # process CPU, fraction of one core
+        self.cpu_per_session = 0.0          # moving average while sessions run
+        self.admitted = 0
+        self.rejected = {}                  # route -> count
+        self._reservations = OrderedDict()  # token -> expiry time (monotonic), oldest first
+        self._changed = None
+        self._sampler = None
+
+    # ── sampling ────────────────────────────────────────────────────────────
+    def start(self):
+        """Start the sampler; also started lazily by the first admission."""
+        if self._sampler is None or self._sampler.done():
+            self._changed = asyncio.Event()
+            self._sampler = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        if self._sampler is not None:
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        wall, cpu = loop.time(), time.process_time()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self._sample_secs)
+            now = loop.time()
+            lag = max(now - t0 - self._sample_secs, 0.0) * 1000
+            self.lag_ms = lag if lag > self.lag_ms else self.lag_ms * 0.8 + lag * 0.2
+
+            cpu_now = time.process_time()
+            self.cpu = (cpu_now - cpu) / max(now - wall, 1e-6)
+            wall, cpu = now, cpu_now
+            if self.active:
+                per = self.cpu / self.active
+                self.cpu_per_session = per if not self.cpu_per_session else self.cpu_per_session * 0.9 + per * 0.1
+            self._notify()
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    # ── admission ───────────────────────────────────────────────────────────
+    def _expire(self):
+        now = time.monotonic()
+        while self._reservations and next(iter(self._reservations.values())) <= now:
+            self._reservations.popitem(last=False)
+
+    @property
+    def reserved(self):
+        self._expire()
+        return len(self._reservations)
+
+    def reason(self):
+        """Why no new session fits right now, or None if one does."""
+        pending = self.active + self.reserved
+        if pending >= self.max_sessions:
+            return "sessions"
+        if self.lag_ms > self.max_lag_ms:
+            return "loop_lag"
+        if self.cpu + self.cpu_per_session * (self.reserved + 1) > self.max_cpu:
+            return "cpu"
+        return None
+
+    def remaining(self):
+        if self.reason() is not None:
+            return 0
+        free = self.max_sessions - self.active - self.reserved
+        if self.cpu_per_session > 0:
+            free = min(free, int((self.max_cpu - self.cpu) / self.cpu_per_session) - self.reserved)
+        return max(free, 1)
+
+    async def admit(self, route="session", queue_secs=0.0):
+        """Wait up to queue_secs for headroom; raise AtCapacity if none frees up."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + queue_secs
+        while self.reason() is not None:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        reason = self.reason()
+        if reason is not None:
+            self.rejected[route] = self.rejected.get(route, 0) + 1
+            raise AtCapacity(reason, self.retry_after_secs)
+
+    async def reserve(self, route="session", queue_secs=0.0):
+        """Admit now and hold the slot until a session claims it (or it expires).
+
+        Returns the reservation token to hand to `session`.
+        """
+        await self.admit(route, queue_secs)
+        token = uuid.uuid4().hex
+        self._reservations[token] = time.monotonic() + self._reservation_secs
+        return token
+
+    def unreserve(self, token):
+        """Give back a reservation whose session will never start."""
+        if self._reservations.pop(token, None) is not None:
+            self._notify()
+
+    @asynccontextmanager
+    async def session(self, route="session", queue_secs=0.0, reservation=None):
+        """Hold a session slot for the duration of the block, or raise AtCapacity.
+
+        A session started for an earlier `reserve` passes its token and takes
+        over that slot without being checked again; any other session (or
+        one whose reservation expired) is admitted normally.
+        """
+        self._expire()
+        if reservation is not None and self._reservations.pop(reservation, None) is not None:
+            self.start()
+        else:
+            await self.admit(route, queue_secs)
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._notify()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "reserved": self.reserved,
+            "remaining": self.remaining(),
+            "max_sessions": self.max_sessions,
+            "loop_lag_ms": round(self.lag_ms, 1),
+            "cpu": round(self.cpu, 2),
+            "cpu_per_session": round(self.cpu_per_session, 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,149 @@
+"""Token-budgeted context compaction for long voice calls.
+
+Without this the LLM context grows for the whole call — every turn plus every
+~2.5k-char knowledge tool result — so prompt tokens and time-to-first-token
+climb steadily over a 30–60 minute session. ContextCompactor sits between
+context_aggregator.user() and llm and, before each LLM call, keeps the
+context under a fixed token budget:
+
+  1. Knowledge results older than the current turn are replaced by a short
+     stub (the tool_call/tool message pair stays, so the history is valid).
+  2. If still over budget, turns older than the last `keep_recent_turns` are
+     folded into a rolling summary. The summary is produced by a background
+     task; the turn that triggers it is not delayed.
+  3. If the summary is not back yet and the context is far over budget, the
+     oldest turns are dropped outright (the summary task already has them).
+
+The leading system messages and the recent turns are always kept whole.
+"""
+
+import asyncio
+
+from loguru import logger
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+try:
+    from pipecat.frames.frames import LLMContextFrame
+except ImportError:
+    LLMContextFrame = None
+try:
+    from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContextFrame
+except ImportError:
+    OpenAILLMContextFrame = None
+
+_CONTEXT_FRAMES = tuple(f for f in (LLMContextFrame, OpenAILLMContextFrame) if f is not None)
+
+SUMMARY_PREFIX = "Summary of the earlier part of this call:"
+TOOL_STUB = '{"knowledge": "(earlier search result omitted)"}'
+
+
+def estimate_tokens(message):
+    """~4 chars per token plus per-message overhead; close enough for budgeting."""
+    chars = len(str(message.get("content") or ""))
+    for call in message.get("tool_calls") or []:
+        chars += len(str(call.get("function", {}).get("arguments", ""))) + 20
+    return chars // 4 + 4
+
+
+def _turns(messages):
+    """Split into turns; each turn starts at a user message."""
+    turns, current = [], []
+    for m in messages:
+        if m.get("role") == "user" and current:
+            turns.append(current)
+            current = []
+        current.append(m)
+    if current:
+        turns.append(current)
+    return turns
+
+
+class ContextCompactor(FrameProcessor):
+    def __init__(self, summarize, budget_tokens=3000, keep_recent_turns=4, hard_limit_ratio=1.5, **kwargs):
+        super().__init__(**kwargs)
+        self._summarize = summarize         # async fn(previous_summary, messages) -> str
+        self._budget = budget_tokens
+        self._keep_recent = keep_recent_turns
+        self._hard_limit = int(budget_tokens * hard_limit_ratio)
+        self._summary = None
+        self._summary_task = None
+        self._covered = {}                  # id() -> message, for messages the summary covers
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, _CONTEXT_FRAMES) and hasattr(frame.context, "set_messages"):
+            self.compact(frame.context)
+
+        await self.push_frame(frame, direction)
+
+    def compact(self, context):
+        messages = list(context.messages)
+        n_head = 0
+        while n_head < len(messages) and messages[n_head].get("role") == "system":
+            n_head += 1
+        head = [m for m in messages[:n_head] if not str(m.get("content", "")).startswith(SUMMARY_PREFIX)]
+        body = messages[n_head:]
+        before = sum(map(estimate_tokens, messages))
+
+        if self._apply_finished_summary():
+            body = [m for m in body if id(m) not in self._covered]
+            self._covered = {}
+
+        turns = _turns(body)
+        # 1. Stub out knowledge results from earlier turns.
+        for turn in turns[:-1]:
+            for i, m in enumerate(turn):
+                if m.get("role") == "tool" and m.get("content") != TOOL_STUB:
+                    turn[i] = {**m, "content": TOOL_STUB}
+
+        def total():
+            summary = [self._summary_message()] if self._summary else []
+            return sum(estimate_tokens(m) for m in head + summary + [m for t in turns for m in t])
+
+        # 2. Fold older turns into the rolling summary, off the critical path.
+        old = turns[:-self._keep_recent] if len(turns) > self._keep_recent else []
+        if total() > self._budget and old and self._summary_task is None:
+            folded = [m for t in old for m in t]
+            # Hold references so the ids can't be reused while the task runs.
+            self._covered = {id(m): m for m in folded}
+            self._summary_task = asyncio.create_task(self._summarize(self._summary, folded))
+            logger.info(f"Context over budget — summarizing {len(old)} older turn(s) in the background")
+
+        # 3. Hard cap while the summary is still being written.
+        while total() > self._hard_limit and len(turns) > self._keep_recent:
+            dropped = turns.pop(0)
+            if not any(id(m) in self._covered for m in dropped):
+                logger.warning("Dropping an unsummarized turn to stay under the hard context limit")
+
+        summary = [self._summary_message()] if self._summary else []
+        compacted = head + summary + [m for t in turns for m in t]
+        if compacted != messages:
+            context.set_messages(compacted)
+            logger.debug(f"Context compacted: ~{before} → ~{sum(map(estimate_tokens, compacted))} tokens")
+
+    def _summary_message(self):
+        return {"role": "system", "content": f"{SUMMARY_PREFIX}\n{self._summary}"}
+
+    def _apply_finished_summary(self):
+        """Adopt a finished summary. Returns True if its turns can now be removed."""
+        task = self._summary_task
+        if task is None or not task.done():
+            return False
+        self._summary_task = None
+        try:
+            summary = task.result()
+        except Exception as e:
+            summary = None
+            logger.warning(f"Context summary failed: {e}")
+        if not summary:
+            # Keep the folded turns in context; the next over-budget turn retries.
+            self._covered = {}
+            return False
+        self._summary = summary
+        return True
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._summary_task and not self._summary_task.done():
+            self._summary_task.cancel()
@@ -0,0 +1,213 @@
+"""Local dedup index for omni-sync media.
+
+Replaces the per-request `knowledge_sources.source_url = url` round-trip,
+which missed tracking params, youtu.be vs youtube.com forms and Instagram
+share links. URLs are reduced to a canonical media id (yt:<id>, ig:<code>,
+or a cleaned URL), checked against an in-memory Bloom filter first and then
+confirmed in SQLite. Downloaded audio is also content-hashed so re-uploads
+under a different URL are caught before transcription.
+
+Transcripts are checked too: the KB holds many dated re-posts of the same
+recurring lesson, each a new URL with new audio. Transcript passages are
+MinHash-fingerprinted (minhash.py; banded LSH in SQLite, scoped per
+profile) so passages the profile already has are dropped before
+ingest-content embeds them.
+"""
+
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from minhash import NEAR_DUP_THRESHOLD, SHINGLE_WORDS, WORD_RE, band_keys, pack, similarity, unpack
+
+_TRACKING_PARAMS = {
+    "si", "feature", "igsh", "igshid", "fbclid", "gclid", "pp", "ab_channel",
+    "utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content",
+}
+_YT_HOSTS = {"youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com"}
+
+
+def canonical_media_id(url):
+    """Stable id for a media URL, independent of share-link variations."""
+    parts = urlsplit((url or "").strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = [p for p in parts.path.split("/") if p]
+    query = dict(parse_qsl(parts.query))
+
+    if host == "youtu.be" and path:
+        return f"yt:{path[0]}"
+    if host in _YT_HOSTS:
+        if query.get("v"):
+            return f"yt:{query['v']}"
+        if len(path) >= 2 and path[0] in ("shorts", "embed", "live", "v"):
+            return f"yt:{path[1]}"
+    if host.endswith("instagram.com") and len(path) >= 2 and path[0] in ("p", "reel", "reels", "tv"):
+        return f"ig:{path[1]}"
+
+    kept = sorted((k, v) for k, v in parse_qsl(parts.query) if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith("utm_"))
+    return urlunsplit(("https", host, "/" + "/".join(path), urlencode(kept), ""))
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def split_passages(text, min_words=50, max_words=500, anchor_every=200):
+    """Content-defined passages: (start, end) character spans covering `text`.
+
+    A passage ends where the hash of the last 5 words hits an anchor (at
+    least `min_words` in, at most `max_words`), so the same lesson splits
+    the same way even when a re-post adds an intro or trims the start.
+    """
+    words = list(WORD_RE.finditer(text or ""))
+    spans, start, count = [], 0, 0
+    for i, word in enumerate(words):
+        count += 1
+        if count < min_words and i + 1 < len(words):
+            continue
+        tail = " ".join(w.group().lower() for w in words[max(i - SHINGLE_WORDS + 1, 0):i + 1])
+        anchored = int.from_bytes(hashlib.blake2b(tail.encode(), digest_size=8).digest(), "little") % anchor_every == 0
+        if anchored or count >= max_words or i + 1 == len(words):
+            end = words[i + 1].start() if i + 1 < len(words) else len(text)
+            spans.append((start, end))
+            start, count = end, 0
+    return spans
+
+
+class BloomFilter:
+    def __init__(self, capacity=1_000_000, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class DedupIndex:
+    def __init__(self, path, capacity=1_000_000):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(capacity)
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS media ("
+                "media_id TEXT PRIMARY KEY, url TEXT, audio_hash TEXT, created_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS media_audio_hash ON media (audio_hash)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS passages ("
+                "id INTEGER PRIMARY KEY, scope TEXT, url TEXT, signature BLOB, created_at REAL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS passage_bands (scope TEXT, band INTEGER, key TEXT, passage_id INTEGER)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS passage_bands_key ON passage_bands (scope, band, key)")
+            self._db.commit()
+            for media_id, audio_hash in self._db.execute("SELECT media_id, audio_hash FROM media"):
+                self._bloom.add(media_id)
+                if audio_hash:
+                    self._bloom.add(f"sha:{audio_hash}")
+
+    def seen(self, media_id):
+        if media_id not in self._bloom:
+            return False
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM media WHERE media_id = ?", (media_id,)).fetchone() is not None
+
+    def audio_seen(self, audio_hash):
+        if f"sha:{audio_hash}" not in self._bloom:
+            return False
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM media WHERE audio_hash = ?", (audio_hash,)).fetchone() is not None
+
+    def add(self, media_id, url=None, audio_hash=None):
+        self.add_many([(media_id, url, audio_hash)])
+
+    def add_many(self, rows):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO media (media_id, url, audio_hash, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(media_id) DO UPDATE SET audio_hash = COALESCE(excluded.audio_hash, media.audio_hash)",
+                [(m, u, h, now) for m, u, h in rows],
+            )
+            self._db.commit()
+        for media_id, _, audio_hash in rows:
+            self._bloom.add(media_id)
+            if audio_hash:
+                self._bloom.add(f"sha:{audio_hash}")
+
+    def find_passage(self, scope, signature, threshold=NEAR_DUP_THRESHOLD):
+        """Closest known passage in `scope` at or above `threshold`: (url, similarity) or None."""
+        best = None
+        with self._lock:
+            candidates = set()
+            for band, key in band_keys(signature):
+                candidates.update(pid for (pid,) in self._db.execute(
+                    "SELECT passage_id FROM passage_bands WHERE scope = ? AND band = ? AND key = ?",
+                    (scope, band, key),
+                ))
+            for pid in candidates:
+                url, blob = self._db.execute("SELECT url, signature FROM passages WHERE id = ?", (pid,)).fetchone()
+                score = similarity(signature, unpack(blob))
+                # Among near-duplicates, report a URL-bearing copy over a bare one.
+                rank = (bool(url), score)
+                if score >= threshold and (best is None or rank > (bool(best[0]), best[1])):
+                    best = (url, score)
+        return best
+
+    def add_passages(self, scope, url, signatures):
+        now = time.time()
+        with self._lock:
+            for signature in signatures:
+                pid = self._db.execute(
+                    "INSERT INTO passages (scope, url, signature, created_at) VALUES (?, ?, ?, ?)",
+                    (scope, url, pack(signature), now),
+                ).lastrowid
+                self._db.executemany(
+                    "INSERT INTO passage_bands (scope, band, key, passage_id) VALUES (?, ?, ?, ?)",
+                    [(scope, band, key, pid) for band, key in band_keys(signature)],
+                )
+            self._db.commit()
+
+    def seed_from_supabase(self, supabase, page_size=1000):
+        """Bulk-load canonical ids for every knowledge_sources.source_url."""
+        offset = total = 0
+        while True:
+            page = (
+                supabase.table("knowledge_sources")
+                .select("source_url")
+                .not_.is_("source_url", "null")
+                .order("id")
+                .range(offset, offset + page_size - 1)
+                .execute()
+                .data
+                or []
+            )
+            rows = [(canonical_media_id(r["source_url"]), r["source_url"], None) for r in page if r.get("source_url")]
+            if rows:
+                self.add_many(rows)
+                total += len(rows)
+            if len(page) < page_size:
+                return total
+            offset += page_size
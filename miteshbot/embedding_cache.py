@@ -0,0 +1,164 @@
+"""Query-embedding cache for the voice bot's RAG path.
+
+Callers repeat the same short coaching queries all day, and every repeat used
+to pay a full OpenAI embeddings round-trip. This cache sits in front of that
+call:
+
+  - L1: in-process LRU with a TTL, bounded by entry count. Vectors are kept as
+        packed float32 arrays (~6 KB each instead of ~50 KB as a float list).
+  - L2: optional SQLite file (EMBED_CACHE_PATH) so warm entries survive restarts.
+  - Single-flight: concurrent sessions asking the same thing share one API call.
+    The shared call is only cancelled once every waiter has given up on it.
+"""
+
+import asyncio
+import re
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+
+from loguru import logger
+
+
+def normalize_query(text):
+    """Cache key for a query — same spirit as chat-engine's normalizeCacheKey."""
+    text = re.sub(r"[^\w\s]", "", (text or "").strip().lower())
+    return re.sub(r"\s+", " ", text).strip()[:200]
+
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class EmbeddingCache:
+    def __init__(self, embed_fn, model, max_entries=2048, ttl_secs=86400, disk_path=None):
+        self._embed_fn = embed_fn       # async fn(text) -> list[float]
+        self._model = model
+        self._max_entries = max_entries
+        self._ttl = ttl_secs
+        self._entries = OrderedDict()   # key -> (expires_at, array('f'))
+        self._inflight = {}             # key -> _Flight
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._db = None
+        if disk_path:
+            try:
+                self._db = sqlite3.connect(disk_path)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "model TEXT, key TEXT, expires_at REAL, vec BLOB, PRIMARY KEY (model, key))"
+                )
+                self._db.execute("DELETE FROM embeddings WHERE expires_at < ?", (time.time(),))
+                self._db.commit()
+                logger.info(f"Embedding cache disk tier: {disk_path}")
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disk tier disabled: {e}")
+                self._db = None
+
+    # ── lookup ────────────────────────────────────────────────────────────
+    async def get(self, query_text):
+        """Return the embedding for query_text as a list of floats."""
+        key = normalize_query(query_text)
+
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].tolist()
+        if entry:
+            del self._entries[key]
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(self._load(key, query_text)))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._land(k, f))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            vec = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        return vec.tolist()
+
+    def peek(self, query_text):
+        """The in-memory embedding for query_text, or None — never waits."""
+        entry = self._entries.get(normalize_query(query_text))
+        if entry and entry[0] > time.time():
+            return entry[1].tolist()
+        return None
+
+    def _land(self, key, flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def _load(self, key, query_text):
+        now = time.time()
+        vec = self._load_disk(key, now)
+        if vec is not None:
+            self.disk_hits += 1
+        else:
+            vec = array("f", await self._embed_fn(query_text))
+            self.misses += 1
+            self._store_disk(key, now + self._ttl, vec)
+        self._entries[key] = (now + self._ttl, vec)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return vec
+
+    # ── disk tier ─────────────────────────────────────────────────────────
+    def _load_disk(self, key, now):
+        if not self._db:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT expires_at, vec FROM embeddings WHERE model = ? AND key = ?",
+                (self._model, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache disk read failed: {e}")
+            return None
+        if not row or row[0] <= now:
+            return None
+        vec = array("f")
+        vec.frombytes(row[1])
+        return vec
+
+    def _store_disk(self, key, expires_at, vec):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (model, key, expires_at, vec) VALUES (?, ?, ?, ?)",
+                (self._model, key, expires_at, vec.tobytes()),
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache disk write failed: {e}")
+
+    # ── metrics ───────────────────────────────────────────────────────────
+    def stats(self):
+        # Requests that joined an in-flight call are reported as `coalesced`,
+        # not as hits: they still waited on the API.
+        lookups = self.hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
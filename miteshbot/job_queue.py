@@ -0,0 +1,180 @@
+"""Persistent staged job queue for the omni-sync worker.
+
+Jobs live in a local SQLite file so a container restart resumes them where
+they left off. Each stage (download → transcribe → ingest) has its own pool
+of worker threads, so during a channel backfill one video can be
+downloading while another is being transcribed and a third ingested.
+
+A stage function receives the job dict and returns a dict of fields to merge
+into job["data"]. Raising SkipJob ends the job as "skipped"; any other
+exception ends it as "failed".
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+TERMINAL = ("done", "skipped", "failed")
+
+
+class SkipJob(Exception):
+    pass
+
+
+class JobStore:
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT, stage TEXT, url TEXT, data TEXT, "
+                "error TEXT, created_at REAL, updated_at REAL)"
+            )
+            # `key` was added after the first release — migrate older job DBs.
+            columns = [r[1] for r in self._db.execute("PRAGMA table_info(jobs)")]
+            if "key" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN key TEXT")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+            self._db.commit()
+
+    @staticmethod
+    def _row(row):
+        if not row:
+            return None
+        keys = ("id", "status", "stage", "url", "data", "error", "created_at", "updated_at", "key")
+        job = dict(zip(keys, row))
+        job["data"] = json.loads(job["data"] or "{}")
+        return job
+
+    def create(self, url, data, stage, key=None):
+        """Insert a queued job unless one with the same key is still active.
+
+        Returns (job, created). The check and the insert hold one lock, so
+        concurrent submissions of the same key all get the same job.
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            row = self._active(key or url)
+            if row:
+                return self._row(row), False
+            self._db.execute(
+                "INSERT INTO jobs VALUES (?, 'queued', ?, ?, ?, NULL, ?, ?, ?)",
+                (job_id, stage, url, json.dumps(data), now, now, key or url),
+            )
+            self._db.commit()
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def _active(self, key):
+        return self._db.execute(
+            "SELECT * FROM jobs WHERE key = ? AND status NOT IN (?, ?, ?) LIMIT 1",
+            (key, *TERMINAL),
+        ).fetchone()
+
+    def find_active(self, key):
+        with self._lock:
+            row = self._active(key)
+        return self._row(row)
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE status NOT IN (?, ?, ?) ORDER BY created_at",
+                TERMINAL,
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def update(self, job_id, status=None, stage=None, data=None, error=None):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            job = self._row(row)
+            if not job:
+                return None
+            if data:
+                job["data"].update(data)
+            self._db.execute(
+                "UPDATE jobs SET status = ?, stage = ?, data = ?, error = ?, updated_at = ? WHERE id = ?",
+                (
+                    status or job["status"],
+                    stage or job["stage"],
+                    json.dumps(job["data"]),
+                    error if error is not None else job["error"],
+                    time.time(),
+                    job_id,
+                ),
+            )
+            self._db.commit()
+        return self.get(job_id)
+
+
+class StagedQueue:
+    def __init__(self, store, stages, log=print):
+        """stages: list of (name, fn, workers), run in order."""
+        self._store = store
+        self._log = log
+        self._order = [name for name, _, _ in stages]
+        self._fns = {name: fn for name, fn, _ in stages}
+        self._queues = {name: queue.Queue() for name in self._order}
+        for name, _, workers in stages:
+            for i in range(workers):
+                threading.Thread(
+                    target=self._worker, args=(name,), name=f"{name}-{i}", daemon=True
+                ).start()
+
+    def submit(self, url, data, key=None):
+        """Queue a job; returns (job, created) — an active job with the same key is reused."""
+        job, created = self._store.create(url, data, stage=self._order[0], key=key)
+        if created:
+            self._queues[self._order[0]].put(job["id"])
+        return job, created
+
+    def resume(self):
+        """Re-enqueue jobs interrupted by a restart at the stage they were in."""
+        jobs = self._store.unfinished()
+        for job in jobs:
+            stage = job["stage"] if job["stage"] in self._queues else self._order[0]
+            self._queues[stage].put(job["id"])
+        return len(jobs)
+
+    def depth(self):
+        return {name: q.qsize() for name, q in self._queues.items()}
+
+    def _worker(self, stage):
+        while True:
+            job_id = self._queues[stage].get()
+            try:
+                self._run(stage, job_id)
+            finally:
+                self._queues[stage].task_done()
+
+    def _run(self, stage, job_id):
+        job = self._store.update(job_id, status="running", stage=stage)
+        if not job:
+            return
+        try:
+            updates = self._fns[stage](job) or {}
+        except SkipJob as e:
+            self._store.update(job_id, status="skipped", data={"reason": str(e)})
+            self._log(f"⏭️ [OMNI-SYNC] Job {job_id} skipped at {stage}: {e}")
+            return
+        except Exception as e:
+            self._store.update(job_id, status="failed", error=str(e))
+            self._log(f"❌ [OMNI-SYNC] Job {job_id} failed at {stage}: {e}")
+            return
+
+        idx = self._order.index(stage)
+        if idx + 1 < len(self._order):
+            nxt = self._order[idx + 1]
+            self._store.update(job_id, status="queued", stage=nxt, data=updates)
+            self._queues[nxt].put(job_id)
+        else:
+            self._store.update(job_id, status="done", data=updates)
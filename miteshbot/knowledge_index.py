@@ -0,0 +1,252 @@
+"""In-process knowledge snapshot for the voice bot.
+
+Loads one profile's chunk embeddings (knowledge_chunks + legacy knowledge_base)
+into a float32 matrix at startup and answers top-k cosine queries locally with
+NumPy, replacing the per-turn match_knowledge RPC round-trip.
+
+Ranking mirrors 20260623_match_knowledge_prefer_url.sql:
+  similarity = 1 - cosine distance, filtered by > match_threshold,
+  ordered by similarity + 0.02 for rows with a non-empty source_url.
+
+Refresh is incremental and keyed on the same KB version chat-engine uses
+(latest knowledge_sources.created_at for the profile — the value
+bump-kb-version forces it to re-read). Only chunks of new sources are fetched;
+chunks of deleted sources are dropped.
+
+Legacy knowledge_base rows have no source or timestamp, so they carry their
+own version (row count and highest id) and are reloaded whenever it changes.
+The table has no updated_at either, so rows edited in place are picked up by
+a full legacy reload every LEGACY_RELOAD_SECS.
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+URL_BOOST = 0.02
+PAGE_SIZE = 1000
+LEGACY_RELOAD_SECS = 3600
+
+
+class _Snapshot:
+    """Immutable view swapped in atomically on every refresh."""
+
+    def __init__(self, rows, matrix):
+        self.rows = rows          # list of dicts, same shape as match_knowledge rows
+        self.matrix = matrix      # (n, dim) float32, L2-normalised
+        self.boost = np.array(
+            [URL_BOOST if r.get("source_url") else 0.0 for r in rows], dtype=np.float32
+        )
+
+
+def _parse_embedding(value):
+    # PostgREST returns pgvector columns as "[0.1,0.2,...]" strings.
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalise(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class KnowledgeIndex:
+    def __init__(self, supabase, profile_id, refresh_secs=300):
+        self._supabase = supabase
+        self._profile_id = profile_id
+        self._refresh_secs = refresh_secs
+        self._snapshot = None
+        self._version = None
+        self._legacy_version = None
+        self._legacy_loaded_at = 0.0
+        self._source_ids = set()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    @property
+    def version(self):
+        if self._version is None:
+            return None
+        return f"{self._version}/{self._legacy_version[0]}:{self._legacy_version[1]}"
+
+    def start(self):
+        """Load the snapshot and keep it fresh from a daemon thread."""
+        threading.Thread(target=self._run, name=f"knowledge-index-{self._profile_id[:8]}", daemon=True).start()
+
+    def stop(self):
+        """End the refresh thread and drop the snapshot."""
+        self._stopped.set()
+        self._snapshot = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Knowledge index refresh failed: {e}")
+            self._stopped.wait(self._refresh_secs)
+
+    # ── loading ───────────────────────────────────────────────────────────
+    def _select_all(self, build_query):
+        rows, offset = [], 0
+        while True:
+            page = build_query().range(offset, offset + PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+            offset += PAGE_SIZE
+
+    def _fetch_sources(self):
+        return self._select_all(
+            lambda: self._supabase.table("knowledge_sources")
+            .select("id, title, source_url, created_at")
+            .eq("profile_id", self._profile_id)
+            .order("created_at")
+        )
+
+    def _fetch_chunks(self, sources):
+        by_id = {s["id"]: s for s in sources}
+        ids = list(by_id)
+        out = []
+        for i in range(0, len(ids), 100):
+            batch = ids[i:i + 100]
+            for c in self._select_all(
+                lambda: self._supabase.table("knowledge_chunks")
+                .select("id, source_id, content, chunk_index, embedding")
+                .eq("profile_id", self._profile_id)
+                .in_("source_id", batch)
+                .order("id")
+            ):
+                if not c.get("embedding"):
+                    continue
+                src = by_id.get(c["source_id"], {})
+                out.append({
+                    "id": c["id"],
+                    "source_id": c["source_id"],
+                    "content": c.get("content") or "",
+                    "source_title": src.get("title"),
+                    "source_url": src.get("source_url") or "",
+                    "chunk_index": c.get("chunk_index") or 0,
+                    "embedding": c["embedding"],
+                })
+        return out
+
+    def _fetch_legacy(self):
+        out = []
+        for kb in self._select_all(
+            lambda: self._supabase.table("knowledge_base")
+            .select("id, content, metadata, embedding")
+            .eq("profile_id", self._profile_id)
+            .order("id")
+        ):
+            if not kb.get("embedding"):
+                continue
+            meta = kb.get("metadata") or {}
+            out.append({
+                "id": kb["id"],
+                "source_id": None,
+                "content": kb.get("content") or "",
+                "source_title": meta.get("source_title") or meta.get("filename") or "Legacy Knowledge",
+                "source_url": meta.get("source_url") or "",
+                "chunk_index": 0,
+                "embedding": kb["embedding"],
+            })
+        return out
+
+    def _fetch_legacy_version(self):
+        """(row count, highest id) of the profile's knowledge_base rows."""
+        response = (
+            self._supabase.table("knowledge_base")
+            .select("id", count="exact")
+            .eq("profile_id", self._profile_id)
+            .order("id", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return (response.count or 0, response.data[0]["id"] if response.data else None)
+
+    def refresh(self):
+        """Sync the snapshot with the current KB version. Returns True if it changed."""
+        with self._refresh_lock:
+            sources = self._fetch_sources()
+            version = sources[-1]["created_at"] if sources else "0"
+            current_ids = {s["id"] for s in sources}
+            legacy_version = self._fetch_legacy_version()
+            reload_legacy = (
+                legacy_version != self._legacy_version
+                or time.monotonic() - self._legacy_loaded_at >= LEGACY_RELOAD_SECS
+            )
+            if (self._snapshot is not None and version == self._version
+                    and current_ids == self._source_ids and not reload_legacy):
+                return False
+
+            t0 = time.perf_counter()
+            if self._snapshot is None:
+                new_rows = self._fetch_chunks(sources) + self._fetch_legacy()
+                kept_rows, kept_matrix = [], None
+            else:
+                removed = self._source_ids - current_ids
+                added = [s for s in sources if s["id"] not in self._source_ids]
+                new_rows = self._fetch_chunks(added) + (self._fetch_legacy() if reload_legacy else [])
+                old = self._snapshot
+                # Legacy rows (no source_id) are replaced wholesale when reloaded.
+                keep = [
+                    i for i, r in enumerate(old.rows)
+                    if r["source_id"] not in removed and not (reload_legacy and r["source_id"] is None)
+                ]
+                kept_rows = [old.rows[i] for i in keep]
+                kept_matrix = old.matrix[keep]
+
+            new_matrix = (
+                _normalise(np.stack([_parse_embedding(r.pop("embedding")) for r in new_rows]))
+                if new_rows else None
+            )
+            parts = [m for m in (kept_matrix, new_matrix) if m is not None and len(m)]
+            matrix = np.concatenate(parts) if parts else np.zeros((0, 1536), dtype=np.float32)
+
+            if self._stopped.is_set():
+                return False
+            self._snapshot = _Snapshot(kept_rows + new_rows, matrix)
+            self._version = version
+            self._source_ids = current_ids
+            self._legacy_version = legacy_version
+            if reload_legacy:
+                self._legacy_loaded_at = time.monotonic()
+            logger.info(
+                f"Knowledge index v{self.version}: {len(matrix)} chunks "
+                f"(+{len(new_rows)}) in {(time.perf_counter() - t0) * 1000:.0f}ms"
+            )
+            return True
+
+    # ── search ────────────────────────────────────────────────────────────
+    def search(self, query_embedding, match_threshold=0.35, match_count=5):
+        """Local equivalent of the match_knowledge RPC. Returns a list of row dicts."""
+        snap = self._snapshot
+        if snap is None or not len(snap.matrix):
+            return []
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+
+        sims = snap.matrix @ q
+        candidates = np.flatnonzero(sims > match_threshold)
+        if not len(candidates):
+            return []
+        scores = sims[candidates] + snap.boost[candidates]
+        if len(candidates) > match_count:
+            top = np.argpartition(-scores, match_count - 1)[:match_count]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+
+        return [
+            {**snap.rows[i], "similarity": float(sims[i])}
+            for i in candidates[order]
+        ]
@@ -0,0 +1,135 @@
+"""Query-aware packing of retrieved knowledge into the tool result.
+
+fetch_knowledge used to hand the LLM the first 500 characters of each of the
+5 matched chunks. Those prefixes often missed the sentence that actually
+answers the question, and recurring lessons (the KB repeats them across many
+sources) filled the result with the same passage several times.
+
+pack_knowledge instead:
+
+  1. drops chunks that are near-duplicates of a better-ranked chunk,
+  2. splits the rest into sentences and drops near-duplicate sentences,
+  3. scores each sentence by IDF-weighted overlap with the query, plus the
+     chunk's retrieval similarity as a prior,
+  4. greedily takes the best sentences that fit a fixed token budget
+     (only sentences sharing a term with the query, when there are any), and
+     re-emits them in their original chunk/sentence order so they still read
+     as passages.
+
+Everything is lexical and in-process; no extra embedding calls on the turn.
+"""
+
+import math
+import re
+
+from loguru import logger
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?।])\s+|\n+")
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an the and or but if then so of to in on at for with by from as is are was were be been being "
+    "it its this that these those i me my we our you your he she they them their what which who whom "
+    "how why when where do does did can could should would will shall may might must not no yes "
+    "about into than too very just also there here have has had".split()
+)
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _terms(text):
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and len(w) > 1]
+
+
+def _shingles(words, n=3):
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class _Sentence:
+    __slots__ = ("chunk", "pos", "text", "terms", "tokens", "coverage", "score")
+
+    def __init__(self, chunk, pos, text):
+        self.chunk = chunk
+        self.pos = pos
+        self.text = text
+        self.terms = set(_terms(text))
+        self.tokens = estimate_tokens(text)
+        self.coverage = 0.0
+        self.score = 0.0
+
+
+def _distinct_chunks(matches, threshold):
+    kept, shingles = [], []
+    for row in matches:
+        content = (row.get("content") or "").strip()
+        if not content:
+            continue
+        sh = _shingles(_WORD_RE.findall(content.lower()))
+        if any(_jaccard(sh, other) >= threshold for other in shingles):
+            continue
+        kept.append((content, row.get("similarity")))
+        shingles.append(sh)
+    return kept
+
+
+def pack_knowledge(query, matches, budget_tokens=400, dedup_threshold=0.8, min_words=3):
+    """Best query-relevant sentences from `matches` (in rank order) within `budget_tokens`."""
+    chunks = _distinct_chunks(matches, dedup_threshold)
+    if not chunks:
+        return ""
+
+    sentences, seen = [], []
+    for ci, (content, _) in enumerate(chunks):
+        for pos, text in enumerate(s.strip() for s in _SENTENCE_RE.split(content)):
+            if len(_WORD_RE.findall(text)) < min_words:
+                continue
+            sentence = _Sentence(ci, pos, text)
+            if any(_jaccard(sentence.terms, other) >= dedup_threshold for other in seen):
+                continue
+            seen.append(sentence.terms)
+            sentences.append(sentence)
+    if not sentences:
+        return ""
+
+    # IDF over the candidate pool: words every sentence shares carry no signal.
+    query_terms = set(_terms(query))
+    n = len(sentences)
+    idf = {t: math.log(1 + n / (1 + sum(t in s.terms for s in sentences))) for t in query_terms}
+    query_weight = sum(idf.values()) or 1.0
+    for s in sentences:
+        similarity = chunks[s.chunk][1]
+        prior = similarity if similarity is not None else 1.0 / (2 + s.chunk)
+        s.coverage = sum(idf[t] for t in query_terms & s.terms) / query_weight
+        s.score = s.coverage + 0.5 * prior + (0.05 if s.pos == 0 else 0.0)
+
+    # Leftover budget is not spent on sentences that share nothing with the
+    # query — unless nothing does (e.g. a paraphrased or Hinglish query).
+    candidates = [s for s in sentences if s.coverage > 0] or sentences
+    picked, used = [], 0
+    for s in sorted(candidates, key=lambda s: s.score, reverse=True):
+        if used + s.tokens <= budget_tokens:
+            picked.append(s)
+            used += s.tokens
+    if not picked:
+        # A single sentence longer than the whole budget — trim the best one.
+        best = max(candidates, key=lambda s: s.score)
+        best.text = best.text[:budget_tokens * 4].rsplit(" ", 1)[0] + "…"
+        picked = [best]
+
+    picked.sort(key=lambda s: (s.chunk, s.pos))
+    passages = {}
+    for s in picked:
+        passages.setdefault(s.chunk, []).append(s.text)
+    packed = "\n\n".join(" ".join(texts) for texts in passages.values())
+    logger.debug(
+        f"Knowledge packed: {len(matches)} chunks → {len(chunks)} distinct, "
+        f"{len(picked)}/{len(sentences)} sentences, ~{estimate_tokens(packed)} tokens"
+    )
+    return packed
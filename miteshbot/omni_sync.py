@@ -1,11 +1,16 @@
 from flask import Flask, request, jsonify
 import os
 import subprocess
-import uuid
+import threading
 import requests
 from openai import OpenAI
 from supabase import create_client
 
+from dedup_index import DedupIndex, canonical_media_id, file_sha256, split_passages
+from job_queue import JobStore, SkipJob, StagedQueue
+from minhash import NEAR_DUP_THRESHOLD, minhash, similarity
+from transcribe import transcribe_media
+
 app = Flask(__name__)
 
 # Clients
@@ -16,11 +21,198 @@ supabase = create_client(supabase_url, supabase_key)
 
 OMNI_SYNC_SECRET = os.environ.get("OMNI_SYNC_SECRET")
 
+# Work dir + job DB should sit on a volume so queued jobs survive restarts.
+WORK_DIR = os.environ.get("OMNI_WORK_DIR", "omni_work")
+DOWNLOAD_WORKERS = int(os.environ.get("OMNI_DOWNLOAD_WORKERS", "2"))
+TRANSCRIBE_WORKERS = int(os.environ.get("OMNI_TRANSCRIBE_WORKERS", "4"))
+INGEST_WORKERS = int(os.environ.get("OMNI_INGEST_WORKERS", "4"))
+os.makedirs(WORK_DIR, exist_ok=True)
+
+
+def _authorized():
+    # --- AUTH: shared-secret header required (this worker has no other gate) ---
+    return OMNI_SYNC_SECRET and request.headers.get("X-Sync-Secret") == OMNI_SYNC_SECRET
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+
+def download_stage(job):
+    url = job["url"]
+    source = job["data"]["source"]
+    media_id = job["data"].get("mediaId") or canonical_media_id(url)
+    print(f"📥 [OMNI-SYNC] Starting download for {source}: {url}")
+
+    # --- DEDUP: skip if this media was already processed ---
+    if dedup.seen(media_id):
+        raise SkipJob("already_processed")
+
+    # Unique filename per job — avoids clobbering when downloads overlap
+    audio_file = os.path.join(WORK_DIR, f"temp_audio_{job['id']}.mp3")
+
+    # 1. Download audio using yt-dlp (Extract audio to save Whisper API costs)
+    output_template = os.path.join(WORK_DIR, f"temp_audio_{job['id']}.%(ext)s")
+    download_command = [
+        "yt-dlp",
+        "-x", "--audio-format", "mp3",
+        "-o", output_template,
+    ]
+
+    # Add platform-specific cookies dynamically
+    if source == "youtube":
+        download_command.extend(["--extractor-args", "youtube:player_client=android"])
+        if os.path.exists("youtube_cookies.txt"):
+            print("🍪 [OMNI-SYNC] Using YouTube cookies...")
+            download_command.extend(["--cookies", "youtube_cookies.txt"])
+    elif source == "instagram":
+        if os.path.exists("instagram_cookies.txt"):
+            print("🍪 [OMNI-SYNC] Using Instagram cookies...")
+            download_command.extend(["--cookies", "instagram_cookies.txt"])
+
+    download_command.extend(["--", url])
+    result = subprocess.run(download_command, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(audio_file):
+            os.remove(audio_file)
+        raise Exception(f"yt-dlp failed: {result.stderr}")
+
+    # Same audio re-posted under a different URL — don't pay for Whisper twice.
+    audio_hash = file_sha256(audio_file)
+    if dedup.audio_seen(audio_hash):
+        os.remove(audio_file)
+        dedup.add(media_id, url, audio_hash)
+        raise SkipJob("duplicate_audio")
+
+    return {"audio_file": audio_file, "audioHash": audio_hash, "mediaId": media_id}
+
+
+def transcribe_stage(job):
+    audio_file = job["data"].get("audio_file")
+    if not audio_file or not os.path.exists(audio_file):
+        raise Exception("audio file missing — re-submit the URL")
+
+    # 2. Transcribe with OpenAI Whisper — long media is split at pauses and
+    # the segments are transcribed in parallel.
+    text_content = transcribe_media(openai_client, audio_file, WORK_DIR)
+
+    # Cleanup audio file
+    os.remove(audio_file)
+    return {"transcript": text_content, "audio_file": None}
+
+
+def collapse_known_passages(profile_id, text):
+    """Drop passages the profile already has (or that repeat earlier in this text).
+
+    Returns (remaining text, signatures of the kept passages, collapsed report).
+    """
+    kept, signatures, collapsed = [], [], []
+    for i, (start, end) in enumerate(split_passages(text)):
+        signature = minhash(text[start:end])
+        match = dedup.find_passage(profile_id, signature)
+        if match is None:
+            # Repeats within this transcript (a lesson replayed in one video).
+            similar = [similarity(signature, s) for s in signatures]
+            if similar and max(similar) >= NEAR_DUP_THRESHOLD:
+                match = (None, max(similar))
+        if match is None:
+            kept.append((start, end))
+            signatures.append(signature)
+        else:
+            collapsed.append({"passage": i, "canonicalUrl": match[0], "similarity": round(match[1], 3)})
+
+    # Adjacent kept passages go back together as one stretch of text.
+    merged = []
+    for start, end in kept:
+        if merged and start == merged[-1][1]:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return "\n\n".join(text[s:e].strip() for s, e in merged), signatures, collapsed
+
+
+def ingest_stage(job):
+    data = job["data"]
+    source = data["source"]
+    text_content = data["transcript"]
+
+    # Recurring lessons get re-posted as new videos — only new passages are
+    # sent on to be embedded.
+    text_content, signatures, collapsed = collapse_known_passages(data["profileId"], text_content)
+    if collapsed:
+        print(f"🧬 [OMNI-SYNC] Collapsed {len(collapsed)} near-duplicate passages of {job['url']}, "
+              f"{len(signatures)} new")
+    if not signatures:
+        dedup.add(data["mediaId"], job["url"], data.get("audioHash"))
+        raise SkipJob("duplicate_content")
+
+    # 3. Hand off to ingest-content's shared chunking + embedding pipeline —
+    # this is the same code path Drive/file uploads use, so it writes
+    # knowledge_sources + knowledge_chunks in the shape RAG search expects.
+    print("💾 [OMNI-SYNC] Sending transcript to ingest-content for chunking + embedding...")
+    ingest_resp = requests.post(
+        f"{supabase_url}/functions/v1/ingest-content",
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {supabase_key}"
+        },
+        json={
+            "action": "ingest_text",
+            "title": f"Auto-Sync: {source.capitalize()} Video",
+            "content": text_content,
+            "url": job["url"],
+            "type": source,
+            "userId": data["userId"],
+            "profileId": data["profileId"]
+        },
+        timeout=120
+    )
+
+    if not ingest_resp.ok:
+        raise Exception(f"ingest-content failed: {ingest_resp.status_code} {ingest_resp.text}")
+
+    ingest_result = ingest_resp.json()
+    dedup.add(data["mediaId"], job["url"], data.get("audioHash"))
+    dedup.add_passages(data["profileId"], job["url"], signatures)
+    print(f"✅ [OMNI-SYNC] Processing complete for {job['url']}! Chunks: {ingest_result.get('chunks')}")
+    # Transcript is no longer needed once ingested — keep the job row small.
+    return {
+        "transcript": None,
+        "words": len(text_content.split()),
+        "chunks": ingest_result.get("chunks"),
+        "collapsedPassages": len(collapsed),
+        "collapsed": collapsed[:20],
+    }
+
+
+# Seeded from knowledge_sources in the background; duplicate webhook
+# deliveries are then rejected locally without touching Supabase or yt-dlp.
+dedup = DedupIndex(os.path.join(WORK_DIR, "dedup.db"))
+
+
+def _seed_dedup():
+    try:
+        print(f"🧮 [OMNI-SYNC] Dedup index seeded with {dedup.seed_from_supabase(supabase)} known sources")
+    except Exception as e:
+        print(f"⚠️ [OMNI-SYNC] Dedup seed failed: {e}")
+
+
+threading.Thread(target=_seed_dedup, daemon=True).start()
+
+job_store = JobStore(os.path.join(WORK_DIR, "jobs.db"))
+jobs = StagedQueue(job_store, [
+    ("download", download_stage, DOWNLOAD_WORKERS),
+    ("transcribe", transcribe_stage, TRANSCRIBE_WORKERS),
+    ("ingest", ingest_stage, INGEST_WORKERS),
+])
+resumed = jobs.resume()
+if resumed:
+    print(f"🔁 [OMNI-SYNC] Resumed {resumed} unfinished jobs from {WORK_DIR}")
+
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
 
 @app.route('/process_media', methods=['POST'])
 def process_media():
-    # --- AUTH: shared-secret header required (this worker has no other gate) ---
-    if not OMNI_SYNC_SECRET or request.headers.get("X-Sync-Secret") != OMNI_SYNC_SECRET:
+    if not _authorized():
         return jsonify({'error': 'Unauthorized'}), 401
 
     data = request.json
@@ -34,90 +226,40 @@ def process_media():
     if not profile_id or not user_id:
         return jsonify({'error': 'profileId and userId are required'}), 400
 
-    print(f"📥 [OMNI-SYNC] Starting download for {source}: {url}")
-
-    # --- DEDUP: skip if this URL was already processed ---
-    existing = supabase.table("knowledge_sources").select("id").eq("source_url", url).execute()
-    if existing.data:
+    media_id = canonical_media_id(url)
+    if dedup.seen(media_id):
         print(f"⏭️ [OMNI-SYNC] Already processed, skipping: {url}")
         return jsonify({'status': 'skipped', 'reason': 'already_processed', 'source': source})
 
-    # Unique filename per request — avoids clobbering when requests overlap
-    job_id = uuid.uuid4().hex
-    audio_file = f"temp_audio_{job_id}.mp3"
+    # Same media already waiting or in progress — hand back that job.
+    job, created = jobs.submit(url, {'source': source, 'profileId': profile_id, 'userId': user_id, 'mediaId': media_id}, key=media_id)
+    if not created:
+        return jsonify({'status': 'queued', 'jobId': job['id'], 'source': source, 'duplicate': True}), 202
 
-    try:
-        # 1. Download audio using yt-dlp (Extract audio to save Whisper API costs)
-        output_template = f"temp_audio_{job_id}.%(ext)s"
-        download_command = [
-            "yt-dlp",
-            "-x", "--audio-format", "mp3",
-            "-o", output_template,
-        ]
-
-        # Add platform-specific cookies dynamically
-        if source == "youtube":
-            download_command.extend(["--extractor-args", "youtube:player_client=android"])
-            if os.path.exists("youtube_cookies.txt"):
-                print("🍪 [OMNI-SYNC] Using YouTube cookies...")
-                download_command.extend(["--cookies", "youtube_cookies.txt"])
-        elif source == "instagram":
-            if os.path.exists("instagram_cookies.txt"):
-                print("🍪 [OMNI-SYNC] Using Instagram cookies...")
-                download_command.extend(["--cookies", "instagram_cookies.txt"])
-
-        download_command.extend(["--", url])
-        result = subprocess.run(download_command, capture_output=True, text=True)
-        if result.returncode != 0:
-            raise Exception(f"yt-dlp failed: {result.stderr}")
-
-        # 2. Transcribe with OpenAI Whisper
-        print("🎙️ [OMNI-SYNC] Transcribing audio with Whisper...")
-        with open(audio_file, "rb") as file:
-            transcription = openai_client.audio.transcriptions.create(
-                model="whisper-1",
-                file=file
-            )
-        text_content = transcription.text
-
-        # Cleanup audio file
-        os.remove(audio_file)
+    print(f"📨 [OMNI-SYNC] Queued job {job['id']} for {source}: {url}")
+    return jsonify({'status': 'queued', 'jobId': job['id'], 'source': source}), 202
 
-        # 3. Hand off to ingest-content's shared chunking + embedding pipeline —
-        # this is the same code path Drive/file uploads use, so it writes
-        # knowledge_sources + knowledge_chunks in the shape RAG search expects.
-        print("💾 [OMNI-SYNC] Sending transcript to ingest-content for chunking + embedding...")
-        ingest_resp = requests.post(
-            f"{supabase_url}/functions/v1/ingest-content",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {supabase_key}"
-            },
-            json={
-                "action": "ingest_text",
-                "title": f"Auto-Sync: {source.capitalize()} Video",
-                "content": text_content,
-                "url": url,
-                "type": source,
-                "userId": user_id,
-                "profileId": profile_id
-            },
-            timeout=120
-        )
-
-        if not ingest_resp.ok:
-            raise Exception(f"ingest-content failed: {ingest_resp.status_code} {ingest_resp.text}")
-
-        ingest_result = ingest_resp.json()
-        print(f"✅ [OMNI-SYNC] Processing complete for {url}! Chunks: {ingest_result.get('chunks')}")
-        return jsonify({'status': 'success', 'source': source, 'words': len(text_content.split()), 'chunks': ingest_result.get('chunks')})
 
-    except Exception as e:
-        print(f"❌ [OMNI-SYNC] Error: {str(e)}")
-        if os.path.exists(audio_file):
-            os.remove(audio_file)
-        return jsonify({'error': str(e)}), 500
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    if not _authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    job = job_store.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    data = {k: v for k, v in job['data'].items() if k not in ('transcript', 'audio_file')}
+    return jsonify({
+        'jobId': job['id'],
+        'url': job['url'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'error': job['error'],
+        'queueDepth': jobs.depth(),
+        **data,
+    })
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
+    app.run(host='0.0.0.0', port=int(os.environ.get("OMNI_PORT", "5001")), threaded=True)
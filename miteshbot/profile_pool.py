@@ -0,0 +1,136 @@
+"""Per-profile resources shared by every session in the bot process.
+
+One process serves calls for any clone profile. The first session for a
+profile opens its resources (knowledge snapshot, scripted audio, voice);
+later sessions for the same profile lease the same object. Each lease bumps
+a reference count; when the last session of a profile ends its resources
+stay warm for `idle_secs` and are then closed, so a process that has served
+many profiles only keeps the busy ones in memory.
+"""
+
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+
+def resolve_profile_id(runner_args, default):
+    """Profile for a session: /start body, then room URL query, then `default`.
+
+    Values that are not UUIDs are ignored — the id ends up in PostgREST
+    filters and cache file names.
+    """
+    body = getattr(runner_args, "body", None) or {}
+    candidates = [body.get("profile_id"), body.get("profileId")]
+    metadata = body.get("metadata")
+    if isinstance(metadata, dict):
+        candidates.append(metadata.get("profile_id"))
+    room_url = getattr(runner_args, "room_url", None)
+    if room_url:
+        candidates += parse_qs(urlparse(room_url).query).get("profile_id", [])
+
+    for value in candidates:
+        if not value:
+            continue
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            logger.warning(f"Ignoring invalid profile id {value!r}")
+    return default
+
+
+class _Entry:
+    __slots__ = ("resources", "refs", "idle_since")
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.refs = 0
+        self.idle_since = time.monotonic()
+
+
+class ProfilePool:
+    def __init__(self, open_resources, close_resources=None, idle_secs=900, sweep_secs=60):
+        self._open = open_resources            # async fn(profile_id) -> resources
+        self._close = close_resources          # fn(profile_id, resources)
+        self._idle_secs = idle_secs
+        self._sweep_secs = sweep_secs
+        self._entries = {}                     # profile_id -> _Entry
+        self._opening = {}                     # profile_id -> asyncio.Task
+        self._sweeper = None
+        self.opened = 0
+        self.evicted = 0
+
+    async def acquire(self, profile_id):
+        entry = self._entries.get(profile_id)
+        if entry is None:
+            task = self._opening.get(profile_id)
+            if task is None:
+                task = asyncio.create_task(self._open_entry(profile_id))
+                self._opening[profile_id] = task
+                task.add_done_callback(lambda _t: self._opening.pop(profile_id, None))
+            entry = await asyncio.shield(task)
+        entry.refs += 1
+        self._ensure_sweeper()
+        return entry.resources
+
+    async def _open_entry(self, profile_id):
+        t0 = time.perf_counter()
+        entry = _Entry(await self._open(profile_id))
+        self._entries[profile_id] = entry
+        self.opened += 1
+        logger.info(f"Profile {profile_id} resources opened in {(time.perf_counter() - t0) * 1000:.0f}ms")
+        return entry
+
+    def release(self, profile_id):
+        entry = self._entries.get(profile_id)
+        if entry is None:
+            return
+        entry.refs = max(entry.refs - 1, 0)
+        if entry.refs == 0:
+            entry.idle_since = time.monotonic()
+
+    @asynccontextmanager
+    async def lease(self, profile_id):
+        resources = await self.acquire(profile_id)
+        try:
+            yield resources
+        finally:
+            self.release(profile_id)
+
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        idle = [
+            pid for pid, e in self._entries.items()
+            if e.refs == 0 and now - e.idle_since >= self._idle_secs
+        ]
+        for pid in idle:
+            entry = self._entries.pop(pid)
+            self.evicted += 1
+            logger.info(f"Profile {pid} idle for {now - entry.idle_since:.0f}s — releasing its resources")
+            if self._close is not None:
+                try:
+                    self._close(pid, entry.resources)
+                except Exception as e:
+                    logger.warning(f"Closing profile {pid} failed: {e}")
+        return idle
+
+    def _ensure_sweeper(self):
+        # The pipecat runner has no startup hook; start on the first lease.
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _sweep(self):
+        while self._entries:
+            await asyncio.sleep(self._sweep_secs)
+            self.evict_idle()
+
+    def stats(self):
+        return {
+            "profiles": len(self._entries),
+            "sessions": sum(e.refs for e in self._entries.values()),
+            "opened": self.opened,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,155 @@
+"""Speculative RAG prefetch on interim STT transcripts.
+
+Without this, retrieval only starts after STT finalises AND the LLM has
+emitted a search_knowledge_base tool call. RAGPrefetcher sits between `stt`
+and `context_aggregator.user()` and starts retrieval as soon as an interim
+transcript has been stable for a moment, so the embedding call overlaps with
+the user still speaking. handle_search_knowledge then asks take() for a
+prefetched result whose transcript matches the LLM's query closely enough.
+
+A prefetch belongs to one user turn: once a final transcript has claimed it,
+the next UserStartedSpeakingFrame drops it, so a later turn repeating the
+same words fetches afresh. Failed prefetches are never reused.
+"""
+
+import asyncio
+import re
+import time
+
+from loguru import logger
+from pipecat.frames.frames import InterimTranscriptionFrame, TranscriptionFrame, UserStartedSpeakingFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+_FAILED = ("Knowledge search failed.", "Knowledge search timed out.")
+_STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "you", "your", "is", "are", "am", "to", "of",
+    "and", "or", "in", "on", "for", "it", "how", "what", "can", "do", "does", "about",
+}
+
+
+def _tokens(text):
+    words = re.findall(r"\w+", (text or "").lower())
+    return {w for w in words if w not in _STOPWORDS}
+
+
+def match_score(query, transcript):
+    """Fraction of the query's content words that appear in the transcript."""
+    q = _tokens(query)
+    if not q:
+        return 0.0
+    return len(q & _tokens(transcript)) / len(q)
+
+
+class _Prefetch:
+    def __init__(self, text, task):
+        self.text = text
+        self.key = " ".join(sorted(_tokens(text)))
+        self.task = task
+        self.started = time.monotonic()
+        self.final = False                   # claimed by the turn's final transcript
+
+    def failed(self):
+        if not self.task.done():
+            return False
+        if self.task.cancelled() or self.task.exception() is not None:
+            return True
+        return not self.task.result() or self.task.result() in _FAILED
+
+
+class RAGPrefetcher(FrameProcessor):
+    """Starts retrieval on stable interim transcripts; latest prefetch wins."""
+
+    def __init__(self, fetch, stable_secs=0.25, min_words=3, min_score=0.6, max_age_secs=20.0, **kwargs):
+        super().__init__(**kwargs)
+        self._fetch = fetch                  # async fn(query_text) -> knowledge str
+        self._stable_secs = stable_secs
+        self._min_words = min_words
+        self._min_score = min_score
+        self._max_age = max_age_secs
+        self._current = None                 # _Prefetch
+        self._debounce = None                # asyncio.Task waiting for the interim to settle
+        self.hits = 0
+        self.misses = 0
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, InterimTranscriptionFrame):
+            self._schedule(frame.text, self._stable_secs)
+        elif isinstance(frame, TranscriptionFrame):
+            self._schedule(frame.text, 0, final=True)
+        elif isinstance(frame, UserStartedSpeakingFrame):
+            self._end_turn()
+
+        await self.push_frame(frame, direction)
+
+    # ── scheduling ────────────────────────────────────────────────────────
+    def _schedule(self, text, delay, final=False):
+        text = (text or "").strip()
+        if len(text.split()) < self._min_words:
+            return
+        if self._debounce and not self._debounce.done():
+            self._debounce.cancel()
+        self._debounce = asyncio.create_task(self._start_after(text, delay, final))
+
+    async def _start_after(self, text, delay, final=False):
+        if delay:
+            await asyncio.sleep(delay)
+        prev = self._current
+        key = " ".join(sorted(_tokens(text)))
+        # Reuse this turn's prefetch of the same words, unless it failed.
+        if prev and prev.key == key and not prev.final and not prev.failed():
+            prev.final = final
+            return
+        if prev and not prev.task.done():
+            # Superseded — the user kept talking and changed what they're asking.
+            prev.task.cancel()
+        logger.debug(f"RAG prefetch: '{text}'")
+        self._current = _Prefetch(text, asyncio.create_task(self._fetch(text)))
+        self._current.final = final
+
+    def _end_turn(self):
+        """A new user turn: drop the prefetch the last turn's final transcript claimed."""
+        pf = self._current
+        if pf is not None and pf.final:
+            self._current = None
+            if not pf.task.done():
+                pf.task.cancel()
+
+    # ── consumption ───────────────────────────────────────────────────────
+    async def take(self, query, timeout):
+        """Return prefetched knowledge for `query`, or None if no close match."""
+        pf = self._current
+        if (
+            pf is None
+            or pf.failed()
+            or time.monotonic() - pf.started > self._max_age
+            or match_score(query, pf.text) < self._min_score
+        ):
+            if pf is not None and pf.failed():
+                self._current = None
+            self.misses += 1
+            return None
+        self._current = None
+        try:
+            knowledge = await asyncio.wait_for(asyncio.shield(pf.task), timeout=timeout)
+        except asyncio.CancelledError:
+            if not pf.task.cancelled():
+                raise
+            self.misses += 1
+            return None
+        except Exception:
+            self.misses += 1
+            return None
+        if not knowledge or knowledge in _FAILED:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"RAG prefetch hit for '{query}' (transcript '{pf.text}')")
+        return knowledge
+
+    async def cleanup(self):
+        await super().cleanup()
+        for task in (self._debounce, self._current.task if self._current else None):
+            if task and not task.done():
+                task.cancel()
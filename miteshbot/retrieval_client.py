@@ -0,0 +1,76 @@
+"""Async retrieval clients shared by every session in the bot process.
+
+One httpx.AsyncClient (HTTP/2, keep-alive pool) backs both the OpenAI SDK and
+direct PostgREST calls to Supabase, so concurrent calls reuse warm TLS
+connections instead of each pushing a sync request through asyncio.to_thread.
+Because everything is a native coroutine, asyncio.wait_for actually cancels
+the in-flight request on timeout instead of orphaning a worker thread.
+"""
+
+import httpx
+import openai as openai_module
+from loguru import logger
+
+PROFILE_FIELDS = "name, headline, description, purpose, instructions, speaking_style"
+
+
+class RetrievalClient:
+    def __init__(self, supabase_url, supabase_key, openai_api_key, max_connections=100):
+        self._supabase_url = (supabase_url or "").rstrip("/")
+        self._supabase_key = supabase_key
+        self.http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=120,
+            ),
+            timeout=httpx.Timeout(10.0, connect=3.0),
+        )
+        self.openai = openai_module.AsyncOpenAI(api_key=openai_api_key, http_client=self.http)
+
+    @property
+    def supabase_configured(self):
+        return bool(self._supabase_url and self._supabase_key)
+
+    def _rest_headers(self, extra=None):
+        headers = {
+            "apikey": self._supabase_key,
+            "Authorization": f"Bearer {self._supabase_key}",
+            "Content-Type": "application/json",
+        }
+        headers.update(extra or {})
+        return headers
+
+    async def embed(self, text, model):
+        response = await self.openai.embeddings.create(model=model, input=text)
+        return response.data[0].embedding
+
+    async def rpc(self, fn, params):
+        resp = await self.http.post(
+            f"{self._supabase_url}/rest/v1/rpc/{fn}",
+            json=params,
+            headers=self._rest_headers(),
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    async def get_profile(self, profile_id):
+        if not self.supabase_configured or not profile_id:
+            return {}
+        try:
+            resp = await self.http.get(
+                f"{self._supabase_url}/rest/v1/mind_profile",
+                params={"select": PROFILE_FIELDS, "id": f"eq.{profile_id}"},
+                headers=self._rest_headers({"Accept": "application/vnd.pgrst.object+json"}),
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            logger.info(f"Profile loaded: {data.get('name', 'Unknown')}")
+            return data
+        except Exception as e:
+            logger.warning(f"Profile fetch failed: {e}")
+            return {}
+
+    async def aclose(self):
+        await self.http.aclose()
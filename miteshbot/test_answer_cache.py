@@ -0,0 +1,115 @@
+"""One voice turn through AnswerCacheGate → tts → AnswerRecorder.
+
+Run with: python -m pytest -q test_answer_cache.py
+"""
+
+import asyncio
+
+from pipecat.frames.frames import (
+    BotStoppedSpeakingFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStoppedFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.tts_service import TTSService
+from pipecat.tests.utils import SleepFrame, run_test
+
+from answer_cache import AnswerCache, AnswerCacheGate, AnswerRecorder, self_contained
+
+PROFILE = "00000000-0000-0000-0000-000000000001"
+QUESTION = "How do I practice gratitude every morning?"
+ANSWER = "Start each morning by writing three things you are grateful for."
+
+
+class FakeTTS(TTSService):
+    """Speaks every sentence as 100ms of silence."""
+
+    def __init__(self, **kwargs):
+        super().__init__(push_stop_frames=True, stop_frame_timeout_s=0.1, sample_rate=16000, **kwargs)
+
+    def can_generate_metrics(self):
+        return False
+
+    async def run_tts(self, text, context_id):
+        yield TTSAudioRawFrame(b"\x00\x00" * 1600, 16000, 1, context_id=context_id)
+
+
+class FakeOutput(FrameProcessor):
+    """Stands in for transport.output(): reports the bot done speaking."""
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        await self.push_frame(frame, direction)
+        if isinstance(frame, TTSStoppedFrame):
+            await self.push_frame(BotStoppedSpeakingFrame(), FrameDirection.UPSTREAM)
+
+
+class FakeContext:
+    def __init__(self):
+        self.messages = []
+
+    def add_message(self, message):
+        self.messages.append(message)
+
+
+def _turn(cache, question=QUESTION):
+    embeddings = {}
+
+    async def embed(text):
+        embeddings[text] = [1.0] + [0.0] * 1535
+        return embeddings[text]
+
+    gate = AnswerCacheGate(cache, embed, embeddings.get, PROFILE, lambda: 1, FakeContext())
+    recorder = AnswerRecorder(cache, gate, PROFILE)
+    pipeline = Pipeline([gate, recorder.text_tap, FakeTTS(), recorder, FakeOutput()])
+    frames = [
+        TranscriptionFrame(question, "user", "now"),
+        SleepFrame(0.1),
+        LLMFullResponseStartFrame(),
+        LLMTextFrame(ANSWER),
+        LLMFullResponseEndFrame(),
+        SleepFrame(0.5),
+    ]
+    return asyncio.run(run_test(pipeline, frames_to_send=frames))
+
+
+def test_answer_is_stored_after_tts():
+    cache = AnswerCache(max_entries=4)
+    _turn(cache)
+    entry = cache.lookup([1.0] + [0.0] * 1535, PROFILE, 1)
+    assert entry is not None
+    assert entry.text == ANSWER
+    assert entry.audio and entry.sample_rate == 16000
+
+
+def test_follow_up_is_not_stored():
+    cache = AnswerCache(max_entries=4)
+    _turn(cache, "Tell me more about that please")
+    assert cache.stats()["entries"] == 0
+
+
+def test_only_the_first_turn_is_looked_up():
+    cache = AnswerCache(max_entries=4)
+    _turn(cache)
+    embeddings = {QUESTION: [1.0] + [0.0] * 1535, "What is the law of attraction about?": [0.0, 1.0] + [0.0] * 1534}
+
+    def gate():
+        return AnswerCacheGate(cache, None, embeddings.get, PROFILE, lambda: 1, FakeContext())
+
+    first = gate()
+    assert first._lookup(QUESTION) is not None
+    later = gate()
+    assert later._lookup("What is the law of attraction about?") is None
+    assert later._lookup(QUESTION) is None
+
+
+def test_self_contained():
+    assert self_contained(QUESTION)
+    assert not self_contained("what do you mean by that")
+    assert not self_contained("Hi, my name is Priya, how do I stay calm?")
+    assert not self_contained("why?")
@@ -0,0 +1,60 @@
+"""RAGPrefetcher turn scoping and failure handling.
+
+Run with: python -m pytest -q test_rag_prefetch.py
+"""
+
+import asyncio
+
+from rag_prefetch import RAGPrefetcher
+
+QUESTION = "how do I stay calm before a big meeting"
+
+
+def _prefetcher(results):
+    calls = []
+
+    async def fetch(text):
+        calls.append(text)
+        return results.pop(0)
+
+    return RAGPrefetcher(fetch=fetch), calls
+
+
+def test_later_turn_fetches_afresh():
+    async def run():
+        prefetcher, calls = _prefetcher(["turn one", "turn two"])
+        await prefetcher._start_after(QUESTION, 0, final=True)
+        await asyncio.sleep(0)
+        prefetcher._end_turn()                       # user starts the next turn
+        await prefetcher._start_after(QUESTION, 0, final=True)
+        knowledge = await prefetcher.take(QUESTION, timeout=1)
+        return knowledge, calls
+
+    knowledge, calls = asyncio.run(run())
+    assert knowledge == "turn two"
+    assert len(calls) == 2
+
+
+def test_interim_prefetch_is_reused_by_its_final_transcript():
+    async def run():
+        prefetcher, calls = _prefetcher(["knowledge"])
+        await prefetcher._start_after(QUESTION, 0)
+        await prefetcher._start_after(QUESTION, 0, final=True)
+        return await prefetcher.take(QUESTION, timeout=1), calls
+
+    knowledge, calls = asyncio.run(run())
+    assert knowledge == "knowledge"
+    assert len(calls) == 1
+
+
+def test_failed_prefetch_is_retried():
+    async def run():
+        prefetcher, calls = _prefetcher(["Knowledge search failed.", "knowledge"])
+        await prefetcher._start_after(QUESTION, 0)
+        await asyncio.sleep(0)
+        await prefetcher._start_after(QUESTION, 0, final=True)
+        return await prefetcher.take(QUESTION, timeout=1), calls
+
+    knowledge, calls = asyncio.run(run())
+    assert knowledge == "knowledge"
+    assert len(calls) == 2
@@ -0,0 +1,27 @@
+"""Modules copied into the app-81mqyjlan9xd service must match the originals here.
+
+Each service is built from its own directory, so shared stdlib-only modules
+are vendored rather than imported across the tree.
+
+Run with: python -m pytest -q test_vendored.py
+"""
+
+import os
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "..", "app-81mqyjlan9xd")
+
+VENDORED = [
+    ("capacity.py", os.path.join(APP, "capacity.py")),
+    ("minhash.py", os.path.join(APP, "etc", "minhash.py")),
+]
+
+
+@pytest.mark.parametrize("original, copy", VENDORED)
+def test_vendored_copy_matches(original, copy):
+    if not os.path.exists(copy):
+        pytest.skip(f"{copy} is not in this checkout")
+    with open(os.path.join(HERE, original), "rb") as a, open(copy, "rb") as b:
+        assert a.read() == b.read(), f"{copy} differs from miteshbot/{original}"
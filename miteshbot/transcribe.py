@@ -0,0 +1,121 @@
+"""Segmented, parallel Whisper transcription for long media.
+
+Sending a whole hour-long coaching session to whisper-1 in one call is
+strictly serial and fails above the API's 25 MB upload limit. Instead:
+
+  1. ffmpeg silencedetect finds pauses; the audio is cut near every
+     SEGMENT_SECS at the closest pause (hard cut if there is none).
+  2. Each segment gets OVERLAP_SECS of extra audio on both sides so no word
+     is lost at a cut, and is re-encoded to mono 16 kHz low-bitrate mp3.
+  3. Segments are transcribed concurrently with a bounded pool.
+  4. Texts are stitched in order, dropping words repeated in the overlap.
+"""
+
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+SEGMENT_SECS = float(os.environ.get("TRANSCRIBE_SEGMENT_SECS", "600"))
+OVERLAP_SECS = float(os.environ.get("TRANSCRIBE_OVERLAP_SECS", "1.5"))
+SEARCH_WINDOW_SECS = 60.0     # how far from the target cut to look for a pause
+SEGMENT_WORKERS = int(os.environ.get("TRANSCRIBE_SEGMENT_WORKERS", "4"))
+SEGMENT_BITRATE = os.environ.get("TRANSCRIBE_SEGMENT_BITRATE", "32k")
+
+
+def probe_duration(path):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip())
+
+
+def detect_silences(path, noise_db=-30, min_silence=0.4):
+    """Return [(start, end)] of silent stretches."""
+    out = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", path,
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    starts = [float(x) for x in re.findall(r"silence_start: ([\d.]+)", out.stderr)]
+    ends = [float(x) for x in re.findall(r"silence_end: ([\d.]+)", out.stderr)]
+    return list(zip(starts, ends))
+
+
+def plan_cuts(duration, silences, segment_secs=SEGMENT_SECS):
+    """Pick cut points near every segment_secs, preferring the middle of a pause."""
+    mids = [(s + e) / 2 for s, e in silences]
+    cuts, pos = [], 0.0
+    while duration - pos > segment_secs * 1.25:
+        target = pos + segment_secs
+        near = [m for m in mids if abs(m - target) <= SEARCH_WINDOW_SECS and m > pos + 1]
+        cut = min(near, key=lambda m: abs(m - target)) if near else target
+        cuts.append(cut)
+        pos = cut
+    return cuts
+
+
+def _encode_segment(src, dst, start, length):
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+         "-ss", f"{start:.3f}", "-t", f"{length:.3f}", "-i", src,
+         "-ac", "1", "-ar", "16000", "-b:a", SEGMENT_BITRATE, dst],
+        check=True,
+    )
+
+
+def _words(text):
+    return re.sub(r"[^\w\s]", "", text.lower()).split()
+
+
+def stitch(texts, max_overlap_words=40):
+    """Join segment transcripts, removing words duplicated across the overlap."""
+    out = []
+    for text in texts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        if out:
+            prev_tail = _words(out[-1])[-max_overlap_words:]
+            tokens = text.split()
+            head = [_words(t) for t in tokens[:max_overlap_words]]
+            head_flat = [w[0] if w else "" for w in head]
+            for n in range(min(len(prev_tail), len(head_flat)), 0, -1):
+                if prev_tail[-n:] == head_flat[:n]:
+                    text = " ".join(tokens[n:])
+                    break
+        if text:
+            out.append(text)
+    return " ".join(out)
+
+
+def transcribe_media(openai_client, audio_file, work_dir, log=print):
+    """Transcribe audio_file; long files are split and transcribed in parallel."""
+    duration = probe_duration(audio_file)
+    cuts = plan_cuts(duration, detect_silences(audio_file) if duration > SEGMENT_SECS * 1.25 else [])
+    bounds = list(zip([0.0] + cuts, cuts + [duration]))
+    base = os.path.splitext(os.path.basename(audio_file))[0]
+
+    segments = []
+    for i, (start, end) in enumerate(bounds):
+        seg_start = max(0.0, start - (OVERLAP_SECS if i else 0))
+        seg_end = min(duration, end + (OVERLAP_SECS if i < len(bounds) - 1 else 0))
+        segments.append((os.path.join(work_dir, f"{base}_seg{i:03d}.mp3"), seg_start, seg_end - seg_start))
+
+    log(f"🎙️ [OMNI-SYNC] Transcribing {duration / 60:.1f} min in {len(segments)} segment(s)...")
+
+    def run(segment):
+        path, start, length = segment
+        try:
+            _encode_segment(audio_file, path, start, length)
+            with open(path, "rb") as file:
+                return openai_client.audio.transcriptions.create(model="whisper-1", file=file).text
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SEGMENT_WORKERS, len(segments)))) as pool:
+        texts = list(pool.map(run, segments))
+    return stitch(texts)
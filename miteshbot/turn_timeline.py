@@ -0,0 +1,181 @@
+"""Per-turn latency timeline for the voice pipeline.
+
+A TurnObserver is dropped in after transport.input(), stt, llm and tts. Each
+one passes every frame straight through and only timestamps the milestones of
+the current turn on a shared TurnTimeline:
+
+  vad_stop          user stopped speaking (VAD, already stop_secs late)
+  stt_final         final transcription
+  tool_start/end    search_knowledge_base call in progress / result
+  llm_first_token   first LLM text token of the spoken answer
+  tts_first_audio   first synthesized audio frame
+  output_start      bot audio starts playing out
+
+When the bot stops speaking the turn is emitted as one structured
+"TURN_TIMELINE" log record, and its stage durations are added to
+process-wide rolling percentiles (turn_stats).
+"""
+
+import json
+import time
+import uuid
+from collections import deque
+
+from loguru import logger
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    BotStoppedSpeakingFrame,
+    FunctionCallInProgressFrame,
+    FunctionCallResultFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+    VADUserStartedSpeakingFrame,
+    VADUserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+# stage name -> (from milestone(s), to milestone); the first "from" present wins.
+STAGES = {
+    "stt":        (("vad_stop",), "stt_final"),
+    "tool":       (("tool_start",), "tool_end"),
+    "llm_ttft":   (("tool_end", "stt_final"), "llm_first_token"),
+    "tts_ttfb":   (("llm_first_token",), "tts_first_audio"),
+    "output":     (("tts_first_audio",), "output_start"),
+    "voice_to_voice": (("vad_stop",), "output_start"),
+}
+
+
+class LatencyStats:
+    """Rolling per-stage percentiles over the last `window` turns."""
+
+    def __init__(self, window=500, log_every=10):
+        self._samples = {name: deque(maxlen=window) for name in STAGES}
+        self._log_every = log_every
+        self.turns = 0
+
+    def add(self, durations):
+        for name, ms in durations.items():
+            self._samples[name].append(ms)
+        self.turns += 1
+        if self._log_every and self.turns % self._log_every == 0:
+            logger.info(f"Turn latency over last {len(self._samples['voice_to_voice'])} turns: {self.summary()}")
+
+    @staticmethod
+    def _pct(ordered, p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self):
+        out = {}
+        for name, samples in self._samples.items():
+            if samples:
+                ordered = sorted(samples)
+                out[name] = {f"p{p}": round(self._pct(ordered, p)) for p in (50, 95, 99)}
+        return out
+
+
+turn_stats = LatencyStats()
+
+
+class TurnTimeline:
+    def __init__(self, session_id=None, stats=turn_stats):
+        self.session_id = session_id or uuid.uuid4().hex[:8]
+        self._stats = stats
+        self._turn = 0
+        self._marks = {}
+        self._user_speaking = False
+        self._recent = deque(maxlen=32)     # ids of milestone frames already handled
+
+    def first_sighting(self, frame):
+        """Every observer sees the same frame; only the first one counts."""
+        if frame.id in self._recent:
+            return False
+        self._recent.append(frame.id)
+        return True
+
+    def mark(self, name, overwrite=False):
+        if overwrite or name not in self._marks:
+            self._marks[name] = time.monotonic()
+
+    def user_started(self):
+        self._user_speaking = True
+        if "llm_first_token" not in self._marks:
+            # They kept talking — the turn ends at their *last* pause.
+            self._marks.pop("vad_stop", None)
+
+    def transcribed(self):
+        # Later finals of the same utterance move the mark; once the LLM is
+        # answering, stray transcripts no longer count toward this turn.
+        self.mark("stt_final", overwrite="llm_first_token" not in self._marks)
+
+    def user_stopped(self):
+        if self._user_speaking:
+            self._user_speaking = False
+            self.mark("vad_stop", overwrite=True)
+
+    def finish(self):
+        marks, self._marks = self._marks, {}
+        if "output_start" not in marks:
+            return None
+        self._turn += 1
+        origin = marks.get("vad_stop", min(marks.values()))
+        durations = {}
+        for name, (starts, end) in STAGES.items():
+            start = next((marks[s] for s in starts if s in marks), None)
+            if start is not None and end in marks:
+                durations[name] = round((marks[end] - start) * 1000)
+        record = {
+            "session": self.session_id,
+            "turn": self._turn,
+            "kind": "reply" if "vad_stop" in marks else "bot_initiated",
+            "milestones_ms": {k: round((v - origin) * 1000) for k, v in sorted(marks.items(), key=lambda kv: kv[1])},
+            "stages_ms": durations,
+        }
+        logger.info(f"TURN_TIMELINE {json.dumps(record)}")
+        if record["kind"] == "reply":
+            self._stats.add(durations)
+        return record
+
+
+_MILESTONE_FRAMES = (
+    UserStartedSpeakingFrame, VADUserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame, VADUserStoppedSpeakingFrame,
+    TranscriptionFrame, FunctionCallInProgressFrame, FunctionCallResultFrame,
+    BotStartedSpeakingFrame, BotStoppedSpeakingFrame,
+)
+
+
+class TurnObserver(FrameProcessor):
+    """Pass-through processor that timestamps turn milestones on a TurnTimeline."""
+
+    def __init__(self, timeline, **kwargs):
+        super().__init__(**kwargs)
+        self._timeline = timeline
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        t = self._timeline
+        if isinstance(frame, TTSAudioRawFrame):
+            t.mark("tts_first_audio")
+        elif isinstance(frame, LLMTextFrame):
+            t.mark("llm_first_token")
+        elif isinstance(frame, _MILESTONE_FRAMES) and t.first_sighting(frame):
+            if isinstance(frame, (UserStartedSpeakingFrame, VADUserStartedSpeakingFrame)):
+                t.user_started()
+            elif isinstance(frame, (UserStoppedSpeakingFrame, VADUserStoppedSpeakingFrame)):
+                t.user_stopped()
+            elif isinstance(frame, TranscriptionFrame):
+                t.transcribed()
+            elif isinstance(frame, FunctionCallInProgressFrame):
+                t.mark("tool_start")
+            elif isinstance(frame, FunctionCallResultFrame):
+                t.mark("tool_end")
+            elif isinstance(frame, BotStartedSpeakingFrame):
+                t.mark("output_start")
+            elif isinstance(frame, BotStoppedSpeakingFrame):
+                t.finish()
+
+        await self.push_frame(frame, direction)
@@ -0,0 +1,223 @@
+"""Pre-rendered audio for the bot's scripted lines.
+
+Every connect used to run a full gpt-4o-mini generation plus Cartesia TTS
+just to say a near-identical greeting, and the "I didn't quite catch that"
+recovery line cost the same on every noisy turn. These lines are now
+rendered once per (profile, voice) as raw PCM, kept in memory (and on disk
+when UTTERANCE_CACHE_DIR is set), and pushed straight into the output as
+TTSAudioRawFrames — zero LLM/TTS cost per session.
+
+Entries are keyed by a fingerprint of the profile fields the lines use plus
+voice/model/sample rate, so editing the profile or switching CARTESIA_VOICE_ID
+re-renders them and drops the stale audio.
+"""
+
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+
+from loguru import logger
+from pipecat.frames.frames import TTSAudioRawFrame, TTSStartedFrame, TTSStoppedFrame, TranscriptionFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+CARTESIA_TTS_URL = "https://api.cartesia.ai/tts/bytes"
+CARTESIA_VERSION = "2024-06-10"
+
+# {name} and {headline} come from the profile row, as in build_system_prompt.
+GREETING_TEMPLATES = (
+    "Hey Champion! I am {name}, {headline}. I am so glad you are here today. "
+    "Ask me anything, and let us make some magic happen!",
+    "Hey Champion! {name} here, and I am so excited to talk with you today. "
+    "Whatever is on your mind, ask me anything!",
+    "Hello Champion! This is {name}, {headline}. Welcome! "
+    "Tell me what you are working on right now, and let us create a breakthrough together!",
+)
+
+FIXED_UTTERANCES = {
+    "didnt_catch": "Hey Champion, I didn't quite catch that. Could you please repeat your question? "
+                   "I want to make sure I give you the best answer!",
+}
+
+# Phrases STT hallucinates from background noise / music (see the system prompt).
+_NOISE_RE = re.compile(
+    r"\b(subscribe|link in the description|like and share|thanks for watching|thank you for watching)\b",
+    re.IGNORECASE,
+)
+
+
+def greeting_lines(profile):
+    """The greeting variants for a profile row."""
+    profile = profile or {}
+    name = profile.get("name") or "Mitesh Khatri"
+    headline = profile.get("headline") or "Law of Attraction Coach"
+    return [t.format(name=name, headline=headline) for t in GREETING_TEMPLATES]
+
+
+def looks_like_noise(text):
+    words = re.findall(r"\w+", text or "")
+    return bool(words) and len(words) <= 8 and bool(_NOISE_RE.search(text))
+
+
+async def cartesia_pcm(http, api_key, text, voice_id, model_id, sample_rate, language="en"):
+    """Render `text` with Cartesia's REST endpoint as raw 16-bit mono PCM."""
+    resp = await http.post(
+        CARTESIA_TTS_URL,
+        headers={"X-API-Key": api_key, "Cartesia-Version": CARTESIA_VERSION},
+        json={
+            "model_id": model_id,
+            "transcript": text,
+            "voice": {"mode": "id", "id": voice_id},
+            "output_format": {"container": "raw", "encoding": "pcm_s16le", "sample_rate": sample_rate},
+            "language": language,
+        },
+        timeout=30.0,
+    )
+    resp.raise_for_status()
+    return resp.content
+
+
+def audio_frames(pcm, sample_rate, chunk_ms=40):
+    """TTS-shaped frames for a PCM clip, ready for task.queue_frames / push_frame."""
+    step = sample_rate * 2 * chunk_ms // 1000
+    frames = [TTSStartedFrame()]
+    frames += [TTSAudioRawFrame(pcm[i:i + step], sample_rate, 1) for i in range(0, len(pcm), step)]
+    frames.append(TTSStoppedFrame())
+    return frames
+
+
+class Utterances:
+    """Rendered lines for one (profile, voice): greeting variants + fixed lines."""
+
+    def __init__(self, sample_rate, greetings, fixed):
+        self.sample_rate = sample_rate
+        self.greetings = greetings      # [(text, pcm)]
+        self.fixed = fixed              # name -> (text, pcm)
+
+    def greeting(self):
+        return random.choice(self.greetings) if self.greetings else None
+
+    def line(self, name):
+        return self.fixed.get(name)
+
+
+class UtteranceCache:
+    def __init__(self, synthesize, voice_id, model_id, sample_rate=24000, disk_dir=None):
+        self._synthesize = synthesize   # async fn(text) -> PCM bytes
+        self._voice_id = voice_id
+        self._model_id = model_id
+        self._sample_rate = sample_rate
+        self._disk_dir = disk_dir
+        self._sets = {}                 # profile_id -> (fingerprint, Utterances)
+        self._rendering = {}            # (profile_id, fingerprint) -> asyncio.Task
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _fingerprint(self, profile):
+        basis = {
+            "name": (profile or {}).get("name"),
+            "headline": (profile or {}).get("headline"),
+            "voice": self._voice_id,
+            "model": self._model_id,
+            "rate": self._sample_rate,
+            "lines": [GREETING_TEMPLATES, FIXED_UTTERANCES],
+        }
+        return hashlib.sha1(json.dumps(basis, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _path(self, profile_id, fingerprint, text):
+        digest = hashlib.sha1(text.encode()).hexdigest()[:16]
+        return os.path.join(self._disk_dir, f"{profile_id}_{fingerprint}_{digest}.pcm")
+
+    async def _render_one(self, profile_id, fingerprint, text):
+        path = self._path(profile_id, fingerprint, text) if self._disk_dir else None
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        pcm = await self._synthesize(text)
+        if path:
+            with open(path + ".tmp", "wb") as f:
+                f.write(pcm)
+            os.replace(path + ".tmp", path)
+        return pcm
+
+    async def _render(self, profile_id, fingerprint, profile):
+        greetings = greeting_lines(profile)
+        texts = greetings + list(FIXED_UTTERANCES.values())
+        pcms = await asyncio.gather(*(self._render_one(profile_id, fingerprint, t) for t in texts))
+        utterances = Utterances(
+            self._sample_rate,
+            list(zip(greetings, pcms[:len(greetings)])),
+            {k: (t, p) for (k, t), p in zip(FIXED_UTTERANCES.items(), pcms[len(greetings):])},
+        )
+        self._sets[profile_id] = (fingerprint, utterances)
+        self._drop_stale_files(profile_id, fingerprint)
+        logger.info(f"Scripted audio rendered for profile {profile_id} ({len(texts)} lines)")
+        return utterances
+
+    def _drop_stale_files(self, profile_id, fingerprint):
+        if not self._disk_dir:
+            return
+        for path in glob.glob(os.path.join(self._disk_dir, f"{profile_id}_*.pcm")):
+            if not os.path.basename(path).startswith(f"{profile_id}_{fingerprint}_"):
+                os.remove(path)
+
+    async def get(self, profile_id, profile, timeout=None):
+        """Rendered lines for this profile, or None if unavailable within `timeout`.
+
+        A render that outlives `timeout` keeps going in the background, so the
+        next session gets the audio.
+        """
+        fingerprint = self._fingerprint(profile)
+        cached = self._sets.get(profile_id)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        key = (profile_id, fingerprint)
+        task = self._rendering.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(profile_id, fingerprint, profile))
+            self._rendering[key] = task
+            task.add_done_callback(lambda t: (self._rendering.pop(key, None), t.cancelled() or t.exception()))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            logger.info("Scripted audio still rendering — using live TTS this time")
+            return None
+        except Exception as e:
+            logger.warning(f"Scripted audio render failed: {e}")
+            return None
+
+    def invalidate(self, profile_id=None):
+        if profile_id is None:
+            self._sets.clear()
+        else:
+            self._sets.pop(profile_id, None)
+
+
+class ScriptedReplies(FrameProcessor):
+    """Answers noise transcriptions with the pre-rendered recovery line.
+
+    Sits right after stt: a final transcript that is obviously background
+    noise never reaches the LLM; the cached "didn't catch that" audio is
+    pushed downstream to the output instead.
+    """
+
+    def __init__(self, utterances, **kwargs):
+        super().__init__(**kwargs)
+        self._utterances = utterances
+
+    async def process_frame(self, frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, TranscriptionFrame) and self._utterances and looks_like_noise(frame.text):
+            line = self._utterances.line("didnt_catch")
+            if line:
+                logger.info(f"Noise transcription '{frame.text}' — playing cached recovery line")
+                for audio in audio_frames(line[1], self._utterances.sample_rate):
+                    await self.push_frame(audio, direction)
+                return
+
+        await self.push_frame(frame, direction)